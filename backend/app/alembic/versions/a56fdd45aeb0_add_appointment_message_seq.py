@@ -0,0 +1,47 @@
+"""Add appointment message_seq and unique message order
+
+Revision ID: a56fdd45aeb0
+Revises: 1a31ce608336
+Create Date: 2026-10-19 03:53:39.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'a56fdd45aeb0'
+down_revision = '1a31ce608336'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The appointment tables are created by init_db after the migrations run,
+    # so a new database has nothing to migrate yet
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('appointment'):
+        return
+    columns = {column['name'] for column in inspector.get_columns('appointment')}
+    if 'message_seq' not in columns:
+        op.add_column('appointment', sa.Column('message_seq', sa.Integer(), nullable=False, server_default='0'))
+        op.alter_column('appointment', 'message_seq', server_default=None)
+        # The sequence continues from the last message already stored
+        op.execute(
+            'UPDATE appointment SET message_seq = COALESCE('
+            '(SELECT max("order") FROM appointmentinfo WHERE appointment_id = appointment.id), 0)'
+        )
+    constraints = {constraint['name'] for constraint in inspector.get_unique_constraints('appointmentinfo')}
+    if 'appointmentinfo_appointment_id_order_key' not in constraints:
+        op.create_unique_constraint(
+            'appointmentinfo_appointment_id_order_key', 'appointmentinfo', ['appointment_id', 'order']
+        )
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('appointment'):
+        return
+    op.drop_constraint('appointmentinfo_appointment_id_order_key', 'appointmentinfo', type_='unique')
+    op.drop_column('appointment', 'message_seq')
@@ -1,31 +1,34 @@
-from fastapi import APIRouter, WebSocket, Depends, HTTPException, status
-from sqlmodel import Session
-import requests
-from typing import Dict, List, Optional
+import asyncio
+from fastapi import APIRouter, WebSocket, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
 import uuid
-from datetime import datetime
+import base64
+from datetime import date, datetime, timedelta
 from app.api.services.audio_transcriptor import process_audio, save_audio_file
-from app.api.routes.utils import register_message
+from app.api.routes.utils import register_message, register_messages
 from pathlib import Path
 from app.core.config import settings
-from app.models import Appointment, AppointmentCreate, AppointmentResponse, AppointmentStatus, AppointmentUpdate, AppointmentInfo, AppointmentsPublic
+from app.models import Appointment, AppointmentCreate, AppointmentResponse, AppointmentStatus, AppointmentUpdate, AppointmentInfo, AppointmentsPage, AppointmentsPublic, AppointmentCountsPublic, CaseForecast, StatsDimension, StatsGranularity
 from app.api.deps import get_db
+from app.core.db import engine
+from app.api.services.conversation import ConversationState, load_entries
+from app.api.services.admission import admission, is_urgent, wait_for_admission
+from app.api.services.appointment_stats import count_appointments
+from app.api.services.forecasting import get_forecast
+from app.api.services.appointment_events import publish_appointment_event, stream_events
+from app.api.services.appointment_status import publish_status_change
+from app.api.services.conversation_sessions import Keepalive, conversation_sessions
 from app.api.services.user_answer import ask_more_questions, MedicalCaseResult
-from app.api.services.hospital_monitor import get_hospital
+from app.api.services.hospital_assignment import load_tracker
+from app.api.services.notification_outbox import build_appointment_payload, enqueue_assignment_notifications
 import json
-from sqlmodel import Session, select
-from app.models import Hospital, Patient, User
+from sqlalchemy import tuple_
+from sqlmodel import Session, func, select
+from app.models import User
     
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
-# Almacenamiento en memoria para las conexiones WebSocket activas
-# En un entorno de producción, esto debería ser reemplazado por una solución más robusta
-active_connections: Dict[str, WebSocket] = {}
-
-# Almacenamiento en memoria para los mensajes
-# En un entorno de producción, esto debería ser almacenado en una base de datos
-appointment_messages: Dict[str, List[Dict]] = {}
-
 
 @router.post("/appointments", response_model=AppointmentResponse)
 async def create_appointment(
@@ -46,9 +49,6 @@ async def create_appointment(
     db.commit()
     db.refresh(new_appointment)
     
-    # Inicializar el registro de mensajes para esta cita
-    appointment_messages[str(new_appointment.id)] = []
-    
     return new_appointment
 
 
@@ -67,16 +67,24 @@ async def update_appointment(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Appointment not found"
         )
+    previous_hospital, previous_status = appointment.hospital_assigned, appointment.status
     
     if appointment_data.scheduled_time is not None:
         appointment.scheduled_time = appointment_data.scheduled_time
-        appointment.status = AppointmentStatus.SCHEDULED
+        # Con hora asignada la cita pasa a estar asignada (no existe un estado SCHEDULED)
+        appointment.status = AppointmentStatus.ASSIGNED
+        if appointment.assigned_time is None:
+            appointment.assigned_time = datetime.now()
     
     if appointment_data.status is not None:
         appointment.status = appointment_data.status
-        
+
+    # Publicar el cambio de estado al hospital, al paciente y al panel en la misma transacción
+    if appointment.status != previous_status:
+        publish_status_change(db, appointment)
     db.commit()
     db.refresh(appointment)
+    load_tracker.on_appointment_change(previous_hospital, previous_status, appointment.hospital_assigned, appointment.status)
     
     return appointment
 
@@ -89,24 +97,157 @@ async def get_appointments_by_patient(
     appointments = db.exec(statement).all()
     return AppointmentsPublic(data=appointments, count=len(appointments))
 
-@router.get("/all", response_model=AppointmentsPublic)
+def _encode_cursor(appointment: Appointment) -> str:
+    key = f"{appointment.request_start_time.isoformat()}|{appointment.id}"
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        request_start_time, appointment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(request_start_time), uuid.UUID(appointment_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+@router.get("/all", response_model=AppointmentsPage)
 async def get_appointments(
     db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
     contagious: Optional[bool] = None,
     hospital_assigned: Optional[str] = None,
+    status_filter: Optional[AppointmentStatus] = Query(default=None, alias="status"),
+    medical_specialty: Optional[str] = None,
+    prority: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
 ):
     """
-    Obtiene todas las citas
+    Obtiene las citas de la más reciente a la más antigua, página a página.
+
+    La paginación es por cursor sobre (request_start_time, id): cada página
+    devuelve `next_cursor`, que se envía como `cursor` para pedir la siguiente.
+    Las fechas son inclusivas. El total (`count`) solo se calcula en la primera
+    página.
     """
-    statement = select(Appointment).offset(skip).limit(limit)
+    filters = []
     if contagious is not None:
-        statement = statement.where(Appointment.contagious == contagious)
+        filters.append(Appointment.contagious == contagious)
     if hospital_assigned:
-        statement = statement.where(Appointment.hospital_assigned == hospital_assigned)
+        filters.append(Appointment.hospital_assigned == hospital_assigned)
+    if status_filter is not None:
+        filters.append(Appointment.status == status_filter)
+    if medical_specialty:
+        filters.append(Appointment.medical_specialty == medical_specialty)
+    if prority:
+        filters.append(Appointment.prority == prority)
+    if start_date:
+        filters.append(Appointment.request_start_time >= start_date)
+    if end_date:
+        filters.append(Appointment.request_start_time < end_date + timedelta(days=1))
+
+    statement = select(Appointment).where(*filters)
+    if cursor:
+        # Continúa justo después de la última cita de la página anterior
+        statement = statement.where(tuple_(Appointment.request_start_time, Appointment.id) < _decode_cursor(cursor))
+    # Una fila de más indica si hay página siguiente
+    statement = statement.order_by(Appointment.request_start_time.desc(), Appointment.id.desc()).limit(limit + 1)
     appointments = db.exec(statement).all()
-    return AppointmentsPublic(data=appointments, count=len(appointments))
+    has_more = len(appointments) > limit
+    appointments = appointments[:limit]
+
+    count = None
+    if not cursor:
+        count = db.exec(select(func.count()).select_from(Appointment).where(*filters)).one()
+    return AppointmentsPage(
+        data=appointments,
+        count=count,
+        next_cursor=_encode_cursor(appointments[-1]) if has_more else None,
+    )
+
+
+@router.get("/stats/counts", response_model=AppointmentCountsPublic)
+async def get_appointment_counts(
+    start_date: date,
+    end_date: date,
+    granularity: StatsGranularity = StatsGranularity.DAY,
+    group_by: list[StatsDimension] = Query(default=[]),
+    contagious: Optional[bool] = None,
+    hospital_assigned: Optional[str] = None,
+    medical_specialty: Optional[str] = None,
+    prority: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Número de citas por hora, día o semana entre dos fechas inclusivas,
+    opcionalmente desglosado por hospital, especialidad y prioridad.
+
+    Se agrega en la base de datos, así que la respuesta son unos pocos cientos
+    de números aunque haya millones de citas.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end_date is before start_date")
+    buckets = count_appointments(
+        db,
+        granularity,
+        start_date,
+        end_date,
+        group_by=group_by,
+        contagious=contagious,
+        hospital_assigned=hospital_assigned,
+        medical_specialty=medical_specialty,
+        prority=prority,
+    )
+    return AppointmentCountsPublic(data=buckets, count=len(buckets))
+
+
+@router.get("/stats/forecast", response_model=CaseForecast)
+def get_case_forecast(
+    start_date: date,
+    end_date: date,
+    horizon: int = Query(default=7, ge=1, le=30),
+    contagious: Optional[bool] = None,
+    hospital_assigned: Optional[str] = None,
+    medical_specialty: Optional[str] = None,
+    prority: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Casos diarios entre dos fechas inclusivas con su tasa de crecimiento,
+    tiempo de duplicación y número reproductivo, y la previsión de los
+    próximos días con su intervalo de predicción.
+
+    El resultado se comparte entre todos los que piden los mismos filtros el
+    mismo día hasta que cambian las estadísticas.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end_date is before start_date")
+    return get_forecast(
+        db,
+        start_date,
+        end_date,
+        horizon,
+        contagious=contagious,
+        hospital_assigned=hospital_assigned,
+        medical_specialty=medical_specialty,
+        prority=prority,
+    )
+
+
+@router.get("/stream")
+async def stream_appointments(request: Request, hospital_assigned: str):
+    """
+    Server-sent events con las asignaciones y cambios de estado de las citas de
+    un hospital, en cuanto ocurren. Los paneles suscritos no necesitan
+    consultar /all periódicamente: solo recargan al recibir un evento `resync`.
+    """
+    return StreamingResponse(
+        stream_events(hospital_assigned, request.is_disconnected),
+        media_type="text/event-stream",
+        # Sin caché ni buffering de proxies, cada evento se entrega al momento
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/appointments/{appointment_id}", response_model=AppointmentResponse)
@@ -137,6 +278,7 @@ async def set_appointment_data(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Appointment not found"
         )
+    previous_hospital, previous_status = appointment.hospital_assigned, appointment.status
     if appointment_data.status is not None:
         appointment.status = appointment_data.status
     if appointment_data.hospital_assigned is not None:
@@ -149,138 +291,213 @@ async def set_appointment_data(
         appointment.contagious = appointment_data.contagious
     if appointment_data.scheduled_time is not None:
         appointment.scheduled_time = appointment_data.scheduled_time
+    hospital_changed = appointment.hospital_assigned != previous_hospital
+    if hospital_changed:
+        # La cita pasa del panel del hospital anterior al del nuevo
+        if previous_hospital:
+            publish_appointment_event(db, appointment, "unassigned", hospital_id=previous_hospital)
+        publish_appointment_event(db, appointment, "assigned")
+    if appointment.status != previous_status:
+        publish_status_change(db, appointment, dashboard=not hospital_changed)
     db.commit()
     db.refresh(appointment)
+    load_tracker.on_appointment_change(previous_hospital, previous_status, appointment.hospital_assigned, appointment.status)
     return appointment
 
+def _load_conversation_start(appointment_id: str, uuid_id: uuid.UUID, after: int) -> tuple[str, str, str, list] | None:
+    """
+    Datos del paciente y mensajes posteriores a `after` de una cita que admite
+    conversación (pendiente o con datos por completar), o None si no la admite.
+    """
+    with Session(engine) as db:
+        appointment = db.get(Appointment, uuid_id)
+        user = db.get(User, appointment.patient_id) if appointment else None
+        patient = user.patient if user else None
+        if not (appointment and patient) or appointment.status not in (AppointmentStatus.PENDING, AppointmentStatus.MISSING_DATA):
+            return None
+        # Solo los mensajes que el cliente no ha visto
+        missed = load_entries(db, appointment_id, after)
+        return appointment.patient_id, patient.national_id, patient.city + ", " + patient.address, missed
+
+
+def _save_user_message(appointment_id: str, text: str, conversation: ConversationState | None) -> ConversationState:
+    """Guarda el mensaje del paciente; el historial completo se carga con el primero"""
+    with Session(engine) as db:
+        if conversation is None:
+            conversation = ConversationState.load(db, appointment_id)
+        register_message(db, appointment_id, text, "user", conversation)
+    return conversation
+
+
+def _ask_for_missing_data(
+    appointment_id: str, uuid_id: uuid.UUID, questions: list[str], conversation: ConversationState
+) -> None:
+    """Todas las preguntas se guardan en un único insert, en la misma transacción que el estado"""
+    with Session(engine) as db:
+        appointment = db.get(Appointment, uuid_id)
+        appointment.status = AppointmentStatus.MISSING_DATA
+        register_messages(db, appointment_id, questions, "assistant", conversation)
+
+
+def _assign_hospital(
+    uuid_id: uuid.UUID, result: MedicalCaseResult, national_id: str, message_from_user: str
+) -> tuple[str | None, AppointmentStatus]:
+    """Asigna la cita al hospital del triaje y devuelve el hospital y el estado anteriores"""
+    with Session(engine) as db:
+        appointment = db.get(Appointment, uuid_id)
+        previous_hospital, previous_status = appointment.hospital_assigned, appointment.status
+        appointment.status = AppointmentStatus.PENDING
+        appointment.hospital_assigned = str(result.assigned_hospital.id)
+        appointment.medical_specialty = result.triage.specialty
+        appointment.prority = result.triage.urgency
+        appointment.geohash = result.location_geohash
+        # El aviso al hospital se guarda en la misma transacción y lo entrega el worker del outbox
+        publish_appointment_event(db, appointment, "assigned")
+        enqueue_assignment_notifications(
+            db,
+            appointment_id=appointment.id,
+            hospital=result.assigned_hospital,
+            payload=build_appointment_payload(
+                appointment.id, national_id, result.triage.urgency, result.triage.specialty, message_from_user
+            ),
+        )
+        db.commit()
+    return previous_hospital, previous_status
+
+
 @router.websocket("/ws/{appointment_id}")
 async def websocket_endpoint(
     websocket: WebSocket, 
     appointment_id: str,
-    db: Session = Depends(get_db)
+    after: int = 0,
 ):
     """
     Endpoint WebSocket para comunicación en tiempo real relacionada con una cita específica.
     Soporta mensajes de texto y archivos de audio.
+
+    Al reconectar, el cliente envía en `after` el orden del último mensaje que
+    recibió y solo se le reenvían los posteriores.
+
+    La conversación puede durar minutos (LLM, transcripción, tiempo de respuesta
+    del paciente), así que no retiene ninguna sesión de base de datos: cada
+    unidad de trabajo abre la suya en un hilo, fuera del event loop, y la
+    cierra al terminar.
     """
     # Verificar si el appointment_id existe
     try:
         uuid_id = uuid.UUID(appointment_id)
-        appointment = db.get(Appointment, uuid_id)
-        user = db.get(User, appointment.patient_id)
-        patient = user.patient
-        if (not appointment or not patient) or (appointment.status != AppointmentStatus.PENDING and appointment.status != AppointmentStatus.MISSING_DATA):
-            print(f"Appointment or patient not found or status is not pending or missing data: {appointment_id}")
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-            return
     except ValueError:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
-    
-    # Inicializar el historial de mensajes si no existe
-    if appointment_id not in appointment_messages:
-        appointment_messages[appointment_id] = []
+    start = await asyncio.to_thread(_load_conversation_start, appointment_id, uuid_id, after)
+    if start is None:
+        print(f"Appointment or patient not found or status is not pending or missing data: {appointment_id}")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    patient_id, national_id, location, missed = start
     
     await websocket.accept()
-    active_connections[appointment_id] = websocket
-    
-    # Enviar mensajes históricos al cliente cuando se conecta
-    for message in appointment_messages[appointment_id]:
-        await websocket.send_json(message)
-    
-    while True:
-        message = await websocket.receive()  # Recibe el mensaje como dict
-        print(message.keys())
-
-        if "bytes" in message:
-            try:
-                # Get the binary data from the message
-                audio_data = message["bytes"]
-                audio_path = save_audio_file(appointment_id, audio_data)               
-                message_from_user = process_audio(api_key=settings.OPENAI_API_KEY, audio_path=str(audio_path))
+    # Registrar la conversación para que cualquier proceso pueda enviarle mensajes
+    connection_id = await conversation_sessions.open(appointment_id, websocket)
+    # Plazo de inactividad: se cierran las conversaciones abandonadas
+    keepalive = Keepalive(websocket)
+    ticket = None
+    receiving = None
+    try:
+        # Enviar el historial pendiente al cliente cuando se conecta, aunque venga de otro worker
+        for entry in missed:
+            await websocket.send_json({
+                "type": "history",
+                "sender": entry.sender,
+                "value": entry.content,
+                "order": entry.order,
+            })
+        # Control de admisión: si no hay hueco el paciente espera su turno en la sala de espera
+        ticket = admission.enter(appointment_id, connection_id, urgent=any(is_urgent(entry.content) for entry in missed))
+        waited = await wait_for_admission(websocket, ticket)
+        if waited is None:
+            return
+        early_texts, receiving = waited
+        # El historial completo se carga con el primer mensaje; una reconexión sin mensajes no lo necesita
+        conversation: ConversationState | None = None
+        while True:
+            if early_texts:
+                # Lo escrito en la sala de espera es el primer mensaje de la conversación
+                message = {"type": "websocket.receive", "text": "\n".join(early_texts)}
+                early_texts = []
+            else:
+                # Recibe el mensaje como dict; el plazo de inactividad empieza ahora
+                message = await keepalive.receive(receiving)
+                receiving = None
+
+            # El paciente cerró la conexión o se cerró por inactividad
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if "bytes" in message:
+                try:
+                    # Get the binary data from the message
+                    audio_data = message["bytes"]
+                    audio_path = save_audio_file(appointment_id, audio_data)               
+                    message_from_user = await asyncio.to_thread(process_audio, api_key=settings.OPENAI_API_KEY, audio_path=str(audio_path))
+                    await websocket.send_json({
+                        "type": "transcription",
+                        "value": message_from_user
+                    })
+                except Exception as e:
+                    print(f"Error processing audio: {str(e)}")
+                    await websocket.send_json({
+                        "type": "error",
+                        "text": f"Error processing audio: {str(e)}"
+                    })
+            elif "text" in message:
+                message_from_user = message["text"]
+            else:
+                print(f"Incorrect message format: {message.keys()}")
+
+            conversation = await asyncio.to_thread(_save_user_message, appointment_id, message_from_user, conversation)
+
+            ## PREGUNTAMOS A LA LLM SI HAY QUE HACER MAS PREGUNTAS
+            # Fuera del event loop y sin sesión abierta mientras responde la LLM
+            result: MedicalCaseResult = await asyncio.to_thread(ask_more_questions, patient_id, conversation, location)
+            if result.extra_questions is not None and len(result.extra_questions.further_questions) > 0:
+                questions = list(result.extra_questions.further_questions)
+                await asyncio.to_thread(_ask_for_missing_data, appointment_id, uuid_id, questions, conversation)
+            
                 await websocket.send_json({
-                    "type": "transcription",
-                    "value": message_from_user
+                    "type": "questions",
+                    "value": ['\n'.join(questions)],
                 })
-            except Exception as e:
-                print(f"Error processing audio: {str(e)}")
+            elif result.assigned_hospital is None:
+                # Sin ubicación reconocible o sin ningún hospital registrado: se avisa al paciente
                 await websocket.send_json({
                     "type": "error",
-                    "text": f"Error processing audio: {str(e)}"
+                    "text": "No hemos podido asignarte un hospital. Revisa tu dirección o vuelve a intentarlo más tarde.",
                 })
-        elif "text" in message:
-            message_from_user = message["text"]
-        else:
-            print(f"Incorrect message format: {message.keys()}")
-
-        register_message(db, appointment_id, message_from_user, "user")
-        
-
-        ## PREGUNTAMOS A LA LLM SI HAY QUE HACER MAS PREGUNTAS
-        result: MedicalCaseResult = ask_more_questions(db, appointment.patient_id, appointment_id, patient.city + ", " + patient.address)
-        if result.extra_questions is not None and len(result.extra_questions.further_questions) > 0:
-            appointment.status = AppointmentStatus.MISSING_DATA
-            db.commit()
-            db.refresh(appointment)
+                await websocket.close()
+                break
+            else:
+                previous_hospital, previous_status = await asyncio.to_thread(
+                    _assign_hospital, uuid_id, result, national_id, message_from_user
+                )
+                # La cola del hospital solo cuenta la cita una vez guardada
+                load_tracker.on_appointment_change(
+                    previous_hospital, previous_status, str(result.assigned_hospital.id), AppointmentStatus.PENDING
+                )
             
-            # Process each question with text-to-speech
-            questions = []
-            for question in result.extra_questions.further_questions:
-                register_message(db, appointment_id, question, "assistant")
-                questions.append(question)
+                response_message = f"Tu cita ha sido creada con éxito y asignada al hospital {result.assigned_hospital.name}. En breves asignarán una hora para usted. Revisa en el panel de citas para más información."
             
-            await websocket.send_json({
-                "type": "questions",
-                "value": ['\n'.join(questions)],
-            })
-        else:
-            appointment.status = AppointmentStatus.PENDING
-            appointment.hospital_assigned = result.assigned_hospital.name
-            appointment.medical_specialty = result.triage.specialty
-            appointment.prority = result.triage.urgency
-            db.commit()
-            db.refresh(appointment)
-            
-            response_message = f"Tu cita ha sido creada con éxito y asignada al hospital {result.assigned_hospital.name}. En breves asignarán una hora para usted. Revisa en el panel de citas para más información."
-            
-            await websocket.send_json({
-                "type": "done",
-                "value": response_message,
-            })
-
-            # Close the WebSocket connection
-            await websocket.close()
-            notify_hospital(db, appointment_id, result.assigned_hospital, result.triage.urgency, result.triage.specialty, patient.national_id, message_from_user)
-            break
+                await websocket.send_json({
+                    "type": "done",
+                    "value": response_message,
+                })
 
-def notify_hospital(db, appointment_id: str, hospital: Hospital, urgency: str, specialty: str, user_id: str, message: str):
-    if hospital is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Hospital not found"
-        )
-    if hospital.uri is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Hospital URI not found"
-        )
-    
-    appointment_data = {
-        "patient_id": user_id,
-        "specialty": specialty,
-        "appointment_type": "consulta",
-        "urgency": urgency,
-        "reason": message,
-        "notes": f"Asignado desde MediSur Central - (Urgencia: {urgency}, Tipo: {specialty})"
-    }
-
-    # Realizar la solicitud
-    print(f"DNI paciente: {appointment_data['patient_id']}")
-    print(f"Razón: {appointment_data['reason']}")
-    print(f"URI: {hospital.uri}")
-    response = requests.post(
-        f"http://{hospital.uri}:8000/api/v1/specialty-appointments/",
-        json=appointment_data
-    )
-    print(f"Response: {response}")
-    pass
\ No newline at end of file
+                # Close the WebSocket connection
+                await websocket.close()
+                break
+    finally:
+        if receiving is not None:
+            receiving.cancel()
+        if ticket is not None:
+            admission.leave(ticket)
+        await conversation_sessions.close(appointment_id, connection_id)
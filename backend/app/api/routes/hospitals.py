@@ -1,18 +1,21 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Response
 from sqlmodel import Session
 
 from typing import Any
+from datetime import datetime
 import uuid
 
 from app.api.deps import get_current_active_superuser, get_current_user, get_db
+from app.api.services.catchment import get_catchment_volumes, refresh_catchments_task
+from app.api.services.hospital_latency import merged_latencies
+from app.api.services.hospital_registry import publish_registry_change, registry
 from app.crud import (
-    create_hospital, delete_hospital, get_hospital_by_id, 
-    get_hospitals, update_hospital
+    create_hospital, delete_hospital, get_hospital_by_id, update_hospital
 )
 from app.models import (
-    Hospital, HospitalCreate, HospitalResponse, 
-    HospitalsPublic, HospitalUpdate, User
+    CatchmentVolumesPublic, Hospital, HospitalCreate, HospitalLatencyPublic,
+    HospitalResponse, HospitalsPublic, HospitalUpdate, User
 )
 
 router = APIRouter(prefix="/hospitals", tags=["hospitals"])
@@ -20,14 +23,19 @@ router = APIRouter(prefix="/hospitals", tags=["hospitals"])
 
 @router.get("/", response_model=HospitalsPublic)
 def read_hospitals(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
-    db: Session = Depends(get_db)
+    if_none_match: str | None = Header(default=None),
 ) -> Any:
     """
-    Retrieve hospitals.
+    Retrieve hospitals from the in-memory registry snapshot.
     """
-    hospitals = get_hospitals(session=db, skip=skip, limit=limit)
+    snapshot = registry.snapshot()
+    if if_none_match == snapshot.etag:
+        return Response(status_code=304, headers={"ETag": snapshot.etag})
+    response.headers["ETag"] = snapshot.etag
+    hospitals = list(snapshot.hospitals[skip:skip + limit])
     return HospitalsPublic(data=hospitals, count=len(hospitals))
 
 
@@ -35,6 +43,7 @@ def read_hospitals(
 def create_hospital_api(
     *,
     hospital_in: HospitalCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     # current_user: User = Depends(get_current_active_superuser),
 ) -> Any:
@@ -42,30 +51,68 @@ def create_hospital_api(
     Create new hospital.
     """
     hospital = create_hospital(session=db, hospital_in=hospital_in)
+    publish_registry_change(db)
+    background_tasks.add_task(refresh_catchments_task, [(hospital.latitude, hospital.longitude)])
     return hospital
 
 
+@router.get("/catchments/volume", response_model=CatchmentVolumesPublic)
+def read_catchment_volumes(
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Patient volume per hospital catchment area.
+    """
+    volumes = get_catchment_volumes(db, start_date=start_date, end_date=end_date)
+    return CatchmentVolumesPublic(data=volumes, count=len(volumes))
+
+
 @router.get("/{hospital_id}", response_model=HospitalResponse)
 def read_hospital(
     *,
     hospital_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: str | None = Header(default=None),
     # current_user: User = Depends(get_current_user),
 ) -> Any:
     """
-    Get hospital by ID.
+    Get hospital by ID from the in-memory registry snapshot.
     """
-    hospital = get_hospital_by_id(session=db, hospital_id=hospital_id)
+    snapshot = registry.snapshot()
+    hospital = snapshot.get(hospital_id)
     if not hospital:
         raise HTTPException(status_code=404, detail="Hospital not found")
+    etag = snapshot.etags[hospital.id]
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return hospital
 
 
+@router.get("/{hospital_id}/latency", response_model=HospitalLatencyPublic)
+def read_hospital_latency(
+    *,
+    hospital_id: uuid.UUID,
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Rolling response time summary of the hospital health and appointment endpoints.
+    """
+    hospital = get_hospital_by_id(session=db, hospital_id=hospital_id)
+    if not hospital:
+        raise HTTPException(status_code=404, detail="Hospital not found")
+    latencies = sorted(merged_latencies(db, hospital_id).values(), key=lambda summary: summary.endpoint)
+    return HospitalLatencyPublic(hospital_id=hospital.id, degraded=hospital.degraded, data=latencies)
+
+
 @router.put("/{hospital_id}", response_model=HospitalResponse)
 def update_hospital_api(
     *,
     hospital_id: uuid.UUID,
     hospital_in: HospitalUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     # current_user: User = Depends(get_current_active_superuser),
 ) -> Any:
@@ -75,9 +122,15 @@ def update_hospital_api(
     hospital = get_hospital_by_id(session=db, hospital_id=hospital_id)
     if not hospital:
         raise HTTPException(status_code=404, detail="Hospital not found")
+    previous_coords = (hospital.latitude, hospital.longitude)
     hospital = update_hospital(
         session=db, db_hospital=hospital, hospital_in=hospital_in
     )
+    publish_registry_change(db)
+    if previous_coords != (hospital.latitude, hospital.longitude):
+        background_tasks.add_task(
+            refresh_catchments_task, [previous_coords, (hospital.latitude, hospital.longitude)]
+        )
     return hospital
 
 
@@ -85,6 +138,7 @@ def update_hospital_api(
 def delete_hospital_api(
     *,
     hospital_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     # current_user: User = Depends(get_current_active_superuser),
 ) -> Any:
@@ -95,4 +149,6 @@ def delete_hospital_api(
     if not hospital:
         raise HTTPException(status_code=404, detail="Hospital not found")
     hospital = delete_hospital(session=db, hospital_id=hospital_id)
+    publish_registry_change(db)
+    background_tasks.add_task(refresh_catchments_task, [(hospital.latitude, hospital.longitude)])
     return hospital 
\ No newline at end of file
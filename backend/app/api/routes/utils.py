@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
-from app.models import Message, AppointmentInfo
+from app.api.services.conversation import ConversationState
+from app.core import leader
+from app.core.metrics import render_metrics
+from app.models import Appointment, LeaderStatus, Message, AppointmentInfo
 from app.utils import generate_test_email, send_email
-from sqlmodel import select
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from datetime import datetime
+import uuid
 
 router = APIRouter(prefix="/utils", tags=["utils"])
 
@@ -34,22 +39,71 @@ async def health_check() -> bool:
     return True
 
 
-def register_message(db: Session, appointment_id: str, message: str, sender: str):
-        # Get the current highest order
-        stmt = select(AppointmentInfo).where(AppointmentInfo.appointment_id == appointment_id).order_by(AppointmentInfo.order.desc())
-        last_info = db.exec(stmt).first()
-        next_order = 1 if last_info is None else last_info.order + 1
-        
-        # Create a new AppointmentInfo entry
-        new_info = AppointmentInfo(
+@router.get("/metrics/", response_class=PlainTextResponse)
+async def metrics() -> str:
+    """
+    Process metrics in the Prometheus text format.
+    """
+    return render_metrics()
+
+
+@router.get("/leader/")
+async def leader_status() -> LeaderStatus:
+    """
+    This process and the process currently holding the background loops leader lock.
+    """
+    election = leader.election
+    return LeaderStatus(
+        identity=election.identity if election else leader.process_identity(),
+        is_leader=bool(election and election.is_leader),
+        leader=await leader.current_leader(),
+    )
+
+
+def register_messages(
+    db: Session,
+    appointment_id: str,
+    messages: list[str],
+    sender: str,
+    conversation: ConversationState | None = None,
+) -> None:
+    """
+    Append messages to the conversation of an appointment in one transaction.
+
+    The orders are reserved by bumping Appointment.message_seq with
+    UPDATE ... RETURNING, which locks the appointment row until the commit, so
+    concurrent writers get consecutive, gap-free orders without reading the
+    existing entries. The entries are then inserted in a single batch, and
+    appended to the in-memory conversation once committed.
+    """
+    if not messages:
+        return
+    last_order = db.exec(
+        update(Appointment)
+        .where(Appointment.id == uuid.UUID(str(appointment_id)))
+        .values(message_seq=Appointment.message_seq + len(messages))
+        .returning(Appointment.message_seq)
+    ).scalar_one()
+    first_order = last_order - len(messages) + 1
+    now = datetime.now()
+    db.add_all(
+        AppointmentInfo(
             appointment_id=appointment_id,
             content=message,
-            order=next_order,
+            order=first_order + offset,
             sender=sender,
             source_type="text",
-            created_at=datetime.now()
+            created_at=now,
         )
-        
-        db.add(new_info)
-        db.commit()
-        db.refresh(new_info)
\ No newline at end of file
+        for offset, message in enumerate(messages)
+    )
+    db.commit()
+    if conversation is not None:
+        for offset, message in enumerate(messages):
+            conversation.append(message, sender, first_order + offset)
+
+
+def register_message(
+    db: Session, appointment_id: str, message: str, sender: str, conversation: ConversationState | None = None
+) -> None:
+    register_messages(db, appointment_id, [message], sender, conversation)
@@ -0,0 +1,234 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import time
+import unicodedata
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from fastapi import WebSocket
+from sqlalchemy import text, update
+from sqlmodel import Session, func, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import Gauge
+from app.models import ConversationSession
+
+logger = logging.getLogger(__name__)
+
+# Serializes the global slot count of every process
+ADMISSION_LOCK_KEY = 7305_0002
+
+URGENT = 0
+NORMAL = 1
+
+triage_sessions = Gauge(
+    "medisur_triage_sessions",
+    "Triage conversations of this process, in progress (active) or in the waiting room (waiting)",
+    ["state"],
+)
+
+
+def _normalize(value: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def is_urgent(value: str) -> bool:
+    normalized = _normalize(value)
+    return any(_normalize(keyword) in normalized for keyword in settings.TRIAGE_URGENT_KEYWORDS)
+
+
+def claim_global_slot(appointment_id: str, connection_id: uuid.UUID) -> bool:
+    """
+    Take one of the TRIAGE_SESSIONS_GLOBAL slots for a registered conversation.
+    The transaction-level advisory lock makes the count and the claim atomic
+    across processes; slots are freed when the ConversationSession row goes.
+    Nothing is claimed if the connection's row is gone, e.g. taken over by a
+    newer connection of the appointment.
+    """
+    with Session(engine) as db:
+        db.exec(text("SELECT pg_advisory_xact_lock(:key)"), params={"key": ADMISSION_LOCK_KEY})
+        admitted = db.exec(
+            select(func.count())
+            .select_from(ConversationSession)
+            .where(ConversationSession.admitted_at.is_not(None))
+        ).one()
+        if admitted >= settings.TRIAGE_SESSIONS_GLOBAL:
+            return False
+        claimed = db.exec(
+            update(ConversationSession)
+            .where(
+                ConversationSession.appointment_id == uuid.UUID(appointment_id),
+                ConversationSession.connection_id == connection_id,
+            )
+            .values(admitted_at=datetime.now())
+            .returning(ConversationSession.appointment_id)
+        ).first()
+        if claimed is None:
+            logger.warning(f"No conversation row to admit for appointment {appointment_id}")
+            return False
+        db.commit()
+    return True
+
+
+@dataclass(order=True)
+class Ticket:
+    """Place of one conversation in the waiting room: urgent first, then by arrival"""
+
+    priority: int
+    seq: int
+    appointment_id: str = field(compare=False)
+    connection_id: uuid.UUID = field(compare=False)
+    position: int = field(default=0, compare=False)
+    admitted: bool = field(default=False, compare=False)
+    changed: asyncio.Event = field(default_factory=asyncio.Event, compare=False)
+
+
+class AdmissionController:
+    """
+    Bounds the triage conversations in progress to TRIAGE_SESSIONS_PER_WORKER
+    in this process and TRIAGE_SESSIONS_GLOBAL in the deployment.
+
+    Conversations over the limit wait in a per-process queue ordered by
+    arrival, with urgent ones first. Every change of position or admission
+    sets the ticket's changed event so the websocket can tell the patient.
+    """
+
+    def __init__(self) -> None:
+        self._queue: list[Ticket] = []
+        self._active = 0
+        self._seq = itertools.count()
+        self._lock = asyncio.Lock()
+        self._blocked_at = float("-inf")
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return len(self._queue)
+
+    def enter(self, appointment_id: str, connection_id: uuid.UUID, urgent: bool = False) -> Ticket:
+        ticket = Ticket(
+            priority=URGENT if urgent else NORMAL,
+            seq=next(self._seq),
+            appointment_id=appointment_id,
+            connection_id=connection_id,
+        )
+        bisect.insort(self._queue, ticket)
+        self._renumber()
+        return ticket
+
+    def boost(self, ticket: Ticket) -> None:
+        """Move a waiting ticket ahead of every non-urgent one"""
+        if ticket.admitted or ticket.priority == URGENT:
+            return
+        self._queue.remove(ticket)
+        ticket.priority = URGENT
+        bisect.insort(self._queue, ticket)
+        self._renumber()
+
+    def leave(self, ticket: Ticket) -> None:
+        """Free the ticket's place; the next waiting ticket is admitted in the background"""
+        if ticket.admitted:
+            self._active -= 1
+        elif ticket in self._queue:
+            self._queue.remove(ticket)
+            self._renumber()
+        self._update_metrics()
+        if self._queue:
+            asyncio.get_running_loop().create_task(self.pump())
+
+    async def pump(self) -> None:
+        """Admit waiting tickets while there are free slots in this process and globally"""
+        async with self._lock:
+            while self._queue and self._active < settings.TRIAGE_SESSIONS_PER_WORKER:
+                head = self._queue[0]
+                try:
+                    claimed = await asyncio.to_thread(claim_global_slot, head.appointment_id, head.connection_id)
+                except Exception as e:
+                    logger.error(f"Error claiming a triage slot: {str(e)}")
+                    claimed = False
+                if not claimed:
+                    self._blocked_at = time.monotonic()
+                    break
+                # The head may have left while the slot was being claimed
+                if self._queue and self._queue[0] is head:
+                    self._queue.pop(0)
+                    self._active += 1
+                    head.admitted = True
+                    head.position = 0
+                    head.changed.set()
+            self._renumber()
+
+    async def retry(self) -> None:
+        """Pump again once TRIAGE_ADMISSION_RETRY_SECONDS passed since the global limit was last hit"""
+        if time.monotonic() - self._blocked_at >= settings.TRIAGE_ADMISSION_RETRY_SECONDS:
+            await self.pump()
+
+    def _renumber(self) -> None:
+        for position, ticket in enumerate(self._queue, start=1):
+            if ticket.position != position:
+                ticket.position = position
+                ticket.changed.set()
+        self._update_metrics()
+
+    def _update_metrics(self) -> None:
+        triage_sessions.set(self._active, state="active")
+        triage_sessions.set(len(self._queue), state="waiting")
+
+
+admission = AdmissionController()
+
+
+async def wait_for_admission(websocket: WebSocket, ticket: Ticket) -> tuple[list[str], asyncio.Future | None] | None:
+    """
+    Keep the patient in the waiting room until the ticket is admitted, telling
+    them their position whenever it changes. Text sent while waiting is kept
+    for the first triage turn and checked for urgency keywords. Waiting is not
+    idleness, so there is no idle deadline here.
+
+    Returns the texts received and a pending receive, if any, for the
+    conversation to continue from, or None if the patient disconnected.
+    """
+    texts: list[str] = []
+    receiving: asyncio.Future | None = None
+    announced = None
+    try:
+        await admission.retry()
+        while not ticket.admitted:
+            ticket.changed.clear()
+            if ticket.position != announced:
+                announced = ticket.position
+                await websocket.send_json({"type": "waiting", "position": ticket.position})
+            if receiving is None:
+                receiving = asyncio.ensure_future(websocket.receive())
+            changed = asyncio.ensure_future(ticket.changed.wait())
+            done, _ = await asyncio.wait(
+                {receiving, changed},
+                timeout=settings.TRIAGE_ADMISSION_RETRY_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            changed.cancel()
+            if receiving in done:
+                message = receiving.result()
+                receiving = None
+                if message["type"] == "websocket.disconnect":
+                    return None
+                if message.get("text"):
+                    texts.append(message["text"])
+                    if is_urgent(message["text"]):
+                        admission.boost(ticket)
+            if not done:
+                # Slots freed in other processes are only seen by retrying
+                await admission.retry()
+    except BaseException:
+        if receiving is not None:
+            receiving.cancel()
+        raise
+    return texts, receiving
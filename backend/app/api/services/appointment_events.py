@@ -0,0 +1,130 @@
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import datetime
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.metrics import Gauge
+from app.core.pubsub import APPOINTMENT_EVENTS_CHANNEL, listener, notify
+from app.models import Appointment
+
+logger = logging.getLogger(__name__)
+
+# Sent when events may have been lost: the dashboard reloads its list once
+RESYNC = {"event": "resync"}
+
+open_streams = Gauge(
+    "medisur_dashboard_streams",
+    "Hospital dashboard event streams open in this process",
+)
+
+
+def publish_appointment_event(
+    db: Session, appointment: Appointment, event: str, hospital_id: str | None = None
+) -> None:
+    """
+    Tell the dashboards of a hospital, the appointment's one by default, in
+    every process, about a change when the caller's transaction commits.
+    Appointments not assigned to a hospital are on no dashboard.
+    """
+    hospital_id = hospital_id or appointment.hospital_assigned
+    if not hospital_id:
+        return
+    message = {
+        "event": event,
+        "occurred_at": datetime.now().isoformat(),
+        "appointment_id": str(appointment.id),
+        "hospital_assigned": hospital_id,
+        "status": appointment.status.value,
+        "medical_specialty": appointment.medical_specialty,
+        "prority": appointment.prority,
+        "contagious": appointment.contagious,
+        "scheduled_time": appointment.scheduled_time.isoformat() if appointment.scheduled_time else None,
+    }
+    notify(db, APPOINTMENT_EVENTS_CHANNEL, json.dumps(message))
+
+
+class DashboardStreams:
+    """
+    Event queues of the dashboards connected to this process, by hospital.
+
+    A dashboard that does not keep up has its queue replaced by a single
+    resync event instead of growing without bound.
+    """
+
+    def __init__(self) -> None:
+        self._queues: dict[str, set[asyncio.Queue]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(queues) for queues in self._queues.values())
+
+    def subscribe(self, hospital_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.DASHBOARD_STREAM_QUEUE_SIZE)
+        self._queues.setdefault(hospital_id, set()).add(queue)
+        open_streams.set(len(self))
+        return queue
+
+    def unsubscribe(self, hospital_id: str, queue: asyncio.Queue) -> None:
+        queues = self._queues.get(hospital_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._queues[hospital_id]
+        open_streams.set(len(self))
+
+    def _offer(self, queue: asyncio.Queue, event: dict) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    def dispatch(self, payload: str | None) -> None:
+        """Handle a notification of the appointment events channel"""
+        if payload is None:
+            # The listener (re)connected and may have missed events
+            for queues in self._queues.values():
+                for queue in queues:
+                    self._offer(queue, RESYNC)
+            return
+        event = json.loads(payload)
+        for queue in self._queues.get(event["hospital_assigned"], ()):
+            self._offer(queue, event)
+
+
+dashboard_streams = DashboardStreams()
+listener.subscribe(APPOINTMENT_EVENTS_CHANNEL, dashboard_streams.dispatch)
+
+
+def format_event(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream_events(
+    hospital_id: str, is_disconnected: Callable[[], Awaitable[bool]], streams: DashboardStreams = dashboard_streams
+) -> AsyncIterator[str]:
+    """
+    Server-sent events of one hospital dashboard, with a comment line every
+    DASHBOARD_STREAM_KEEPALIVE_SECONDS so proxies keep the connection open and
+    a closed dashboard is noticed.
+    """
+    queue = streams.subscribe(hospital_id)
+    try:
+        # Reconnect delay for the browser's EventSource, in milliseconds
+        yield f"retry: {int(settings.DASHBOARD_STREAM_RETRY_SECONDS * 1000)}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.DASHBOARD_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(event)
+    finally:
+        streams.unsubscribe(hospital_id, queue)
@@ -0,0 +1,123 @@
+import logging
+
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.core.pubsub import APPOINTMENT_STATS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# Serializes installing the trigger when several processes start together
+ROLLUP_LOCK_KEY = 7305_0003
+
+_KEY = "day, hospital_assigned, medical_specialty, prority, contagious, status"
+
+
+def _key_of(row: str) -> str:
+    """Rollup key of an appointment row: OLD, NEW or the table itself"""
+    return (
+        f"{row}.request_start_time::date, coalesce({row}.hospital_assigned, ''), "
+        f"coalesce({row}.medical_specialty, ''), coalesce({row}.prority, ''), {row}.contagious, {row}.status"
+    )
+
+
+def _add(row: str, delta: int) -> str:
+    return f"""
+        INSERT INTO appointmentdailycount ({_KEY}, count) VALUES ({_key_of(row)}, {delta})
+        ON CONFLICT ({_KEY}) DO UPDATE SET count = appointmentdailycount.count + EXCLUDED.count;"""
+
+
+# Every writer of appointment, the ORM and bulk UPDATEs alike, moves one unit
+# from the old key to the new one in its own transaction. Identical
+# notifications are folded, so a transaction announces new statistics once.
+APPLY_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION appointment_daily_count_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND ({_key_of("OLD")}) IS NOT DISTINCT FROM ({_key_of("NEW")}) THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN{_add("OLD", -1)}
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN{_add("NEW", 1)}
+    END IF;
+    PERFORM pg_notify('{APPOINTMENT_STATS_CHANNEL}', '');
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+APPLY_TRIGGER = """
+CREATE TRIGGER appointment_daily_count
+AFTER INSERT OR DELETE
+OR UPDATE OF request_start_time, hospital_assigned, medical_specialty, prority, contagious, status
+ON appointment FOR EACH ROW EXECUTE FUNCTION appointment_daily_count_apply()
+"""
+
+TRUNCATE_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION appointment_daily_count_truncate() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM appointmentdailycount;
+    PERFORM pg_notify('{APPOINTMENT_STATS_CHANNEL}', '');
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TRUNCATE_TRIGGER = """
+CREATE TRIGGER appointment_daily_count_truncate
+AFTER TRUNCATE ON appointment FOR EACH STATEMENT EXECUTE FUNCTION appointment_daily_count_truncate()
+"""
+
+
+def rebuild_rollup(session: Session) -> int:
+    """
+    Recount the whole rollup from the appointment table. Appointment writes
+    wait for the rebuild, reads of either table do not.
+    """
+    connection = session.connection()
+    connection.exec_driver_sql("LOCK TABLE appointment IN SHARE MODE")
+    connection.exec_driver_sql("DELETE FROM appointmentdailycount")
+    rows = connection.exec_driver_sql(
+        f"INSERT INTO appointmentdailycount ({_KEY}, count) "
+        f"SELECT {_key_of('appointment')}, count(*) FROM appointment GROUP BY 1, 2, 3, 4, 5, 6"
+    ).rowcount
+    connection.exec_driver_sql("SELECT pg_notify(%s, '')", (APPOINTMENT_STATS_CHANNEL,))
+    session.commit()
+    logger.info(f"Rebuilt appointment rollup: {rows} rows")
+    return rows
+
+
+def ensure_rollup() -> None:
+    """
+    Install the rollup triggers, or update their functions, on startup. The
+    first install also backfills the table; creating the trigger locks out
+    appointment writes until then, so no change is counted twice or missed.
+    """
+    with Session(engine) as session:
+        connection = session.connection()
+        connection.exec_driver_sql("SELECT pg_advisory_xact_lock(%s)", (ROLLUP_LOCK_KEY,))
+        triggers = {
+            name
+            for (name,) in connection.exec_driver_sql(
+                "SELECT tgname FROM pg_trigger WHERE tgrelid = 'appointment'::regclass"
+            )
+        }
+        installed = "appointment_daily_count" in triggers
+        connection.exec_driver_sql(APPLY_FUNCTION)
+        connection.exec_driver_sql(TRUNCATE_FUNCTION)
+        # CREATE OR REPLACE TRIGGER needs Postgres 14, and dropping a trigger
+        # waits for and then blocks every read of the table, so triggers that
+        # exist are left alone
+        if not installed:
+            connection.exec_driver_sql(APPLY_TRIGGER)
+        if "appointment_daily_count_truncate" not in triggers:
+            connection.exec_driver_sql(TRUNCATE_TRIGGER)
+        if installed:
+            session.commit()
+        else:
+            rebuild_rollup(session)
+
+
+if __name__ == "__main__":
+    with Session(engine) as session:
+        rebuild_rollup(session)
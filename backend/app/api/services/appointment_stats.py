@@ -0,0 +1,68 @@
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import DateTime, cast
+from sqlmodel import Session, func, select
+
+from app.models import (
+    Appointment,
+    AppointmentCountBucket,
+    AppointmentDailyCount,
+    StatsDimension,
+    StatsGranularity,
+)
+
+
+def count_appointments(
+    db: Session,
+    granularity: StatsGranularity,
+    start_date: date,
+    end_date: date,
+    group_by: list[StatsDimension] | None = None,
+    contagious: bool | None = None,
+    hospital_assigned: str | None = None,
+    medical_specialty: str | None = None,
+    prority: str | None = None,
+) -> list[AppointmentCountBucket]:
+    """
+    Appointments per time bucket between two inclusive days, optionally broken
+    down by hospital, specialty and priority. Only non-empty buckets are
+    returned, in order.
+
+    Days and weeks are summed from the daily rollup, so the cost depends on the
+    date range and not on the number of appointments. Hours are finer than the
+    rollup and are counted on the appointment table.
+    """
+    if granularity == StatsGranularity.HOUR:
+        source, day = Appointment, Appointment.request_start_time
+        start, end = datetime.combine(start_date, time.min), datetime.combine(end_date + timedelta(days=1), time.min)
+        bucket = func.date_trunc(granularity.value, day).label("bucket")
+        total = func.count()
+    else:
+        source, day = AppointmentDailyCount, AppointmentDailyCount.day
+        start, end = start_date, end_date + timedelta(days=1)
+        # date_trunc of a date would return a timestamp with time zone
+        bucket = func.date_trunc(granularity.value, cast(day, DateTime)).label("bucket")
+        total = func.sum(AppointmentDailyCount.count)
+    # The rollup stores missing values as ""
+    dimensions = [
+        func.nullif(getattr(source, dimension.value), "").label(dimension.value)
+        for dimension in dict.fromkeys(group_by or [])
+    ]
+    filters = [day >= start, day < end]
+    if contagious is not None:
+        filters.append(source.contagious == contagious)
+    if hospital_assigned:
+        filters.append(source.hospital_assigned == hospital_assigned)
+    if medical_specialty:
+        filters.append(source.medical_specialty == medical_specialty)
+    if prority:
+        filters.append(source.prority == prority)
+    statement = (
+        select(bucket, *dimensions, total.label("count"))
+        .where(*filters)
+        .group_by(bucket, *dimensions)
+        # Rollup rows of appointments that moved to another key are left at 0
+        .having(total > 0)
+        .order_by(bucket, *dimensions)
+    )
+    return [AppointmentCountBucket(**row._mapping) for row in db.exec(statement).all()]
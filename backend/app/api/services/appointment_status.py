@@ -0,0 +1,23 @@
+from sqlmodel import Session
+
+from app.api.services.appointment_events import publish_appointment_event
+from app.api.services.conversation_sessions import push_to_conversation
+from app.api.services.notification_outbox import enqueue_status_event
+from app.models import Appointment
+
+
+def publish_status_change(db: Session, appointment: Appointment, dashboard: bool = True) -> None:
+    """
+    Announce the new status of an appointment when the caller's transaction
+    commits: the event for the hospital, the message for the patient's open
+    conversation and, unless the caller already sends another one, the event
+    for the hospital dashboard.
+    """
+    enqueue_status_event(db, appointment)
+    push_to_conversation(db, appointment.id, {
+        "type": "status",
+        "value": appointment.status.value,
+        "scheduled_time": appointment.scheduled_time,
+    })
+    if dashboard:
+        publish_appointment_event(db, appointment, "status")
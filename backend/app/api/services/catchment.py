@@ -0,0 +1,141 @@
+import logging
+from collections.abc import Iterable
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, delete, func, select
+
+from app.api.services.geohash import cells_within, geohash_center, geohash_encode
+from app.api.services.spatial_index import HospitalSpatialIndex
+from app.core.config import settings
+from app.core.db import engine
+from app.crud import get_hospitals
+from app.models import Appointment, CatchmentVolume, Hospital, HospitalCatchment
+
+logger = logging.getLogger(__name__)
+
+
+def _assign_cells(index: HospitalSpatialIndex, cells: Iterable[str]) -> tuple[list[dict], list[str]]:
+    """Split cells into rows owned by their nearest hospital and cells out of every radius"""
+    rows, orphaned = [], []
+    now = datetime.now()
+    for geohash in cells:
+        lat, lon = geohash_center(geohash)
+        nearest = index.nearest(lat, lon, 1)
+        if nearest and nearest[0][0] <= settings.CATCHMENT_RADIUS_KM:
+            distance, hospital = nearest[0]
+            rows.append({
+                "geohash": geohash,
+                "hospital_id": hospital.id,
+                "distance_km": distance,
+                "updated_at": now,
+            })
+        else:
+            orphaned.append(geohash)
+    return rows, orphaned
+
+
+def _upsert_cells(session: Session, rows: list[dict]) -> None:
+    for start in range(0, len(rows), 1000):
+        statement = insert(HospitalCatchment).values(rows[start:start + 1000])
+        statement = statement.on_conflict_do_update(
+            index_elements=[HospitalCatchment.geohash],
+            set_={
+                "hospital_id": statement.excluded.hospital_id,
+                "distance_km": statement.excluded.distance_km,
+                "updated_at": statement.excluded.updated_at,
+            },
+        )
+        session.exec(statement)
+
+
+def rebuild_catchments(session: Session) -> int:
+    """Recompute the whole geohash -> hospital table from the hospital registry"""
+    hospitals = get_hospitals(session=session, limit=None)
+    index = HospitalSpatialIndex(hospitals)
+    cells: set[str] = set()
+    for hospital in hospitals:
+        if hospital.latitude and hospital.longitude:
+            cells |= cells_within(hospital.latitude, hospital.longitude, settings.CATCHMENT_RADIUS_KM)
+    rows, _ = _assign_cells(index, cells)
+
+    session.exec(delete(HospitalCatchment))
+    _upsert_cells(session, rows)
+    session.commit()
+    logger.info(f"Rebuilt catchments: {len(rows)} cells for {index.size} hospitals")
+    return len(rows)
+
+
+def refresh_catchments(session: Session, points: Iterable[tuple[float, float]]) -> int:
+    """
+    Incrementally recompute the cells around the given coordinates, i.e. the
+    old and new position of a hospital that was created, moved or deleted.
+    Only cells within CATCHMENT_RADIUS_KM of those points can change owner.
+    """
+    cells: set[str] = set()
+    for latitude, longitude in points:
+        if latitude and longitude:
+            cells |= cells_within(latitude, longitude, settings.CATCHMENT_RADIUS_KM)
+    if not cells:
+        return 0
+
+    index = HospitalSpatialIndex(get_hospitals(session=session, limit=None))
+    rows, orphaned = _assign_cells(index, cells)
+    if orphaned:
+        session.exec(delete(HospitalCatchment).where(col(HospitalCatchment.geohash).in_(orphaned)))
+    _upsert_cells(session, rows)
+    session.commit()
+    logger.info(f"Refreshed {len(cells)} catchment cells")
+    return len(cells)
+
+
+def refresh_catchments_task(points: list[tuple[float, float]]) -> None:
+    """Background task run after hospital CRUD, with its own session"""
+    with Session(engine) as session:
+        refresh_catchments(session, points)
+
+
+def ensure_catchments() -> None:
+    """Build the catchment table on startup when it has never been built"""
+    with Session(engine) as session:
+        if session.exec(select(HospitalCatchment).limit(1)).first() is None:
+            rebuild_catchments(session)
+
+
+def lookup_catchment(session: Session, latitude: float, longitude: float) -> HospitalCatchment | None:
+    """Owner of the cell containing the coordinate, a single primary key lookup"""
+    return session.get(HospitalCatchment, geohash_encode(latitude, longitude))
+
+
+def get_catchment_volumes(
+    session: Session,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+) -> list[CatchmentVolume]:
+    """Number of cells and of appointments whose patient location falls in each catchment"""
+    join_condition = Appointment.geohash == HospitalCatchment.geohash
+    if start_date:
+        join_condition &= Appointment.request_start_time >= start_date
+    if end_date:
+        join_condition &= Appointment.request_start_time < end_date
+    statement = (
+        select(
+            Hospital.id,
+            Hospital.name,
+            func.count(func.distinct(HospitalCatchment.geohash)),
+            func.count(Appointment.id),
+        )
+        .join(HospitalCatchment, HospitalCatchment.hospital_id == Hospital.id)
+        .outerjoin(Appointment, join_condition)
+        .group_by(Hospital.id, Hospital.name)
+        .order_by(func.count(Appointment.id).desc())
+    )
+    return [
+        CatchmentVolume(hospital_id=hospital_id, hospital_name=name, cells=cells, appointments=appointments)
+        for hospital_id, name, cells, appointments in session.exec(statement).all()
+    ]
+
+
+if __name__ == "__main__":
+    with Session(engine) as session:
+        rebuild_catchments(session)
@@ -0,0 +1,62 @@
+import uuid
+from dataclasses import dataclass, field
+
+from sqlmodel import Session, select
+
+from app.models import AppointmentInfo
+
+ASSISTANT = "assistant"
+
+
+@dataclass(frozen=True)
+class ConversationEntry:
+    order: int
+    sender: str
+    content: str
+
+
+def load_entries(db: Session, appointment_id: str, after: int = 0) -> list[ConversationEntry]:
+    """
+    Messages of a conversation with an order above after, oldest first. Reads
+    a range of the (appointment_id, order) unique index, so a client resuming
+    from its last seen message only costs the messages it missed.
+    """
+    rows = db.exec(
+        select(AppointmentInfo.order, AppointmentInfo.sender, AppointmentInfo.content)
+        .where(AppointmentInfo.appointment_id == uuid.UUID(str(appointment_id)), AppointmentInfo.order > after)
+        .order_by(AppointmentInfo.order)
+    ).all()
+    return [ConversationEntry(order=order, sender=sender, content=content) for order, sender, content in rows]
+
+
+@dataclass
+class ConversationState:
+    """
+    Transcript of one appointment conversation, kept in memory by the websocket
+    that serves it.
+
+    It is loaded once, with the first message the patient sends on a
+    connection, and appended to whenever a message is registered, so each
+    triage turn reads the chat and the number of questions already asked
+    without querying AppointmentInfo.
+    """
+
+    appointment_id: str
+    entries: list[ConversationEntry] = field(default_factory=list)
+    questions_asked: int = 0
+
+    @classmethod
+    def load(cls, db: Session, appointment_id: str) -> "ConversationState":
+        state = cls(appointment_id=str(appointment_id))
+        for entry in load_entries(db, appointment_id):
+            state.append(entry.content, entry.sender, entry.order)
+        return state
+
+    @property
+    def chat(self) -> list[str]:
+        return [entry.content for entry in self.entries]
+
+    def append(self, content: str, sender: str, order: int) -> None:
+        self.entries.append(ConversationEntry(order=order, sender=sender, content=content))
+        if sender == ASSISTANT:
+            self.questions_asked += 1
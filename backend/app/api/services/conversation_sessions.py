@@ -0,0 +1,259 @@
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from fastapi import WebSocket, status
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.leader import process_identity
+from app.core.metrics import Gauge
+from app.core.pubsub import CONVERSATION_CHANNEL, listener, notify
+from app.models import ConversationSession
+
+logger = logging.getLogger(__name__)
+
+open_sessions = Gauge(
+    "medisur_conversation_sessions",
+    "Patient websocket conversations open in this process",
+)
+
+
+def push_to_conversation(db: Session, appointment_id: uuid.UUID, message: dict) -> None:
+    """
+    Send a message to the patient's websocket, whichever process holds it, when
+    the caller's transaction commits. Nothing is sent if no conversation of the
+    appointment is open.
+    """
+    if db.get(ConversationSession, appointment_id) is None:
+        return
+    notify(
+        db,
+        CONVERSATION_CHANNEL,
+        json.dumps({"type": "push", "appointment_id": str(appointment_id), "message": message}, default=str),
+    )
+
+
+@dataclass
+class LocalSocket:
+    connection_id: uuid.UUID
+    connected_at: datetime
+    websocket: WebSocket
+
+
+class ConversationSessions:
+    """
+    Patient websockets open in this process, registered in the
+    ConversationSession table so any process can reach them.
+
+    Messages for a conversation travel over the conversation notification
+    channel and are delivered by the process holding the socket. A new
+    connection for an appointment takes over: the previous socket, in this or
+    another process, is closed. Every process refreshes the rows of its own
+    sockets; rows of processes that died stop being refreshed and are reaped
+    after CONVERSATION_SESSION_TTL_SECONDS.
+    """
+
+    def __init__(self, worker: str | None = None) -> None:
+        self.worker = worker or process_identity()
+        self._sockets: dict[str, LocalSocket] = {}
+
+    def __len__(self) -> int:
+        return len(self._sockets)
+
+    def _register(self, appointment_id: str, connection_id: uuid.UUID, now: datetime) -> None:
+        with Session(engine) as db:
+            statement = insert(ConversationSession).values(
+                appointment_id=uuid.UUID(appointment_id),
+                connection_id=connection_id,
+                worker=self.worker,
+                connected_at=now,
+                last_seen_at=now,
+            )
+            db.exec(
+                statement.on_conflict_do_update(
+                    index_elements=["appointment_id"],
+                    # A new connection has to be admitted again
+                    set_={
+                        "connection_id": connection_id,
+                        "worker": self.worker,
+                        "connected_at": now,
+                        "last_seen_at": now,
+                        "admitted_at": None,
+                    },
+                )
+            )
+            takeover = {
+                "type": "takeover",
+                "appointment_id": appointment_id,
+                "worker": self.worker,
+                "connected_at": now.isoformat(),
+            }
+            notify(db, CONVERSATION_CHANNEL, json.dumps(takeover))
+            db.commit()
+
+    def _unregister(self, appointment_id: str, connection_id: uuid.UUID) -> None:
+        with Session(engine) as db:
+            db.exec(
+                delete(ConversationSession).where(
+                    ConversationSession.appointment_id == uuid.UUID(appointment_id),
+                    ConversationSession.connection_id == connection_id,
+                )
+            )
+            db.commit()
+
+    async def open(self, appointment_id: str, websocket: WebSocket) -> uuid.UUID:
+        connection_id = uuid.uuid4()
+        now = datetime.now()
+        # Database work runs in a thread so it never blocks the event loop. A row
+        # written for a connection cancelled meanwhile is never refreshed and gets reaped
+        await asyncio.to_thread(self._register, appointment_id, connection_id, now)
+        previous = self._sockets.get(appointment_id)
+        self._sockets[appointment_id] = LocalSocket(connection_id, now, websocket)
+        open_sessions.set(len(self._sockets))
+        if previous is not None:
+            asyncio.get_running_loop().create_task(self._close(previous.websocket))
+        return connection_id
+
+    async def close(self, appointment_id: str, connection_id: uuid.UUID) -> None:
+        """Forget a socket that ended; a newer connection of the appointment is left alone"""
+        current = self._sockets.get(appointment_id)
+        if current is not None and current.connection_id == connection_id:
+            del self._sockets[appointment_id]
+            open_sessions.set(len(self._sockets))
+        # Shielded: the connection's task is often being cancelled while it closes,
+        # and the row should still go right away rather than when it expires
+        await asyncio.shield(
+            asyncio.get_running_loop().run_in_executor(None, self._unregister, appointment_id, connection_id)
+        )
+
+    async def _close(self, websocket: WebSocket) -> None:
+        try:
+            await websocket.close()
+        except Exception:
+            # Already closed by the client
+            pass
+
+    async def _send(self, appointment_id: str, websocket: WebSocket, message: dict) -> None:
+        try:
+            await websocket.send_json(message)
+        except Exception as e:
+            logger.warning(f"Could not push to conversation {appointment_id}: {str(e)}")
+
+    def dispatch(self, payload: str | None) -> None:
+        """Handle a notification of the conversation channel"""
+        if payload is None:
+            return
+        event = json.loads(payload)
+        appointment_id = event["appointment_id"]
+        current = self._sockets.get(appointment_id)
+        if current is None:
+            return
+        loop = asyncio.get_running_loop()
+        if event["type"] == "takeover":
+            # Takeovers within this process are handled by open(); a late
+            # notification of an older connection elsewhere is ignored
+            if event["worker"] == self.worker or datetime.fromisoformat(event["connected_at"]) < current.connected_at:
+                return
+            del self._sockets[appointment_id]
+            open_sessions.set(len(self._sockets))
+            loop.create_task(self._close(current.websocket))
+        elif event["type"] == "push":
+            loop.create_task(self._send(appointment_id, current.websocket, event["message"]))
+
+    def heartbeat(self) -> int:
+        """Refresh the rows of the sockets of this process and reap the expired ones, returning how many were reaped"""
+        now = datetime.now()
+        with Session(engine) as db:
+            # Copied first: the event loop adds and removes sockets meanwhile
+            appointment_ids = [uuid.UUID(a) for a in list(self._sockets)]
+            if appointment_ids:
+                db.exec(
+                    update(ConversationSession)
+                    .where(
+                        ConversationSession.appointment_id.in_(appointment_ids),
+                        ConversationSession.worker == self.worker,
+                    )
+                    .values(last_seen_at=now)
+                )
+            reaped = db.exec(
+                delete(ConversationSession).where(
+                    ConversationSession.last_seen_at
+                    < now - timedelta(seconds=settings.CONVERSATION_SESSION_TTL_SECONDS)
+                )
+            ).rowcount
+            db.commit()
+        return reaped
+
+
+class Keepalive:
+    """
+    Idle deadline of one patient websocket.
+
+    Dead connections are found by uvicorn, whose protocol-level pings every
+    browser answers on its own (see --ws-ping-interval in the Dockerfile). A
+    patient who is connected but sends nothing for WS_IDLE_TIMEOUT_SECONDS
+    after the server last waited for them has abandoned the conversation, and
+    the connection is closed so its resources are released. Time the server
+    spends on a reply does not count.
+    """
+
+    def __init__(self, websocket: WebSocket) -> None:
+        self.websocket = websocket
+
+    async def close(self, reason: str) -> dict:
+        """Close the connection, returning the disconnect message the conversation loop ends on"""
+        try:
+            await self.websocket.close(code=status.WS_1001_GOING_AWAY, reason=reason)
+        except Exception:
+            # The client is already gone
+            pass
+        return {"type": "websocket.disconnect", "code": status.WS_1001_GOING_AWAY, "reason": reason}
+
+    async def receive(self, receiving: asyncio.Future | None = None) -> dict:
+        """Next patient message, or the close after the idle deadline; continues a pending receive if given"""
+        if receiving is None:
+            receiving = asyncio.ensure_future(self.websocket.receive())
+        try:
+            done, _ = await asyncio.wait({receiving}, timeout=settings.WS_IDLE_TIMEOUT_SECONDS)
+            if not done:
+                return await self.close("idle timeout")
+            return receiving.result()
+        finally:
+            # Nothing may be left reading from a socket that is being torn down
+            if not receiving.done():
+                receiving.cancel()
+
+
+conversation_sessions = ConversationSessions()
+listener.subscribe(CONVERSATION_CHANNEL, conversation_sessions.dispatch)
+
+
+async def heartbeat_conversations_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.CONVERSATION_SESSION_HEARTBEAT_SECONDS)
+        try:
+            reaped = await asyncio.to_thread(conversation_sessions.heartbeat)
+            if reaped:
+                logger.info(f"Reaped {reaped} expired conversation sessions")
+        except Exception as e:
+            logger.error(f"Error refreshing conversation sessions: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan_conversations():
+    """Every process keeps the registry rows of its own websockets alive"""
+    task = asyncio.create_task(heartbeat_conversations_loop())
+    yield
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
@@ -0,0 +1,209 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import date, timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlmodel import Session
+
+from app.api.services.appointment_stats import count_appointments
+from app.core.config import settings
+from app.core.pubsub import APPOINTMENT_STATS_CHANNEL, listener
+from app.models import CaseForecast, CaseForecastPoint, CaseTrendPoint, StatsGranularity
+
+logger = logging.getLogger(__name__)
+
+# Two-sided 95% quantile of the normal distribution, for prediction intervals
+INTERVAL_Z = 1.96
+# Gamma prior of the reproduction number used by Cori et al.: shape 1, scale 5
+RT_PRIOR_SHAPE = 1.0
+RT_PRIOR_SCALE = 5.0
+
+
+def daily_cases(db: Session, start_date: date, end_date: date, **filters) -> np.ndarray:
+    """Cases of every day between two inclusive dates, days without cases included"""
+    cases = np.zeros((end_date - start_date).days + 1)
+    for bucket in count_appointments(db, StatsGranularity.DAY, start_date, end_date, **filters):
+        cases[(bucket.bucket.date() - start_date).days] = bucket.count
+    return cases
+
+
+def _log_slopes(windows: np.ndarray) -> np.ndarray:
+    """Least-squares slope of each row against 0..n-1"""
+    x = np.arange(windows.shape[-1]) - (windows.shape[-1] - 1) / 2
+    return windows @ x / (x @ x)
+
+
+def rolling_growth(cases: np.ndarray, window: int) -> np.ndarray:
+    """
+    Daily growth rate over the window of days ending on each day, from a line
+    fitted to log(1 + cases). NaN until a full window is available.
+    """
+    growth = np.full(len(cases), np.nan)
+    if len(cases) >= max(window, 2):
+        growth[window - 1:] = np.expm1(_log_slopes(sliding_window_view(np.log1p(cases), window)))
+    return growth
+
+
+def serial_interval(mean: float, sd: float) -> np.ndarray:
+    """
+    Gamma distributed serial interval discretized per day; weights[s] is the
+    share of secondary cases showing symptoms s days after their source.
+    """
+    shape, scale = (mean / sd) ** 2, sd**2 / mean
+    days = np.arange(1, math.ceil(mean + 4 * sd) + 1)
+    density = days ** (shape - 1) * np.exp(-days / scale)
+    return np.concatenate(([0.0], density / density.sum()))
+
+
+def reproduction_number(cases: np.ndarray, weights: np.ndarray, window: int) -> np.ndarray:
+    """
+    Instantaneous reproduction number over the window ending on each day, as
+    in Cori et al.: posterior mean given the cases of the window and the
+    infectiousness of earlier cases weighted by the serial interval. NaN where
+    the window is incomplete or no earlier case could have infected anyone.
+    """
+    rt = np.full(len(cases), np.nan)
+    if len(cases) < window:
+        return rt
+    infectiousness = np.convolve(cases, weights)[: len(cases)]
+    incidence = sliding_window_view(cases, window).sum(axis=1)
+    pressure = sliding_window_view(infectiousness, window).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimate = (RT_PRIOR_SHAPE + incidence) / (1 / RT_PRIOR_SCALE + pressure)
+    rt[window - 1:] = np.where(pressure > 0, estimate, np.nan)
+    return rt
+
+
+def extrapolate(cases: np.ndarray, window: int, horizon: int) -> tuple[float, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Log-linear fit of the last window of days carried forward horizon days:
+    the daily log growth, then the expected cases and their prediction
+    interval for each future day.
+    """
+    y = np.log1p(cases[-window:])
+    n = len(y)
+    if n < 2:
+        flat = np.full(horizon, cases[-1] if n else 0.0)
+        return 0.0, flat, flat, flat
+    x = np.arange(n) - (n - 1) / 2
+    slope = float(_log_slopes(y))
+    residuals = y - (y.mean() + slope * x)
+    sigma = math.sqrt(residuals @ residuals / (n - 2)) if n > 2 else 0.0
+    ahead = (n - 1) / 2 + np.arange(1, horizon + 1)
+    center = y.mean() + slope * ahead
+    spread = INTERVAL_Z * sigma * np.sqrt(1 + 1 / n + ahead**2 / (x @ x))
+    return slope, np.expm1(center), np.maximum(np.expm1(center - spread), 0.0), np.expm1(center + spread)
+
+
+def _optional(value: float) -> float | None:
+    return None if math.isnan(value) else float(value)
+
+
+def build_forecast(cases: np.ndarray, start_date: date, horizon: int) -> CaseForecast:
+    window = settings.FORECAST_WINDOW_DAYS
+    growth = rolling_growth(cases, window)
+    rt = reproduction_number(
+        cases,
+        serial_interval(settings.FORECAST_SERIAL_INTERVAL_MEAN_DAYS, settings.FORECAST_SERIAL_INTERVAL_SD_DAYS),
+        window,
+    )
+    slope, expected, lower, upper = extrapolate(cases, window, horizon)
+    last_day = start_date + timedelta(days=len(cases) - 1)
+    return CaseForecast(
+        series=[
+            CaseTrendPoint(
+                day=start_date + timedelta(days=index),
+                cases=int(cases[index]),
+                growth_rate=_optional(growth[index]),
+                rt=_optional(rt[index]),
+            )
+            for index in range(len(cases))
+        ],
+        growth_rate=math.expm1(slope),
+        doubling_time=math.log(2) / slope if slope > 0 else None,
+        rt=_optional(rt[-1]) if len(rt) else None,
+        forecast=[
+            CaseForecastPoint(
+                day=last_day + timedelta(days=index + 1),
+                cases=float(expected[index]),
+                lower=float(lower[index]),
+                upper=float(upper[index]),
+            )
+            for index in range(horizon)
+        ],
+    )
+
+
+class ForecastCache:
+    """
+    Forecasts computed by this process, by filters and day.
+
+    The appointment rollup trigger notifies every process when statistics
+    change, which invalidates all of them at once. Each key is computed under
+    its own lock, so viewers asking for the same forecast meanwhile wait for it
+    and share the result while other forecasts are served. A maximum age
+    bounds staleness if notifications are missed.
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[tuple, tuple[int, float, CaseForecast]] = OrderedDict()
+        self._computing: dict[tuple, threading.Lock] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self, payload: str | None = None) -> None:
+        self._generation += 1
+
+    def _cached(self, key: tuple) -> CaseForecast | None:
+        """The fresh forecast of the key, if any; holds the lock"""
+        entry = self._entries.get(key)
+        if (
+            entry is None
+            or entry[0] != self._generation
+            or time.monotonic() - entry[1] >= settings.FORECAST_CACHE_MAX_AGE_SECONDS
+        ):
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def get(self, key: tuple, compute: Callable[[], CaseForecast]) -> CaseForecast:
+        with self._lock:
+            forecast = self._cached(key)
+            if forecast is not None:
+                return forecast
+            computing = self._computing.setdefault(key, threading.Lock())
+        with computing:
+            try:
+                with self._lock:
+                    # Computed by the viewer this one waited for
+                    forecast = self._cached(key)
+                    if forecast is not None:
+                        return forecast
+                    # Read before computing so an invalidation during the computation is not lost
+                    generation = self._generation
+                forecast = compute()
+                with self._lock:
+                    self._entries[key] = (generation, time.monotonic(), forecast)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > settings.FORECAST_CACHE_SIZE:
+                        self._entries.popitem(last=False)
+                return forecast
+            finally:
+                with self._lock:
+                    if self._computing.get(key) is computing:
+                        del self._computing[key]
+
+
+forecasts = ForecastCache()
+listener.subscribe(APPOINTMENT_STATS_CHANNEL, forecasts.invalidate)
+
+
+def get_forecast(db: Session, start_date: date, end_date: date, horizon: int, **filters) -> CaseForecast:
+    """Growth, reproduction number and forecast of the daily cases matching the filters"""
+    key = (date.today(), start_date, end_date, horizon, tuple(sorted(filters.items())))
+    return forecasts.get(key, lambda: build_forecast(daily_cases(db, start_date, end_date, **filters), start_date, horizon))
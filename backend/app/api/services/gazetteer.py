@@ -0,0 +1,181 @@
+import csv
+import logging
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_GAZETTEER = Path(__file__).resolve().parents[2] / "data" / "gazetteer.csv"
+
+# More specific places win when several parts of an address match
+KIND_SPECIFICITY = {
+    "postcode": 3,
+    "district": 2,
+    "city": 1,
+    "region": 0,
+    "country": -1,
+}
+
+
+@dataclass(frozen=True)
+class Place:
+    name: str
+    kind: str
+    country: str
+    latitude: float
+    longitude: float
+
+
+@dataclass
+class _TrieNode:
+    children: dict[str, "_TrieNode"] = field(default_factory=dict)
+    places: list[Place] = field(default_factory=list)
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation into single spaces"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^0-9a-z]+", " ", text.lower())
+    return text.strip()
+
+
+def has_house_number(part: str) -> bool:
+    """Whether a normalized address part is a street with a number, like cordoba 1234"""
+    return re.search(r"[a-z].*\b\d+\b", part) is not None
+
+
+class Gazetteer:
+    """
+    Offline geocoder over a gazetteer file (cities, districts, postcodes -> centroid).
+
+    Names are kept in a character trie so an address component can be resolved
+    by longest prefix ending on a word boundary, e.g. "palermo soho 1234"
+    resolves to "palermo".
+    """
+
+    def __init__(self) -> None:
+        self._root = _TrieNode()
+        self.size = 0
+
+    @classmethod
+    def from_csv(cls, path: Path | str) -> "Gazetteer":
+        """
+        Load a CSV with columns name, kind, country, latitude, longitude and an
+        optional alternate_names column separated by "|".
+        """
+        gazetteer = cls()
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                place = Place(
+                    name=row["name"],
+                    kind=(row.get("kind") or "city").strip().lower(),
+                    country=(row.get("country") or "").strip().upper(),
+                    latitude=float(row["latitude"]),
+                    longitude=float(row["longitude"]),
+                )
+                gazetteer.add(place.name, place)
+                for alternate in (row.get("alternate_names") or "").split("|"):
+                    if alternate.strip():
+                        gazetteer.add(alternate, place)
+        return gazetteer
+
+    def add(self, name: str, place: Place) -> None:
+        key = normalize(name)
+        if not key:
+            return
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+        if place not in node.places:
+            node.places.append(place)
+            self.size += 1
+
+    def _longest_prefix(self, text: str) -> list[Place]:
+        """Places whose name is the longest prefix of text ending on a word boundary"""
+        node = self._root
+        found: list[Place] = []
+        for i, char in enumerate(text):
+            node = node.children.get(char)
+            if node is None:
+                break
+            at_boundary = i + 1 == len(text) or text[i + 1] == " "
+            if node.places and at_boundary:
+                found = node.places
+        return found
+
+    def complete(self, prefix: str, limit: int = 10) -> list[Place]:
+        """Places whose name starts with prefix, for autocompletion"""
+        node = self._root
+        for char in normalize(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        results: list[Place] = []
+        stack = [node]
+        while stack and len(results) < limit:
+            current = stack.pop()
+            results.extend(p for p in current.places if p not in results)
+            stack.extend(current.children[c] for c in sorted(current.children, reverse=True))
+        return results[:limit]
+
+    def lookup(self, address: str) -> Place | None:
+        """
+        Resolve a free-form address. Every comma separated part is matched by
+        prefix against the trie, except streets with a house number which are
+        often named after places ("Córdoba 1234"). Countries mentioned in the
+        address are used to disambiguate, and the most specific match wins.
+        """
+        matches: list[Place] = []
+        for part in map(normalize, address.split(",")):
+            if not has_house_number(part):
+                matches.extend(self._longest_prefix(part))
+        if not matches:
+            return None
+
+        countries = {p.country for p in matches if p.kind == "country"}
+        if countries:
+            in_country = [p for p in matches if p.country in countries]
+            matches = in_country or matches
+        # max() keeps the first of equally specific matches: the part right after the
+        # street, i.e. the city before the province in "Mendoza 2500, Rosario, Santa Fe"
+        return max(matches, key=lambda p: KIND_SPECIFICITY.get(p.kind, 0))
+
+
+_gazetteer: Gazetteer | None = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """Load the gazetteer once per process, from GAZETTEER_PATH or the bundled file"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                path = settings.GAZETTEER_PATH or BUNDLED_GAZETTEER
+                _gazetteer = Gazetteer.from_csv(path)
+                logger.info(f"Loaded {_gazetteer.size} gazetteer entries from {path}")
+    return _gazetteer
+
+
+def has_street_address(address: str) -> bool:
+    """Whether any part of an address is a street with a house number"""
+    return any(has_house_number(normalize(part)) for part in address.split(","))
+
+
+def geocode_offline(address: str, allow_coarse: bool = True) -> tuple[float, float] | None:
+    """
+    Resolve an address to (latitude, longitude) using only the local gazetteer.
+    With allow_coarse=False a match on a whole country or region is rejected.
+    """
+    place = get_gazetteer().lookup(address)
+    if place is None:
+        return None
+    if not allow_coarse and KIND_SPECIFICITY.get(place.kind, 0) < KIND_SPECIFICITY["city"]:
+        return None
+    return (place.latitude, place.longitude)
@@ -0,0 +1,77 @@
+import math
+
+from geopy.distance import great_circle
+
+from app.core.config import settings
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int | None = None) -> str:
+    """Encode a coordinate as a geohash of the given precision"""
+    precision = precision or settings.CATCHMENT_GEOHASH_PRECISION
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> tuple[float, float, float, float]:
+    """Return (lat_min, lat_max, lon_min, lon_max) of a geohash cell"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def geohash_center(geohash: str) -> tuple[float, float]:
+    lat_min, lat_max, lon_min, lon_max = geohash_bounds(geohash)
+    return (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+
+
+def cells_within(latitude: float, longitude: float, radius_km: float, precision: int | None = None) -> set[str]:
+    """Geohash cells whose centre lies within radius_km of the coordinate"""
+    precision = precision or settings.CATCHMENT_GEOHASH_PRECISION
+    origin = geohash_encode(latitude, longitude, precision)
+    lat_min, lat_max, lon_min, lon_max = geohash_bounds(origin)
+    cell_height, cell_width = lat_max - lat_min, lon_max - lon_min
+    center_lat, center_lon = geohash_center(origin)
+
+    # Degrees of latitude are ~111 km, degrees of longitude shrink with cos(latitude)
+    lat_steps = int(radius_km / (111.0 * cell_height)) + 1
+    lon_km = max(1e-6, 111.0 * math.cos(math.radians(latitude)))
+    lon_steps = int(radius_km / (lon_km * cell_width)) + 1
+
+    cells = set()
+    for i in range(-lat_steps, lat_steps + 1):
+        lat = center_lat + i * cell_height
+        if not -90 < lat < 90:
+            continue
+        for j in range(-lon_steps, lon_steps + 1):
+            lon = (center_lon + j * cell_width + 180) % 360 - 180
+            if great_circle((latitude, longitude), (lat, lon)).km <= radius_km:
+                cells.add(geohash_encode(lat, lon, precision))
+    return cells
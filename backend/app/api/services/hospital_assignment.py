@@ -0,0 +1,233 @@
+import logging
+import threading
+from dataclasses import dataclass
+
+from sqlmodel import Session, func, select
+
+from app.api.services.geohash import geohash_encode
+from app.api.services.hospital_registry import registry
+from app.api.services.locator import get_coordinates
+from app.api.services.spatial_index import HospitalSpatialIndex
+from app.core.config import settings
+from app.core.pubsub import APPOINTMENT_STATS_CHANNEL, listener
+from app.models import (
+    Appointment,
+    AppointmentStatus,
+    Hospital,
+    HospitalCatchment,
+    HospitalResponse,
+    StatusHospital,
+)
+
+logger = logging.getLogger(__name__)
+
+# How much a pending appointment in the hospital queue weighs against travel
+# distance, per triage urgency. Emergencies care mostly about getting to the
+# nearest capable hospital, low urgency cases can travel further to a shorter queue.
+URGENCY_QUEUE_WEIGHT = {
+    "emergency": 0.25,
+    "high": 0.5,
+    "severe": 0.5,
+    "moderate": 1.0,
+    "low": 2.0,
+    "mild": 2.0,
+}
+
+
+class HospitalLoadTracker:
+    """
+    In-memory count of pending appointments per hospital.
+
+    Seeded with a single GROUP BY query and kept up to date by the assignment
+    engine and the appointment update endpoints, so scoring candidates does not
+    query the database for every hospital. Appointments change in every
+    process: the appointment rollup trigger notifies each change, after which
+    the next assignment seeds the counts again.
+    """
+
+    def __init__(self) -> None:
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stale = True
+
+    def invalidate(self, payload: str | None = None) -> None:
+        self._stale = True
+
+    def seed(self, db: Session) -> None:
+        if not self._stale:
+            return
+        # Cleared before the query so a change notified meanwhile is not lost
+        self._stale = False
+        statement = (
+            select(Appointment.hospital_assigned, func.count())
+            .where(Appointment.status == AppointmentStatus.PENDING)
+            .where(Appointment.hospital_assigned.is_not(None))
+            .group_by(Appointment.hospital_assigned)
+        )
+        rows = db.exec(statement).all()
+        with self._lock:
+            self._counts = {str(hospital_id): count for hospital_id, count in rows}
+
+    def get(self, hospital_id: str) -> int:
+        return self._counts.get(str(hospital_id), 0)
+
+    def increment(self, hospital_id: str) -> None:
+        with self._lock:
+            key = str(hospital_id)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def decrement(self, hospital_id: str) -> None:
+        with self._lock:
+            key = str(hospital_id)
+            self._counts[key] = max(0, self._counts.get(key, 0) - 1)
+
+    def on_appointment_change(
+        self,
+        old_hospital: str | None,
+        old_status: AppointmentStatus,
+        new_hospital: str | None,
+        new_status: AppointmentStatus,
+    ) -> None:
+        """Move an appointment between queues when its hospital or status changes"""
+        was_queued = old_hospital is not None and old_status == AppointmentStatus.PENDING
+        is_queued = new_hospital is not None and new_status == AppointmentStatus.PENDING
+        if was_queued and is_queued and str(old_hospital) == str(new_hospital):
+            return
+        if was_queued:
+            self.decrement(old_hospital)
+        if is_queued:
+            self.increment(new_hospital)
+
+
+load_tracker = HospitalLoadTracker()
+listener.subscribe(APPOINTMENT_STATS_CHANNEL, load_tracker.invalidate)
+
+
+def _offers_specialty(hospital: Hospital, specialty: str | None) -> bool:
+    if not specialty or hospital.specialties is None:
+        return True
+    wanted = specialty.strip().lower()
+    return any(s.strip().lower() == wanted for s in hospital.specialties)
+
+
+def score_candidate(distance_km: float, queue_depth: int, urgency: str | None, degraded: bool = False) -> float:
+    """
+    Lower is better: travel distance plus a queue penalty scaled by urgency,
+    plus a fixed penalty for hospitals whose systems respond slowly
+    """
+    weight = URGENCY_QUEUE_WEIGHT.get((urgency or "").strip().lower(), 1.0)
+    score = distance_km + queue_depth * settings.HOSPITAL_QUEUE_PENALTY_KM * weight
+    if degraded:
+        score += settings.HOSPITAL_DEGRADED_PENALTY_KM
+    return score
+
+
+def rank_hospitals(
+    index: HospitalSpatialIndex,
+    coords: tuple[float, float],
+    specialty: str | None,
+    urgency: str | None,
+    tracker: HospitalLoadTracker,
+) -> list[tuple[float, Hospital]]:
+    """
+    Score the nearest eligible hospitals. The candidate set is widened when
+    none of the k nearest qualifies, and the specialty filter is only dropped
+    when no active hospital at all offers it. When every hospital is inactive
+    the nearest ones are still ranked: the patient gets a hospital and the
+    outbox keeps retrying the notification until it comes back.
+    """
+    k = max(1, settings.HOSPITAL_ASSIGNMENT_CANDIDATES)
+    for allow_inactive in (False, True):
+        for require_specialty in (True, False):
+            k_search = k
+            while True:
+                candidates = index.nearest(coords[0], coords[1], k_search)
+                eligible = [
+                    (distance, hospital)
+                    for distance, hospital in candidates
+                    if (allow_inactive or hospital.status != StatusHospital.INACTIVE)
+                    and (not require_specialty or _offers_specialty(hospital, specialty))
+                ]
+                if eligible or k_search >= index.size:
+                    break
+                k_search *= 4
+            if eligible:
+                if allow_inactive:
+                    logger.warning("No active hospital found, ranking inactive hospitals")
+                if not require_specialty:
+                    logger.warning(f"No eligible hospital offers {specialty}, ignoring specialty")
+                scored = [
+                    (score_candidate(distance, tracker.get(str(hospital.id)), urgency, hospital.degraded), hospital)
+                    for distance, hospital in eligible[:k]
+                ]
+                scored.sort(key=lambda item: item[0])
+                return scored
+    return []
+
+
+@dataclass
+class HospitalAssignment:
+    hospital: HospitalResponse
+    geohash: str
+    score: float | None = None
+
+
+def assign_hospital(
+    db: Session,
+    user_location: str,
+    specialty: str | None = None,
+    urgency: str | None = None,
+) -> HospitalAssignment | None:
+    """
+    Pick the best hospital for a triaged patient. The caller moves the
+    appointment into the hospital's queue in load_tracker once the assignment
+    is committed.
+
+    The owner of the patient's catchment cell is taken directly when it is
+    eligible, responsive and its queue is short, otherwise the nearest
+    candidates are scored.
+
+    Args:
+        db: Database session
+        user_location: User's address string
+        specialty: Medical specialty chosen by the triage
+        urgency: Urgency chosen by the triage
+
+    Returns:
+        HospitalAssignment: The assigned hospital and patient geohash, or None
+        if the location is unknown or there is no hospital at all
+    """
+    user_coords = get_coordinates(user_location)
+    if not user_coords:
+        logger.warning(f"Could not get coordinates for user location: {user_location}")
+        return None
+    geohash = geohash_encode(*user_coords)
+    load_tracker.seed(db)
+
+    snapshot = registry.snapshot()
+    catchment = db.get(HospitalCatchment, geohash)
+    if catchment is not None:
+        owner = snapshot.get(catchment.hospital_id)
+        if (
+            owner is not None
+            and owner.status != StatusHospital.INACTIVE
+            and not owner.degraded
+            and _offers_specialty(owner, specialty)
+            and load_tracker.get(str(owner.id)) < settings.CATCHMENT_QUEUE_LIMIT
+        ):
+            logger.info(f"Assigned catchment owner {owner.name} for {specialty}/{urgency}")
+            return HospitalAssignment(hospital=owner, geohash=geohash)
+
+    index = snapshot.index
+    if index.size == 0:
+        logger.warning("No hospital with valid coordinates found")
+        return None
+
+    ranked = rank_hospitals(index, user_coords, specialty, urgency, load_tracker)
+    if not ranked:
+        logger.warning("No eligible hospital found")
+        return None
+
+    score, hospital = ranked[0]
+    logger.info(f"Assigned hospital {hospital.name} (score {score:.2f}) for {specialty}/{urgency}")
+    return HospitalAssignment(hospital=hospital, geohash=geohash, score=score)
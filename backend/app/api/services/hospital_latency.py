@@ -0,0 +1,254 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.leader import process_identity
+from app.core.metrics import Gauge
+from app.core.pubsub import HOSPITAL_REGISTRY_CHANNEL, notify
+from app.models import Hospital, HospitalLatency, HospitalLatencySummary
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_HEALTH = "health"
+ENDPOINT_APPOINTMENTS = "specialty-appointments"
+
+# Upper bounds of the latency buckets in milliseconds, the last bucket is open
+BUCKET_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 750, 1000, 1500, 2500, 5000, 10000)
+# Number of slices the rolling window is split into
+WINDOW_SLICES = 5
+
+latency_p95 = Gauge(
+    "medisur_hospital_latency_p95_ms",
+    "Rolling p95 response time of a hospital endpoint",
+    ["hospital", "endpoint"],
+)
+
+
+def percentile(counts: list[int], fraction: float) -> float | None:
+    """Percentile of a bucketed histogram, interpolated linearly inside its bucket"""
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = fraction * total
+    cumulative = 0
+    for i, count in enumerate(counts):
+        if count and cumulative + count >= rank:
+            lower = BUCKET_BOUNDS_MS[i - 1] if i > 0 else 0
+            upper = BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else BUCKET_BOUNDS_MS[-1] * 2
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+    return float(BUCKET_BOUNDS_MS[-1])
+
+
+@dataclass
+class _Slice:
+    started: float
+    counts: list[int] = field(default_factory=lambda: [0] * (len(BUCKET_BOUNDS_MS) + 1))
+    errors: int = 0
+
+
+class LatencyWindow:
+    """
+    Rolling latency histogram of one hospital endpoint.
+
+    The window is a ring of WINDOW_SLICES fixed-bucket histograms; a slice is
+    dropped once it is older than the window, so percentiles only reflect
+    recent behaviour and memory stays constant whatever the traffic.
+    """
+
+    def __init__(self, window_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.slice_seconds = window_seconds / WINDOW_SLICES
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self._slices: list[_Slice] = []
+
+    def _current(self) -> _Slice:
+        now = self.clock()
+        self._slices = [s for s in self._slices if now - s.started < self.window_seconds]
+        if not self._slices or now - self._slices[-1].started >= self.slice_seconds:
+            self._slices.append(_Slice(started=now))
+        return self._slices[-1]
+
+    def observe(self, milliseconds: float, ok: bool = True) -> None:
+        current = self._current()
+        if not ok:
+            current.errors += 1
+            return
+        current.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, milliseconds)] += 1
+
+    def _merged(self) -> tuple[list[int], int]:
+        self._current()
+        counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        errors = 0
+        for s in self._slices:
+            errors += s.errors
+            for i, count in enumerate(s.counts):
+                counts[i] += count
+        return counts, errors
+
+    def summary(self) -> dict:
+        counts, errors = self._merged()
+        return {
+            "counts": counts,
+            "samples": sum(counts),
+            "errors": errors,
+            "p50_ms": percentile(counts, 0.50),
+            "p95_ms": percentile(counts, 0.95),
+        }
+
+
+class LatencyTracker:
+    """Rolling latency windows per (hospital, endpoint) of this process"""
+
+    def __init__(self, window_seconds: float | None = None, clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds or settings.HOSPITAL_LATENCY_WINDOW_SECONDS
+        self.clock = clock
+        self._windows: dict[tuple[uuid.UUID, str], LatencyWindow] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, hospital_id: uuid.UUID, endpoint: str, seconds: float, ok: bool = True) -> None:
+        key = (uuid.UUID(str(hospital_id)), endpoint)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = LatencyWindow(self.window_seconds, self.clock)
+            window.observe(seconds * 1000, ok)
+
+    def summaries(self) -> dict[tuple[uuid.UUID, str], dict]:
+        """Summaries of every window that still has samples, dropping empty ones"""
+        result = {}
+        with self._lock:
+            for key, window in list(self._windows.items()):
+                summary = window.summary()
+                if summary["samples"] or summary["errors"]:
+                    result[key] = summary
+                else:
+                    del self._windows[key]
+        return result
+
+
+latency_tracker = LatencyTracker()
+# Each process keeps its own rows so flushes never overwrite each other
+PROCESS = process_identity()
+
+
+def merged_latencies(db: Session, hospital_id: uuid.UUID | None = None) -> dict[tuple[uuid.UUID, str], HospitalLatencySummary]:
+    """
+    Summaries per (hospital, endpoint) over the recent rows of every process,
+    percentiles taken on the summed histograms.
+    """
+    cutoff = datetime.now() - timedelta(seconds=2 * settings.HOSPITAL_LATENCY_WINDOW_SECONDS)
+    query = select(HospitalLatency).where(HospitalLatency.updated_at >= cutoff)
+    if hospital_id is not None:
+        query = query.where(HospitalLatency.hospital_id == hospital_id)
+    merged: dict[tuple[uuid.UUID, str], tuple[list[int], int, datetime]] = {}
+    for row in db.exec(query):
+        counts, errors, updated_at = merged.get((row.hospital_id, row.endpoint), ([0] * len(row.counts), 0, row.updated_at))
+        merged[(row.hospital_id, row.endpoint)] = (
+            [a + b for a, b in zip(counts, row.counts, strict=True)],
+            errors + row.errors,
+            max(updated_at, row.updated_at),
+        )
+    return {
+        key: HospitalLatencySummary(
+            endpoint=key[1],
+            samples=sum(counts),
+            errors=errors,
+            p50_ms=percentile(counts, 0.50),
+            p95_ms=percentile(counts, 0.95),
+            updated_at=updated_at,
+        )
+        for key, (counts, errors, updated_at) in merged.items()
+    }
+
+
+def persist_latencies(tracker: LatencyTracker = latency_tracker, process: str = PROCESS) -> None:
+    """
+    Upsert the summaries of this process under its own rows, then refresh the
+    degraded flags from the merged histograms of every process.
+    """
+    summaries = tracker.summaries()
+    now = datetime.now()
+    rows = [
+        {"hospital_id": hospital_id, "endpoint": endpoint, "process": process, "updated_at": now, **summary}
+        for (hospital_id, endpoint), summary in summaries.items()
+    ]
+    with Session(engine) as db:
+        if rows:
+            # Hospitals deleted since the samples were taken have no row to reference
+            ids = {r["hospital_id"] for r in rows}
+            existing = set(db.exec(select(Hospital.id).where(Hospital.id.in_(ids))).all())
+            rows = [r for r in rows if r["hospital_id"] in existing]
+        if rows:
+            statement = insert(HospitalLatency).values(rows)
+            statement = statement.on_conflict_do_update(
+                index_elements=["hospital_id", "endpoint", "process"],
+                set_={
+                    "counts": statement.excluded.counts,
+                    "samples": statement.excluded.samples,
+                    "errors": statement.excluded.errors,
+                    "p50_ms": statement.excluded.p50_ms,
+                    "p95_ms": statement.excluded.p95_ms,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+            db.exec(statement)
+        # Rows of stopped processes are ignored once stale and dropped here
+        cutoff = now - timedelta(seconds=2 * settings.HOSPITAL_LATENCY_WINDOW_SECONDS)
+        db.exec(delete(HospitalLatency).where(HospitalLatency.updated_at < cutoff))
+
+        slow = {
+            hospital_id
+            for (hospital_id, _), summary in merged_latencies(db).items()
+            if summary.samples >= settings.HOSPITAL_LATENCY_MIN_SAMPLES
+            and summary.p95_ms > settings.HOSPITAL_DEGRADED_P95_MS
+        }
+        # Only rows whose flag actually flips are written
+        condition = Hospital.id.in_(slow)
+        result = db.exec(
+            update(Hospital)
+            .where(Hospital.degraded != condition)
+            .values(degraded=condition)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            notify(db, HOSPITAL_REGISTRY_CHANNEL)
+        db.commit()
+    for (hospital_id, endpoint), summary in summaries.items():
+        if summary["p95_ms"] is not None:
+            latency_p95.set(summary["p95_ms"], hospital=str(hospital_id), endpoint=endpoint)
+
+
+async def persist_latencies_loop() -> None:
+    """Flush the latency windows of this process to the database periodically"""
+    while True:
+        await asyncio.sleep(settings.HOSPITAL_LATENCY_FLUSH_SECONDS)
+        try:
+            await asyncio.to_thread(persist_latencies)
+        except Exception as e:
+            logger.error(f"Error persisting hospital latencies: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan_latency():
+    """Every process flushes its own latency windows: probes and deliveries may run anywhere"""
+    task = asyncio.create_task(persist_latencies_loop())
+    yield
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
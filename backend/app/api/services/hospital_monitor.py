@@ -1,16 +1,42 @@
 import asyncio
 import aiohttp
+import time
+import uuid
 from datetime import datetime
+from sqlalchemy import cast, column, update, values
 from sqlmodel import Session, select
 from app.models import Hospital, StatusHospital
+from app.core.config import settings
 from app.core.db import engine
+from app.core.metrics import Counter, Gauge, Histogram
+from app.core.pubsub import HOSPITAL_REGISTRY_CHANNEL, notify
+from app.api.services.hospital_latency import ENDPOINT_HEALTH, latency_tracker
+from app.api.services.hospital_registry import registry
+from app.api.services.probe_scheduler import ProbeScheduler, ProbeState
 import logging
-from contextlib import asynccontextmanager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+sweep_duration = Histogram(
+    "medisur_hospital_monitor_sweep_seconds",
+    "Duration of a full hospital health sweep",
+)
+last_sweep_duration = Gauge(
+    "medisur_hospital_monitor_last_sweep_seconds",
+    "Duration of the most recent hospital health sweep",
+)
+probes_total = Counter(
+    "medisur_hospital_probes_total",
+    "Hospital health probes sent, by result",
+    ["result"],
+)
+scheduled_hospitals = Gauge(
+    "medisur_hospital_monitor_scheduled_hospitals",
+    "Hospitals in the probe schedule",
+)
+
 def get_hospital(db: Session, hospital_id: str) -> Hospital:
     """Get a hospital by ID"""
     return db.exec(select(Hospital).where(Hospital.id == hospital_id)).first()
@@ -21,55 +47,115 @@ async def check_hospital_status(session: aiohttp.ClientSession, hospital: Hospit
         return False
         
     try:
-        async with session.get(f"http://{hospital.uri}:8000/health", timeout=5) as response:
+        async with session.get(f"http://{hospital.uri}:{settings.HOSPITAL_API_PORT}/health") as response:
             # Any response (even error) means the server is up
             return True
     except Exception as e:
-        logger.error(f"Error checking hospital {hospital.name}: {str(e)}")
+        logger.error(f"Error checking hospital {hospital.uri}: {str(e)}")
         return False
 
-async def update_hospital_statuses():
-    """Update the status of all hospitals in the database"""
-    try:
-        async with aiohttp.ClientSession() as session:
-            # Get all hospitals
-            db = Session(engine)
-            statement = select(Hospital)
-            hospitals = db.exec(statement).all()
-            
-            # Check each hospital's status
-            for hospital in hospitals:
+def write_hospital_statuses(changes: list[tuple[uuid.UUID, StatusHospital]]) -> None:
+    """Write all changed statuses with a single UPDATE ... FROM (VALUES ...)"""
+    if not changes:
+        return
+    new_statuses = values(
+        column("id", Hospital.__table__.c.id.type),
+        column("status", Hospital.__table__.c.status.type),
+        name="new_statuses",
+    ).data(changes)
+    statement = (
+        update(Hospital)
+        .where(Hospital.id == new_statuses.c.id)
+        .values(status=cast(new_statuses.c.status, Hospital.__table__.c.status.type))
+        .execution_options(synchronize_session=False)
+    )
+    with Session(engine) as db:
+        db.exec(statement)
+        # Every process reloads its hospital registry once the statuses are committed
+        notify(db, HOSPITAL_REGISTRY_CHANNEL)
+        db.commit()
+    registry.invalidate()
+
+async def probe_hospitals(hospitals: list[ProbeState]) -> list[bool]:
+    """
+    Probe all hospitals concurrently. The semaphore bounds the number of
+    in-flight probes and the connector the sockets per hospital host, so a
+    sweep takes about one probe timeout whatever the fleet size.
+    """
+    semaphore = asyncio.Semaphore(settings.HOSPITAL_MONITOR_CONCURRENCY)
+    connector = aiohttp.TCPConnector(
+        limit=settings.HOSPITAL_MONITOR_CONCURRENCY,
+        limit_per_host=settings.HOSPITAL_MONITOR_CONNECTIONS_PER_HOST,
+    )
+    timeout = aiohttp.ClientTimeout(total=settings.HOSPITAL_PROBE_TIMEOUT_SECONDS)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def probe(hospital: ProbeState) -> bool:
+            async with semaphore:
+                started = time.monotonic()
                 is_active = await check_hospital_status(session, hospital)
-                new_status = StatusHospital.ACTIVE if is_active else StatusHospital.INACTIVE
-                
-                if hospital.status != new_status:
-                    hospital.status = new_status
-                    logger.info(f"Hospital {hospital.name} status changed to {new_status}")
-            
-            # Commit changes
-            db.commit()
-            db.close()
-            
-    except Exception as e:
-        logger.error(f"Error in update_hospital_statuses: {str(e)}")
+                if hospital.uri:
+                    latency_tracker.observe(hospital.id, ENDPOINT_HEALTH, time.monotonic() - started, ok=is_active)
+                return is_active
+
+        return await asyncio.gather(*(probe(hospital) for hospital in hospitals))
 
-@asynccontextmanager
-async def lifespan_monitor(app):
-    """Lifespan context manager for the monitoring service"""
-    monitor_task = asyncio.create_task(monitor_hospitals())
-    yield
-    monitor_task.cancel()
+async def update_hospital_statuses(scheduler: ProbeScheduler):
+    """Probe the hospitals that are due and store the statuses that changed"""
+    started = time.monotonic()
     try:
-        await monitor_task
-    except asyncio.CancelledError:
-        pass
+        due = scheduler.pop_due()
+        if not due:
+            return
+        
+        # Check every due hospital's status at once
+        results = await probe_hospitals(due)
+        changed = []
+        for state, is_active in zip(due, results, strict=True):
+            probes_total.inc(result="up" if is_active else "down")
+            previous_status = state.status
+            if scheduler.record(state, is_active):
+                changed.append((state, previous_status))
+
+        # Database work runs in a thread so it never blocks the event loop
+        try:
+            await asyncio.to_thread(write_hospital_statuses, [(state.hospital_id, state.status) for state, _ in changed])
+        except Exception:
+            # Probe the hospitals again soon rather than forget changes that were never stored
+            for state, previous_status in changed:
+                scheduler.requeue(state, previous_status)
+            raise
+        for state, _ in changed:
+            logger.info(f"Hospital {state.hospital_id} status changed to {state.status}")
+
+    except Exception as e:
+        logger.error(f"Error in update_hospital_statuses: {str(e)}")
+    finally:
+        duration = time.monotonic() - started
+        sweep_duration.observe(duration)
+        last_sweep_duration.set(duration)
 
 async def monitor_hospitals():
     """Main monitoring loop"""
     await asyncio.sleep(10)  # Wait for 10 seconds to ensure the database is ready
+    scheduler = ProbeScheduler(
+        base_interval=settings.HOSPITAL_PROBE_INTERVAL_SECONDS,
+        fast_interval=settings.HOSPITAL_PROBE_FAST_INTERVAL_SECONDS,
+        max_backoff=settings.HOSPITAL_PROBE_MAX_BACKOFF_SECONDS,
+    )
+    last_sync = None
     while True:
-        await update_hospital_statuses()
-        await asyncio.sleep(10)  # Wait for 10 seconds
+        # Pick up created, moved and deleted hospitals
+        if last_sync is None or time.monotonic() - last_sync >= settings.HOSPITAL_PROBE_INTERVAL_SECONDS:
+            try:
+                snapshot = await asyncio.to_thread(registry.snapshot)
+                scheduler.sync(snapshot.hospitals)
+                scheduled_hospitals.set(len(scheduler))
+                last_sync = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error loading hospitals to probe: {str(e)}")
+        await update_hospital_statuses(scheduler)
+        await asyncio.sleep(scheduler.seconds_until_next(settings.HOSPITAL_PROBE_INTERVAL_SECONDS))
 
 def start_monitoring():
     """Start the monitoring service"""
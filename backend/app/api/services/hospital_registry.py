@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+
+from sqlmodel import Session, select
+
+from app.api.services.spatial_index import HospitalSpatialIndex
+from app.core.config import settings
+from app.core.db import engine
+from app.core.pubsub import HOSPITAL_REGISTRY_CHANNEL, listener, notify
+from app.models import Hospital, HospitalResponse
+
+logger = logging.getLogger(__name__)
+
+
+def _etag(content: str) -> str:
+    return '"' + hashlib.sha256(content.encode()).hexdigest()[:32] + '"'
+
+
+@dataclass(frozen=True)
+class RegistrySnapshot:
+    """
+    Immutable view of every hospital at one point in time.
+
+    The hospitals are detached response models, never ORM objects, so readers
+    can share them freely. The ETags are content hashes, identical in every
+    process that loaded the same data.
+    """
+
+    version: int
+    etag: str
+    hospitals: tuple[HospitalResponse, ...]
+    by_id: Mapping[uuid.UUID, HospitalResponse]
+    etags: Mapping[uuid.UUID, str]
+    index: HospitalSpatialIndex
+    loaded_at: float
+
+    def get(self, hospital_id: uuid.UUID) -> HospitalResponse | None:
+        return self.by_id.get(uuid.UUID(str(hospital_id)))
+
+
+def build_snapshot(hospitals: list[Hospital], version: int) -> RegistrySnapshot:
+    frozen = tuple(
+        sorted((HospitalResponse.model_validate(h) for h in hospitals), key=lambda h: (h.name, str(h.id)))
+    )
+    etags = {}
+    serialized = []
+    for hospital in frozen:
+        content = json.dumps(hospital.model_dump(mode="json"), sort_keys=True)
+        etags[hospital.id] = _etag(content)
+        serialized.append(content)
+    return RegistrySnapshot(
+        version=version,
+        etag=_etag("\n".join(serialized)),
+        hospitals=frozen,
+        by_id=MappingProxyType({h.id: h for h in frozen}),
+        etags=MappingProxyType(etags),
+        index=HospitalSpatialIndex(frozen),
+        loaded_at=time.monotonic(),
+    )
+
+
+class HospitalRegistry:
+    """
+    Process-wide holder of the current hospital snapshot.
+
+    The snapshot is reloaded lazily after an invalidation, which comes from
+    hospital CRUD in this process, from any process through the
+    hospital_registry notification channel, or from the monitor loop. A
+    maximum age bounds staleness if notifications are ever missed.
+    """
+
+    def __init__(self) -> None:
+        self._snapshot: RegistrySnapshot | None = None
+        self._stale = True
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self, payload: str | None = None) -> None:
+        self._stale = True
+
+    def _expired(self, snapshot: RegistrySnapshot | None) -> bool:
+        return (
+            snapshot is None
+            or self._stale
+            or time.monotonic() - snapshot.loaded_at > settings.HOSPITAL_REGISTRY_MAX_AGE_SECONDS
+        )
+
+    def refresh(self, force: bool = False) -> RegistrySnapshot:
+        """Load a new snapshot; the version only moves when the content changed"""
+        with self._lock:
+            # Another thread may have reloaded while this one waited for the lock
+            if not force and not self._expired(self._snapshot):
+                return self._snapshot
+            # Cleared before reading so an invalidation during the load is not lost
+            self._stale = False
+            with Session(engine) as db:
+                hospitals = db.exec(select(Hospital)).all()
+            candidate = build_snapshot(hospitals, self._version + 1)
+            if self._snapshot is not None and self._snapshot.etag == candidate.etag:
+                candidate = replace(self._snapshot, loaded_at=candidate.loaded_at)
+            else:
+                self._version = candidate.version
+                logger.info(f"Hospital registry at version {self._version} ({len(hospitals)} hospitals)")
+            self._snapshot = candidate
+            return candidate
+
+    def snapshot(self) -> RegistrySnapshot:
+        snapshot = self._snapshot
+        if self._expired(snapshot):
+            return self.refresh()
+        return snapshot
+
+
+registry = HospitalRegistry()
+listener.subscribe(HOSPITAL_REGISTRY_CHANNEL, registry.invalidate)
+
+
+def publish_registry_change(session: Session) -> None:
+    """Invalidate the snapshot of this process now and of every other process through a notification"""
+    registry.invalidate()
+    notify(session, HOSPITAL_REGISTRY_CHANNEL)
+    session.commit()
@@ -6,6 +6,9 @@ import geopy.geocoders
 from urllib.request import urlopen
 import urllib3
 
+from app.api.services.gazetteer import geocode_offline, has_street_address
+from app.core.config import settings
+
 # Configure urllib3 to use the certifi certificate bundle
 urllib3.disable_warnings()
 geopy.geocoders.options.default_ssl_context = ssl.create_default_context(cafile=certifi.where())
@@ -13,6 +16,11 @@ geopy.geocoders.options.default_ssl_context = ssl.create_default_context(cafile=
 def get_coordinates(address: str) -> tuple[float, float] | None:
     """
     Extract latitude and longitude coordinates from a given address.
+
+    Addresses without a street number are resolved by the local gazetteer
+    first (city level or better). Otherwise Nominatim is asked within the
+    GEOCODER_TIMEOUT_SECONDS budget, and the gazetteer, coarse matches
+    included, is only the fallback when Nominatim fails or finds nothing.
     
     Args:
         address (str): The address to geocode
@@ -21,13 +29,26 @@ def get_coordinates(address: str) -> tuple[float, float] | None:
         tuple[float, float] | None: A tuple containing (latitude, longitude) if found,
                                    None if the address couldn't be geocoded
     """
+    if settings.GEOCODER_LOCAL_FIRST and not has_street_address(address):
+        coords = geocode_offline(address, allow_coarse=False)
+        if coords:
+            return coords
+
+    coords = geocode_remote(address)
+    if coords:
+        return coords
+    return geocode_offline(address)
+
+
+def geocode_remote(address: str) -> tuple[float, float] | None:
+    """Geocode an address with the public Nominatim service"""
     try:
         print(f"Searching for address: {address}")
         # Initialize the geocoder with a meaningful user agent and proper SSL context
         geolocator = Nominatim(
             user_agent="medisur_gov_app",
             scheme='https',
-            timeout=10
+            timeout=settings.GEOCODER_TIMEOUT_SECONDS
         )
         
         # Get location information
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime
+
+import aiomqtt
+from sqlmodel import Session, select
+
+from app.api.services.notification_outbox import Delivery, lease_until, record_results
+from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import Counter, Gauge
+from app.core.pubsub import NOTIFICATION_OUTBOX_CHANNEL, listener
+from app.models import NotificationChannel, NotificationOutbox, OutboxStatus
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_SECONDS = 5.0
+
+published_total = Counter(
+    "medisur_mqtt_published_total",
+    "Appointment events published to the MQTT broker, by result",
+    ["result"],
+)
+broker_connected = Gauge(
+    "medisur_mqtt_connected",
+    "1 while the leader holds a connection to the MQTT broker",
+)
+
+
+def appointments_topic(hospital_id: uuid.UUID) -> str:
+    return f"{settings.MQTT_TOPIC_PREFIX}/{hospital_id}/appointments"
+
+
+def claim_mqtt_due(limit: int) -> list[Delivery]:
+    """Lease up to limit due MQTT events, oldest first"""
+    now = datetime.now()
+    with Session(engine) as db:
+        rows = db.exec(
+            select(NotificationOutbox)
+            .where(
+                NotificationOutbox.channel == NotificationChannel.MQTT,
+                NotificationOutbox.status == OutboxStatus.PENDING,
+                NotificationOutbox.next_attempt_at <= now,
+            )
+            .order_by(NotificationOutbox.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        deliveries = []
+        for row in rows:
+            row.next_attempt_at = lease_until(now, len(rows))
+            db.add(row)
+            deliveries.append(Delivery(id=row.id, hospital_id=row.hospital_id, payload=row.payload, attempts=row.attempts))
+        db.commit()
+    return deliveries
+
+
+class MqttPublisher:
+    """
+    Publishes the MQTT events of the outbox over a single long-lived client.
+    Runs in the leader process only.
+
+    The client keeps a persistent session (fixed client id, clean_session
+    off) so the broker holds QoS 1 messages for hospitals that are offline.
+    At most MQTT_MAX_INFLIGHT publishes wait for their PUBACK at a time; an
+    event is marked delivered only once the broker acknowledged it.
+    """
+
+    def __init__(self) -> None:
+        self._wakeup: asyncio.Event | None = None
+        self._window: asyncio.Semaphore | None = None
+
+    def wake(self, payload: str | None = None) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _publish(self, client: aiomqtt.Client, delivery: Delivery) -> tuple[Delivery, int | None, str | None]:
+        async with self._window:
+            try:
+                await client.publish(
+                    appointments_topic(delivery.hospital_id), json.dumps(delivery.payload), qos=1
+                )
+            except aiomqtt.MqttError as e:
+                return delivery, None, f"MqttError: {str(e)}"
+        return delivery, 200, None
+
+    async def publish_due(self, client: aiomqtt.Client) -> int:
+        """Publish one window of due events and record the results, returning how many were claimed"""
+        if self._window is None:
+            self._window = asyncio.Semaphore(settings.MQTT_MAX_INFLIGHT)
+        deliveries = await asyncio.to_thread(claim_mqtt_due, settings.MQTT_MAX_INFLIGHT)
+        if not deliveries:
+            return 0
+        results = await asyncio.gather(*(self._publish(client, delivery) for delivery in deliveries))
+        await asyncio.to_thread(record_results, results)
+        failed = [error for _, status_code, error in results if status_code is None]
+        published_total.inc(len(results) - len(failed), result="published")
+        if failed:
+            published_total.inc(len(failed), result="retry")
+            # Reconnect: the errors almost always mean the connection is gone
+            raise aiomqtt.MqttError(failed[0])
+        return len(deliveries)
+
+    async def run(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._window = asyncio.Semaphore(settings.MQTT_MAX_INFLIGHT)
+        try:
+            while True:
+                try:
+                    async with aiomqtt.Client(
+                        hostname=settings.MQTT_SERVER_URI,
+                        port=settings.MQTT_PORT,
+                        identifier=settings.MQTT_CLIENT_ID,
+                        clean_session=False,
+                        max_inflight_messages=settings.MQTT_MAX_INFLIGHT,
+                    ) as client:
+                        broker_connected.set(1)
+                        logger.info(f"Connected to MQTT broker {settings.MQTT_SERVER_URI}:{settings.MQTT_PORT}")
+                        while True:
+                            self._wakeup.clear()
+                            if await self.publish_due(client) == settings.MQTT_MAX_INFLIGHT:
+                                continue
+                            # Not asyncio.wait_for: it swallows a cancellation that arrives with the wakeup
+                            waking = asyncio.ensure_future(self._wakeup.wait())
+                            try:
+                                await asyncio.wait({waking}, timeout=settings.NOTIFICATION_POLL_SECONDS)
+                            finally:
+                                waking.cancel()
+                except aiomqtt.MqttError as e:
+                    logger.error(f"MQTT publisher error: {str(e)}")
+                except Exception as e:
+                    logger.error(f"Error publishing MQTT events: {str(e)}")
+                broker_connected.set(0)
+                await asyncio.sleep(RECONNECT_SECONDS)
+        finally:
+            broker_connected.set(0)
+            self._wakeup = None
+
+
+mqtt_publisher = MqttPublisher()
+listener.subscribe(NOTIFICATION_OUTBOX_CHANNEL, mqtt_publisher.wake)
+
+
+async def publish_mqtt_events() -> None:
+    """Leader loop publishing appointment events to the MQTT broker"""
+    if not settings.MQTT_ENABLED:
+        return
+    await mqtt_publisher.run()
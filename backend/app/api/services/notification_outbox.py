@@ -0,0 +1,452 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections import Counter as CountMap
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import aiohttp
+from sqlalchemy import bindparam, func, update
+from sqlmodel import Session, select
+
+from app.api.services.hospital_latency import ENDPOINT_APPOINTMENTS, latency_tracker
+from app.api.services.hospital_registry import registry
+from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import Counter, Gauge
+from app.core.pubsub import NOTIFICATION_OUTBOX_CHANNEL, listener, notify
+from app.models import (
+    Appointment,
+    HospitalResponse,
+    NotificationChannel,
+    NotificationOutbox,
+    OutboxStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+# Client errors that are worth retrying, every other 4xx is permanent
+RETRYABLE_STATUS = {408, 425, 429}
+
+deliveries_total = Counter(
+    "medisur_notification_deliveries_total",
+    "Hospital notification delivery attempts, by result",
+    ["result"],
+)
+deliveries_in_flight = Gauge(
+    "medisur_notification_deliveries_in_flight",
+    "Hospital notifications being delivered right now",
+)
+
+
+def build_appointment_payload(
+    appointment_id: uuid.UUID, patient_id: str, urgency: str, specialty: str, message: str
+) -> dict:
+    """Body of the hospital specialty-appointments endpoint"""
+    return {
+        "patient_id": patient_id,
+        "specialty": specialty,
+        "appointment_type": "consulta",
+        "urgency": urgency,
+        "reason": message,
+        "notes": f"Asignado desde MediSur Central - (Urgencia: {urgency}, Tipo: {specialty})",
+        # Deliveries are at least once, the hospital can deduplicate on this id
+        "central_appointment_id": str(appointment_id),
+    }
+
+
+def enqueue_hospital_notification(
+    db: Session,
+    *,
+    appointment_id: uuid.UUID,
+    hospital_id: uuid.UUID,
+    payload: dict,
+    channel: NotificationChannel = NotificationChannel.HTTP,
+) -> NotificationOutbox:
+    """
+    Add a notification to the outbox in the caller's transaction. Nothing is
+    sent until the transaction commits, and then the workers are woken up.
+    """
+    entry = NotificationOutbox(
+        appointment_id=appointment_id, hospital_id=uuid.UUID(str(hospital_id)), payload=payload, channel=channel
+    )
+    db.add(entry)
+    notify(db, NOTIFICATION_OUTBOX_CHANNEL)
+    return entry
+
+
+def enqueue_assignment_notifications(
+    db: Session, *, appointment_id: uuid.UUID, hospital: HospitalResponse, payload: dict
+) -> None:
+    """
+    Queue the assignment for the hospital: always as an MQTT event, and as an
+    HTTP post unless the hospital only subscribes over MQTT
+    """
+    if settings.MQTT_ENABLED:
+        enqueue_hospital_notification(
+            db,
+            appointment_id=appointment_id,
+            hospital_id=hospital.id,
+            payload={"event": "assigned", "occurred_at": datetime.now().isoformat(), **payload},
+            channel=NotificationChannel.MQTT,
+        )
+    if hospital.notification_channel == NotificationChannel.HTTP or not settings.MQTT_ENABLED:
+        enqueue_hospital_notification(db, appointment_id=appointment_id, hospital_id=hospital.id, payload=payload)
+
+
+def enqueue_status_event(db: Session, appointment: Appointment) -> None:
+    """Queue an MQTT event for a status change of an appointment assigned to a hospital"""
+    if not settings.MQTT_ENABLED or not appointment.hospital_assigned:
+        return
+    try:
+        hospital_id = uuid.UUID(appointment.hospital_assigned)
+    except ValueError:
+        # Appointments assigned before hospitals were stored by id
+        return
+    enqueue_hospital_notification(
+        db,
+        appointment_id=appointment.id,
+        hospital_id=hospital_id,
+        payload={
+            "event": "status_changed",
+            "occurred_at": datetime.now().isoformat(),
+            "central_appointment_id": str(appointment.id),
+            "status": appointment.status.value,
+            "scheduled_time": appointment.scheduled_time.isoformat() if appointment.scheduled_time else None,
+        },
+        channel=NotificationChannel.MQTT,
+    )
+
+
+@dataclass
+class Delivery:
+    id: uuid.UUID
+    hospital_id: uuid.UUID
+    payload: dict
+    attempts: int
+
+
+@dataclass
+class Batch:
+    """Due notifications of one hospital sent together"""
+
+    hospital_id: uuid.UUID
+    uri: str | None
+    deliveries: list[Delivery]
+
+
+def hospital_slots(degraded: bool) -> int:
+    """Concurrent requests allowed per hospital, a slow hospital gets one at a time"""
+    return 1 if degraded else settings.NOTIFICATION_CONCURRENCY_PER_HOSPITAL
+
+
+def lease_until(now: datetime, size: int) -> datetime:
+    """
+    End of the lease of size notifications: room for one bulk request plus one
+    request per notification, should the hospital only take them one by one.
+    """
+    return now + timedelta(seconds=settings.NOTIFICATION_TIMEOUT_SECONDS * (size + 1))
+
+
+def claim_due(limit: int, busy: dict[uuid.UUID, int]) -> list[Batch]:
+    """
+    Lease up to limit batches of due notifications, one batch of at most
+    NOTIFICATION_BATCH_MAX_SIZE rows per hospital with a free slot.
+
+    Rows are locked with SKIP LOCKED and their next attempt pushed past the
+    time their batch may take to send, so a worker that dies mid-delivery
+    only delays them.
+    """
+    snapshot = registry.snapshot()
+    now = datetime.now()
+    due = (
+        NotificationOutbox.channel == NotificationChannel.HTTP,
+        NotificationOutbox.status == OutboxStatus.PENDING,
+        NotificationOutbox.next_attempt_at <= now,
+    )
+    saturated = []
+    for hospital_id, count in busy.items():
+        hospital = snapshot.get(hospital_id)
+        if count >= hospital_slots(bool(hospital and hospital.degraded)):
+            saturated.append(hospital_id)
+    ranked = (
+        select(
+            NotificationOutbox.id,
+            NotificationOutbox.hospital_id,
+            func.row_number()
+            .over(partition_by=NotificationOutbox.hospital_id, order_by=NotificationOutbox.next_attempt_at)
+            .label("rank"),
+        )
+        .where(*due)
+        .where(NotificationOutbox.hospital_id.not_in(saturated))
+        .subquery()
+    )
+    # The hospitals waiting the longest go first
+    hospitals = (
+        select(NotificationOutbox.hospital_id)
+        .where(*due)
+        .where(NotificationOutbox.hospital_id.not_in(saturated))
+        .group_by(NotificationOutbox.hospital_id)
+        .order_by(func.min(NotificationOutbox.next_attempt_at))
+        .limit(limit)
+    )
+    candidates = select(ranked.c.id).where(
+        ranked.c.rank <= settings.NOTIFICATION_BATCH_MAX_SIZE,
+        ranked.c.hospital_id.in_(hospitals),
+    )
+
+    batches: dict[uuid.UUID, Batch] = {}
+    with Session(engine) as db:
+        rows = db.exec(
+            select(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(candidates), *due)
+            .order_by(NotificationOutbox.next_attempt_at)
+            .with_for_update(skip_locked=True)
+        ).all()
+        for row in rows:
+            batch = batches.get(row.hospital_id)
+            if batch is None:
+                hospital = snapshot.get(row.hospital_id)
+                batch = batches[row.hospital_id] = Batch(
+                    hospital_id=row.hospital_id, uri=hospital.uri if hospital else None, deliveries=[]
+                )
+            batch.deliveries.append(
+                Delivery(id=row.id, hospital_id=row.hospital_id, payload=row.payload, attempts=row.attempts)
+            )
+        for row in rows:
+            row.next_attempt_at = lease_until(now, len(batches[row.hospital_id].deliveries))
+            db.add(row)
+        db.commit()
+    return list(batches.values())
+
+
+def renew_lease(deliveries: list[Delivery]) -> None:
+    """Restart the lease of deliveries still pending from now, e.g. before slower single posts"""
+    with Session(engine) as db:
+        db.exec(
+            update(NotificationOutbox)
+            .where(
+                NotificationOutbox.id.in_([delivery.id for delivery in deliveries]),
+                NotificationOutbox.status == OutboxStatus.PENDING,
+            )
+            .values(next_attempt_at=lease_until(datetime.now(), len(deliveries)))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with +-20% jitter, capped at NOTIFICATION_RETRY_MAX_SECONDS"""
+    delay = min(settings.NOTIFICATION_RETRY_MAX_SECONDS, settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * (0.8 + 0.4 * random.random())
+
+
+def _outcome(delivery: Delivery, status_code: int | None, error: str | None, now: datetime) -> dict:
+    attempts = delivery.attempts + 1
+    values = {
+        "row_id": delivery.id,
+        "attempts": attempts,
+        "last_error": error,
+        "new_status": OutboxStatus.PENDING,
+        "delivered_at": None,
+        "next_attempt_at": now,
+    }
+    if status_code is not None and 200 <= status_code < 300:
+        values.update(new_status=OutboxStatus.DELIVERED, delivered_at=now)
+    elif (
+        status_code is not None and 400 <= status_code < 500 and status_code not in RETRYABLE_STATUS
+    ) or attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+        values.update(new_status=OutboxStatus.DEAD)
+    else:
+        values.update(next_attempt_at=now + timedelta(seconds=retry_delay(attempts)))
+    return values
+
+
+def record_results(results: list[tuple[Delivery, int | None, str | None]]) -> list[OutboxStatus]:
+    """Mark deliveries as delivered, schedule their retry or dead-letter them, in one statement"""
+    if not results:
+        return []
+    now = datetime.now()
+    outcomes = [_outcome(delivery, status_code, error, now) for delivery, status_code, error in results]
+    statement = (
+        update(NotificationOutbox.__table__)
+        .where(NotificationOutbox.__table__.c.id == bindparam("row_id"))
+        .values(
+            status=bindparam("new_status"),
+            attempts=bindparam("attempts"),
+            last_error=bindparam("last_error"),
+            delivered_at=bindparam("delivered_at"),
+            next_attempt_at=bindparam("next_attempt_at"),
+        )
+    )
+    with Session(engine) as db:
+        db.connection().execute(statement, outcomes)
+        db.commit()
+    return [outcome["new_status"] for outcome in outcomes]
+
+
+def _url(uri: str, path: str) -> str:
+    return f"http://{uri}:{settings.HOSPITAL_API_PORT}/api/v1/specialty-appointments/{path}"
+
+
+async def _post(
+    http: aiohttp.ClientSession, hospital_id: uuid.UUID, url: str, body: dict
+) -> tuple[int | None, str | None]:
+    """POST to a hospital, returning the status code or the error"""
+    started = time.monotonic()
+    try:
+        async with http.post(url, json=body) as response:
+            await response.read()
+            status_code = response.status
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        latency_tracker.observe(hospital_id, ENDPOINT_APPOINTMENTS, time.monotonic() - started, ok=False)
+        return None, f"{type(e).__name__}: {str(e)}"
+    latency_tracker.observe(hospital_id, ENDPOINT_APPOINTMENTS, time.monotonic() - started, ok=status_code < 500)
+    return status_code, None if status_code < 400 else f"HTTP {status_code}"
+
+
+class BulkSupport:
+    """
+    Which hospitals accept the bulk endpoint. Unknown hospitals are tried in
+    bulk; a 404 or 405 marks them as single-only until the answer expires.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self._unsupported: dict[uuid.UUID, float] = {}
+
+    def supported(self, hospital_id: uuid.UUID) -> bool:
+        checked_at = self._unsupported.get(hospital_id)
+        if checked_at is None:
+            return True
+        if self.clock() - checked_at > settings.NOTIFICATION_BULK_RECHECK_SECONDS:
+            del self._unsupported[hospital_id]
+            return True
+        return False
+
+    def mark_unsupported(self, hospital_id: uuid.UUID) -> None:
+        self._unsupported[hospital_id] = self.clock()
+
+
+async def send_batch(
+    http: aiohttp.ClientSession, batch: Batch, bulk: BulkSupport
+) -> list[tuple[Delivery, int | None, str | None]]:
+    """
+    Send a batch in one request to the bulk endpoint when the hospital supports
+    it, otherwise one request per notification over the pooled connections.
+    """
+    if not batch.uri:
+        return [(delivery, None, "Hospital URI not found") for delivery in batch.deliveries]
+    if len(batch.deliveries) > 1 and bulk.supported(batch.hospital_id):
+        status_code, error = await _post(
+            http,
+            batch.hospital_id,
+            _url(batch.uri, "bulk"),
+            {"appointments": [delivery.payload for delivery in batch.deliveries]},
+        )
+        if status_code not in (404, 405):
+            return [(delivery, status_code, error) for delivery in batch.deliveries]
+        bulk.mark_unsupported(batch.hospital_id)
+        logger.info(f"Hospital {batch.hospital_id} has no bulk endpoint, sending notifications one by one")
+        # The bulk attempt used part of the lease, the single posts get a full one
+        await asyncio.to_thread(renew_lease, batch.deliveries)
+
+    async def single(delivery: Delivery) -> tuple[Delivery, int | None, str | None]:
+        status_code, error = await _post(http, batch.hospital_id, _url(batch.uri, ""), delivery.payload)
+        return delivery, status_code, error
+
+    return await asyncio.gather(*(single(delivery) for delivery in batch.deliveries))
+
+
+class OutboxWorker:
+    """
+    Drains the notification outbox. Runs in the leader process only.
+
+    One keep-alive connection pool is shared by every delivery. Each wake-up
+    (notification_outbox channel, a finished batch, or every
+    NOTIFICATION_POLL_SECONDS for retries that became due) lingers for
+    NOTIFICATION_BATCH_LINGER_SECONDS so notifications arriving together are
+    coalesced into per-hospital batches, then claims as many batches as it
+    has free slots.
+    """
+
+    def __init__(self) -> None:
+        self._wakeup: asyncio.Event | None = None
+        self._in_flight: set[asyncio.Task] = set()
+        self._busy: CountMap = CountMap()
+        self.bulk = BulkSupport()
+
+    def wake(self, payload: str | None = None) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _deliver(self, http: aiohttp.ClientSession, batch: Batch) -> None:
+        try:
+            results = await send_batch(http, batch, self.bulk)
+            statuses = await asyncio.to_thread(record_results, results)
+            for (delivery, _, error), result in zip(results, statuses, strict=True):
+                deliveries_total.inc(result=result.value if result != OutboxStatus.PENDING else "retry")
+                if result == OutboxStatus.DEAD:
+                    logger.error(f"Notification {delivery.id} to hospital {batch.hospital_id} dead-lettered: {error}")
+                elif result == OutboxStatus.PENDING:
+                    logger.warning(f"Notification {delivery.id} to hospital {batch.hospital_id} failed: {error}")
+        except Exception as e:
+            # The lease expires and the notifications are retried
+            logger.error(f"Error delivering notifications to hospital {batch.hospital_id}: {str(e)}")
+        finally:
+            self._busy[batch.hospital_id] -= 1
+            if self._busy[batch.hospital_id] <= 0:
+                del self._busy[batch.hospital_id]
+            deliveries_in_flight.dec(len(batch.deliveries))
+            self.wake()
+
+    async def run(self) -> None:
+        self._wakeup = asyncio.Event()
+        connector = aiohttp.TCPConnector(
+            limit=settings.NOTIFICATION_CONCURRENCY,
+            limit_per_host=settings.NOTIFICATION_CONCURRENCY_PER_HOSPITAL,
+            keepalive_timeout=60,
+        )
+        timeout = aiohttp.ClientTimeout(total=settings.NOTIFICATION_TIMEOUT_SECONDS)
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+                while True:
+                    self._wakeup.clear()
+                    capacity = settings.NOTIFICATION_CONCURRENCY - len(self._in_flight)
+                    claimed = []
+                    if capacity > 0:
+                        try:
+                            claimed = await asyncio.to_thread(claim_due, capacity, dict(self._busy))
+                        except Exception as e:
+                            logger.error(f"Error claiming notifications: {str(e)}")
+                    for batch in claimed:
+                        self._busy[batch.hospital_id] += 1
+                        deliveries_in_flight.inc(len(batch.deliveries))
+                        task = asyncio.create_task(self._deliver(http, batch))
+                        self._in_flight.add(task)
+                        task.add_done_callback(self._in_flight.discard)
+                    # Not asyncio.wait_for: it swallows a cancellation that arrives with the wakeup
+                    waking = asyncio.ensure_future(self._wakeup.wait())
+                    try:
+                        woken, _ = await asyncio.wait({waking}, timeout=settings.NOTIFICATION_POLL_SECONDS)
+                    finally:
+                        waking.cancel()
+                    if woken:
+                        await asyncio.sleep(settings.NOTIFICATION_BATCH_LINGER_SECONDS)
+        finally:
+            for task in list(self._in_flight):
+                task.cancel()
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+            self._wakeup = None
+
+
+outbox_worker = OutboxWorker()
+listener.subscribe(NOTIFICATION_OUTBOX_CHANNEL, outbox_worker.wake)
+
+
+async def deliver_notifications() -> None:
+    """Leader loop delivering the hospital notification outbox"""
+    await outbox_worker.run()
@@ -0,0 +1,135 @@
+import heapq
+import random
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+
+from app.models import StatusHospital
+
+
+@dataclass
+class ProbeState:
+    hospital_id: uuid.UUID
+    uri: str | None
+    status: StatusHospital
+    next_due: float = 0.0
+    interval: float = 0.0
+    consecutive_failures: int = 0
+    # Number of quick follow-up probes left after a status change
+    fast_probes_left: int = 0
+
+    @property
+    def id(self) -> uuid.UUID:
+        # Same attribute as Hospital so probes accept either
+        return self.hospital_id
+
+
+@dataclass
+class ProbeScheduler:
+    """
+    Per-hospital probe schedule kept in a heap keyed by next due time.
+
+    Healthy hospitals are probed every base_interval. A hospital that stays
+    INACTIVE backs off exponentially, with jitter, up to max_backoff, so
+    hospitals that have been down for hours barely cost anything. Right after
+    a status change the hospital is probed every fast_interval for a few
+    rounds so recoveries and flaps are confirmed quickly.
+    """
+
+    base_interval: float
+    fast_interval: float
+    max_backoff: float
+    fast_probes: int = 3
+    jitter: float = 0.2
+    clock: Callable[[], float] = time.monotonic
+    rng: Callable[[], float] = random.random
+    _states: dict[uuid.UUID, ProbeState] = field(default_factory=dict)
+    _heap: list[tuple[float, int, uuid.UUID]] = field(default_factory=list)
+    _counter: int = 0
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def _push(self, state: ProbeState) -> None:
+        self._counter += 1
+        heapq.heappush(self._heap, (state.next_due, self._counter, state.hospital_id))
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + self.jitter * (2 * self.rng() - 1))
+
+    def sync(self, targets: Iterable) -> None:
+        """
+        Align the schedule with the registry: new hospitals are due now,
+        deleted ones dropped, and hospitals whose address or stored status
+        changed elsewhere are probed again right away
+        """
+        now = self.clock()
+        seen = set()
+        for target in targets:
+            seen.add(target.id)
+            state = self._states.get(target.id)
+            if state is None:
+                state = ProbeState(hospital_id=target.id, uri=target.uri, status=target.status, next_due=now)
+                self._states[target.id] = state
+                self._push(state)
+            elif state.uri != target.uri or state.status != target.status:
+                state.uri = target.uri
+                state.status = target.status
+                state.next_due = now
+                self._push(state)
+        for hospital_id in set(self._states) - seen:
+            del self._states[hospital_id]
+
+    def pop_due(self) -> list[ProbeState]:
+        """Remove and return every hospital whose probe is due"""
+        now = self.clock()
+        due: dict[uuid.UUID, ProbeState] = {}
+        while self._heap and self._heap[0][0] <= now:
+            next_due, _, hospital_id = heapq.heappop(self._heap)
+            state = self._states.get(hospital_id)
+            # Skip entries of deleted hospitals and entries superseded by a reschedule
+            if state is None or state.next_due != next_due:
+                continue
+            due[hospital_id] = state
+        return list(due.values())
+
+    def record(self, state: ProbeState, is_active: bool) -> bool:
+        """Store a probe result, schedule the next probe and return True if the status changed"""
+        new_status = StatusHospital.ACTIVE if is_active else StatusHospital.INACTIVE
+        changed = state.status != new_status
+        state.status = new_status
+        state.consecutive_failures = 0 if is_active else state.consecutive_failures + 1
+
+        if changed:
+            state.fast_probes_left = self.fast_probes
+        if state.fast_probes_left > 0:
+            state.fast_probes_left -= 1
+            interval = self.fast_interval
+        elif is_active:
+            interval = self.base_interval
+        else:
+            exponent = max(0, state.consecutive_failures - self.fast_probes - 1)
+            interval = min(self.max_backoff, self.base_interval * 2 ** exponent)
+
+        state.interval = self._jittered(interval)
+        state.next_due = self.clock() + state.interval
+        self._push(state)
+        return changed
+
+    def requeue(self, state: ProbeState, previous_status: StatusHospital) -> None:
+        """
+        Undo a status change that could not be stored: the hospital keeps its
+        stored status and is probed again after fast_interval, so the change
+        is detected and written again.
+        """
+        state.status = previous_status
+        state.interval = self.fast_interval
+        state.next_due = self.clock() + state.interval
+        self._push(state)
+
+    def seconds_until_next(self, maximum: float) -> float:
+        """Time to sleep until the next probe is due, capped at maximum"""
+        if not self._heap:
+            return maximum
+        return max(0.0, min(maximum, self._heap[0][0] - self.clock()))
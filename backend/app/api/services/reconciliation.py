@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+
+import aiohttp
+from sqlalchemy import DateTime, case, cast, column, func, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+
+from app.api.services.appointment_status import publish_status_change
+from app.api.services.hospital_assignment import load_tracker
+from app.api.services.hospital_registry import registry
+from app.core.config import settings
+from app.core.db import engine
+from app.core.metrics import Counter, Gauge
+from app.models import (
+    Appointment,
+    AppointmentStatus,
+    HospitalResponse,
+    HospitalSyncCursor,
+    NotificationChannel,
+    StatusHospital,
+)
+
+logger = logging.getLogger(__name__)
+
+CHANGES_PATH = "/api/v1/specialty-appointments/changes"
+
+reconcile_lag = Gauge(
+    "medisur_reconcile_lag_seconds",
+    "Seconds since the last successful reconciliation pull of a hospital",
+    ["hospital"],
+)
+reconcile_applied = Counter(
+    "medisur_reconcile_applied_total",
+    "Appointment changes applied by the reconciliation pull",
+    ["hospital"],
+)
+reconcile_errors = Counter(
+    "medisur_reconcile_errors_total",
+    "Failed reconciliation pulls",
+    ["hospital"],
+)
+
+
+def parse_change(change: dict) -> tuple[uuid.UUID, datetime | None, AppointmentStatus | None] | None:
+    """
+    Normalize one entry of a hospital changes page. An appointment that gets a
+    time without an explicit status is considered assigned.
+    """
+    try:
+        appointment_id = uuid.UUID(str(change["central_appointment_id"]))
+    except (KeyError, ValueError):
+        return None
+    scheduled_time = change.get("scheduled_time")
+    if scheduled_time:
+        try:
+            scheduled_time = datetime.fromisoformat(scheduled_time).replace(tzinfo=None)
+        except ValueError:
+            scheduled_time = None
+    try:
+        new_status = AppointmentStatus(change["status"]) if change.get("status") else None
+    except ValueError:
+        new_status = None
+    if new_status is None and scheduled_time is not None:
+        new_status = AppointmentStatus.ASSIGNED
+    if new_status is None and scheduled_time is None:
+        return None
+    return appointment_id, scheduled_time, new_status
+
+
+def apply_changes(hospital_id: uuid.UUID, changes: list[dict], cursor: str | None) -> int:
+    """
+    Apply the changes of one hospital and advance its cursor in a single
+    transaction, with one UPDATE ... FROM (VALUES ...). Only appointments
+    assigned to that hospital can be touched. Status changes are announced
+    like those made through the API.
+    """
+    parsed: dict[uuid.UUID, tuple] = {}
+    for change in changes:
+        row = parse_change(change)
+        if row is not None:
+            # Later changes of the same appointment win
+            parsed[row[0]] = row
+    now = datetime.now()
+    status_type = Appointment.__table__.c.status.type
+    updated = []
+    previous: dict[uuid.UUID, AppointmentStatus] = {}
+    with Session(engine) as db:
+        if parsed:
+            previous = dict(
+                db.exec(
+                    select(Appointment.id, Appointment.status)
+                    .where(Appointment.id.in_(parsed), Appointment.hospital_assigned == str(hospital_id))
+                    .with_for_update()
+                ).all()
+            )
+            new_values = values(
+                column("id", Appointment.__table__.c.id.type),
+                column("scheduled_time", DateTime()),
+                column("status", status_type),
+                name="changes",
+            ).data(list(parsed.values()))
+            new_status = cast(new_values.c.status, status_type)
+            updated = db.exec(
+                update(Appointment)
+                .where(Appointment.id == new_values.c.id, Appointment.hospital_assigned == str(hospital_id))
+                .values(
+                    scheduled_time=func.coalesce(new_values.c.scheduled_time, Appointment.scheduled_time),
+                    status=func.coalesce(new_status, Appointment.status),
+                    assigned_time=func.coalesce(
+                        Appointment.assigned_time,
+                        case((new_status == AppointmentStatus.ASSIGNED, now)),
+                    ),
+                )
+                .returning(Appointment.id, Appointment.status)
+                .execution_options(synchronize_session=False)
+            ).all()
+            changed = [appointment_id for appointment_id, status in updated if previous.get(appointment_id) != status]
+            if changed:
+                for appointment in db.exec(select(Appointment).where(Appointment.id.in_(changed))):
+                    publish_status_change(db, appointment)
+        statement = insert(HospitalSyncCursor).values(
+            hospital_id=hospital_id, cursor=cursor, last_success_at=now, last_error=None, updated_at=now
+        )
+        db.exec(
+            statement.on_conflict_do_update(
+                index_elements=["hospital_id"],
+                set_={"cursor": cursor, "last_success_at": now, "last_error": None, "updated_at": now},
+            )
+        )
+        db.commit()
+    for appointment_id, status in updated:
+        load_tracker.on_appointment_change(str(hospital_id), previous.get(appointment_id), str(hospital_id), status)
+    return len(updated)
+
+
+def record_failure(hospital_id: uuid.UUID, error: str) -> None:
+    now = datetime.now()
+    with Session(engine) as db:
+        statement = insert(HospitalSyncCursor).values(hospital_id=hospital_id, last_error=error, updated_at=now)
+        db.exec(
+            statement.on_conflict_do_update(
+                index_elements=["hospital_id"], set_={"last_error": error, "updated_at": now}
+            )
+        )
+        db.commit()
+
+
+def load_cursors() -> dict[uuid.UUID, HospitalSyncCursor]:
+    with Session(engine) as db:
+        return {row.hospital_id: row for row in db.exec(select(HospitalSyncCursor)).all()}
+
+
+async def fetch_changes(
+    http: aiohttp.ClientSession, hospital: HospitalResponse, cursor: str | None
+) -> tuple[list[dict], str | None] | None:
+    """
+    Pull the pages of changes since the cursor. Returns None when the hospital
+    has no changes endpoint.
+    """
+    url = f"http://{hospital.uri}:{settings.HOSPITAL_API_PORT}{CHANGES_PATH}"
+    changes: list[dict] = []
+    for _ in range(settings.RECONCILE_MAX_PAGES):
+        params = {"limit": str(settings.RECONCILE_PAGE_SIZE)}
+        if cursor:
+            params["since"] = cursor
+        async with http.get(url, params=params) as response:
+            if response.status in (404, 405):
+                return None
+            response.raise_for_status()
+            page = await response.json()
+        changes.extend(page.get("data") or [])
+        cursor = page.get("cursor") or cursor
+        if not page.get("has_more"):
+            break
+    return changes, cursor
+
+
+async def reconcile_hospital(
+    http: aiohttp.ClientSession, hospital: HospitalResponse, cursor: HospitalSyncCursor | None
+) -> None:
+    try:
+        fetched = await fetch_changes(http, hospital, cursor.cursor if cursor else None)
+        if fetched is None:
+            return
+        changes, next_cursor = fetched
+        applied = await asyncio.to_thread(apply_changes, hospital.id, changes, next_cursor)
+        if applied:
+            reconcile_applied.inc(applied, hospital=str(hospital.id))
+            logger.info(f"Reconciled {applied} appointments from hospital {hospital.name}")
+    except Exception as e:
+        reconcile_errors.inc(hospital=str(hospital.id))
+        logger.error(f"Error reconciling hospital {hospital.name}: {str(e)}")
+        await asyncio.to_thread(record_failure, hospital.id, f"{type(e).__name__}: {str(e)}")
+
+
+async def reconcile_once(http: aiohttp.ClientSession) -> None:
+    """Pull every reachable HTTP hospital once, RECONCILE_CONCURRENCY at a time"""
+    snapshot = await asyncio.to_thread(registry.snapshot)
+    cursors = await asyncio.to_thread(load_cursors)
+    targets = [
+        hospital
+        for hospital in snapshot.hospitals
+        if hospital.uri
+        and hospital.status != StatusHospital.INACTIVE
+        and hospital.notification_channel == NotificationChannel.HTTP
+    ]
+    semaphore = asyncio.Semaphore(settings.RECONCILE_CONCURRENCY)
+
+    async def run(hospital: HospitalResponse) -> None:
+        async with semaphore:
+            await reconcile_hospital(http, hospital, cursors.get(hospital.id))
+
+    await asyncio.gather(*(run(hospital) for hospital in targets))
+
+    now = datetime.now()
+    for row in (await asyncio.to_thread(load_cursors)).values():
+        if row.last_success_at is not None:
+            reconcile_lag.set((now - row.last_success_at).total_seconds(), hospital=str(row.hospital_id))
+
+
+async def reconcile_hospitals() -> None:
+    """Leader loop pulling appointment changes from hospital systems"""
+    timeout = aiohttp.ClientTimeout(total=settings.NOTIFICATION_TIMEOUT_SECONDS)
+    connector = aiohttp.TCPConnector(limit=settings.RECONCILE_CONCURRENCY, limit_per_host=1)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        while True:
+            started = time.monotonic()
+            try:
+                await reconcile_once(http)
+            except Exception as e:
+                logger.error(f"Error in reconciliation run: {str(e)}")
+            await asyncio.sleep(max(0.0, settings.RECONCILE_INTERVAL_SECONDS - (time.monotonic() - started)))
@@ -0,0 +1,94 @@
+import heapq
+import math
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Optional
+
+from app.models import Hospital
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _to_unit_vector(latitude: float, longitude: float) -> tuple[float, float, float]:
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chord_to_km(chord: float) -> float:
+    """Convert a chord length on the unit sphere into a great-circle distance in km"""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+@dataclass
+class _Node:
+    point: tuple[float, float, float]
+    hospital: Hospital
+    axis: int
+    left: Optional["_Node"] = None
+    right: Optional["_Node"] = None
+
+
+class HospitalSpatialIndex:
+    """
+    KD-tree over hospital coordinates projected on the unit sphere.
+
+    Euclidean (chord) distance between unit vectors is monotonic with the
+    great-circle distance, so nearest neighbours in 3D are nearest on the globe.
+    """
+
+    def __init__(self, hospitals: Iterable[Hospital]):
+        points = [
+            (_to_unit_vector(h.latitude, h.longitude), h)
+            for h in hospitals
+            if h.latitude is not None and h.longitude is not None
+        ]
+        self.size = len(points)
+        self._root = self._build(points, 0)
+
+    def _build(self, points: list, depth: int) -> _Node | None:
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda item: item[0][axis])
+        median = len(points) // 2
+        point, hospital = points[median]
+        return _Node(
+            point=point,
+            hospital=hospital,
+            axis=axis,
+            left=self._build(points[:median], depth + 1),
+            right=self._build(points[median + 1:], depth + 1),
+        )
+
+    def nearest(self, latitude: float, longitude: float, k: int) -> list[tuple[float, Hospital]]:
+        """Return up to k (distance_km, hospital) pairs ordered by distance"""
+        if self._root is None or k <= 0:
+            return []
+        target = _to_unit_vector(latitude, longitude)
+        # Max-heap of the best k found so far, stored as (-squared_distance, tiebreak, hospital)
+        best: list[tuple[float, int, Hospital]] = []
+        counter = 0
+
+        def visit(node: _Node | None) -> None:
+            nonlocal counter
+            if node is None:
+                return
+            dist2 = sum((a - b) ** 2 for a, b in zip(node.point, target, strict=True))
+            counter += 1
+            if len(best) < k:
+                heapq.heappush(best, (-dist2, counter, node.hospital))
+            elif dist2 < -best[0][0]:
+                heapq.heapreplace(best, (-dist2, counter, node.hospital))
+
+            diff = target[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            visit(near)
+            if len(best) < k or diff * diff < -best[0][0]:
+                visit(far)
+
+        visit(self._root)
+        return [
+            (_chord_to_km(math.sqrt(-neg_dist2)), hospital)
+            for neg_dist2, _, hospital in sorted(best, key=lambda item: -item[0])
+        ]
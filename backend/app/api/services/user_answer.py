@@ -1,18 +1,17 @@
 import random
-from app.crud import get_hospitals
 import openai
 import requests
 from typing import Optional, List, Tuple
 from pydantic import BaseModel, Field
 from openai import OpenAI
 from app.core.config import settings
+from app.core.db import engine
 import os
-from app.models import AppointmentInfo, Hospital
+from app.models import HospitalResponse
 from app.models import especialidad, severity
-from sqlmodel import select, func
-from sqlalchemy.orm import Session
-from app.api.services.locator import get_coordinates
-from geopy.distance import geodesic
+from sqlmodel import Session
+from app.api.services.conversation import ConversationState
+from app.api.services.hospital_assignment import assign_hospital
 # Constants (Replace with real API keys)
 OPENAI_API_KEY = settings.OPENAI_API_KEY
 PERPLEXITY_API_KEY = settings.PERPLEXITY_API_KEY
@@ -153,49 +152,6 @@ def get_doctor_suggestions(context: StructuredUserInput) -> DoctorSuggestions:
     else:
         raise RuntimeError(f"Perplexity API error: {response.status_code}")
 
-def get_hospital(db: Session, user_location: str) -> Optional[Hospital]:
-    """
-    Get the closest hospital to the user's location.
-    
-    Args:
-        db: Database session
-        user_location: User's address string
-        
-    Returns:
-        Hospital: The closest hospital object or None if no coordinates could be found
-    """
-    # Get user coordinates
-    user_coords = get_coordinates(user_location)
-    if not user_coords:
-        print(f"Could not get coordinates for user location: {user_location}")
-        return None
-        
-    # Get all hospitals
-    hospitals = get_hospitals(session=db)
-    if not hospitals:
-        print("No hospitals found in database")
-        return None
-        
-    # Calculate distances and find closest
-    closest_hospital = None
-    min_distance = float('inf')
-    print(f"User coords: {user_coords}")
-    for hospital in hospitals:
-        if hospital.latitude and hospital.longitude:
-            hospital_coords = (hospital.latitude, hospital.longitude)
-            distance = geodesic(user_coords, hospital_coords).kilometers
-            print(f"Distance: {distance} for {hospital.name}")
-            if distance < min_distance:
-                min_distance = distance
-                closest_hospital = hospital
-                
-    if closest_hospital:
-        print(f"Found closest hospital: {closest_hospital.name} at {min_distance:.2f} km")
-    else:
-        print("No hospital with valid coordinates found")
-        
-    return closest_hospital
-
 # --- MAIN PROCESS FLOW --- #
 
 class MedicalCaseResult(BaseModel):
@@ -203,10 +159,14 @@ class MedicalCaseResult(BaseModel):
     extra_questions: Optional[LLMQuestionResponse] = None
     triage: Optional[TriageResult] = None
     doctor_suggestions: Optional[DoctorSuggestions] = None
-    assigned_hospital: Optional[Hospital] = None
+    assigned_hospital: Optional[HospitalResponse] = None
+    location_geohash: Optional[str] = None
 
-def process_medical_case(db: Session, raw_input: RawUserInput, user_location: str):
-    """Orchestrates the entire process flow."""
+def process_medical_case(raw_input: RawUserInput, user_location: str):
+    """
+    Orchestrates the entire process flow. The LLM calls run without a database
+    session; one is opened only for the hospital assignment.
+    """
     MAX_QUESTIONS = 1
     # Step 1: Parse raw input into structured format
     structured_input = parse_user_input(raw_input)
@@ -226,11 +186,15 @@ def process_medical_case(db: Session, raw_input: RawUserInput, user_location: st
     # Step 4: Fetch doctor suggestions from Perplexity
     doctor_suggestions = get_doctor_suggestions(structured_input)
     
+    with Session(engine) as db:
+        assignment = assign_hospital(db, user_location, triage_result.specialty, triage_result.urgency)
+    
     return MedicalCaseResult(
         raw_input=raw_input,
         triage=triage_result,
         doctor_suggestions=doctor_suggestions,
-        assigned_hospital=get_hospital(db, user_location)
+        assigned_hospital=assignment.hospital if assignment else None,
+        location_geohash=assignment.geohash if assignment else None
     )
 
 
@@ -254,24 +218,14 @@ if __name__ == "__main__":
     print(result)
 
 
-def ask_more_questions(db: Session, user_id: str, appointment_id: str, user_location: str):
+def ask_more_questions(user_id: str, conversation: ConversationState, user_location: str):
     """Asks OpenAI if additional information is needed."""
-    # Get all information related to this appointment
-    stmt = select(AppointmentInfo).where(AppointmentInfo.appointment_id == appointment_id).order_by(AppointmentInfo.order)
-    appointment_info = db.exec(stmt).all()
-    
-    questions_by_agent = select(AppointmentInfo).where(AppointmentInfo.appointment_id == appointment_id, AppointmentInfo.sender == "assistant").order_by(AppointmentInfo.order)
-    questions_from_agent = db.exec(questions_by_agent).all()
-    
-    print(len(questions_from_agent))
-    if not appointment_info:
+    # The transcript comes from the conversation kept by the websocket, not from the database
+    print(conversation.questions_asked)
+    if not conversation.chat:
         return  # No information to process
     
-    # Combine all information into a single string
-    patient_input = []
-    for info in appointment_info:
-        patient_input.append(info.content)
-    print('\n'.join(patient_input))
-    raw_input = RawUserInput(user_id=user_id, chat=patient_input, num_previous_questions=len(questions_from_agent))
+    print('\n'.join(conversation.chat))
+    raw_input = RawUserInput(user_id=user_id, chat=conversation.chat, num_previous_questions=conversation.questions_asked)
     
-    return process_medical_case(db, raw_input, user_location)
+    return process_medical_case(raw_input, user_location)
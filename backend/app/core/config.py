@@ -41,6 +41,115 @@ class Settings(BaseSettings):
     PERPLEXITY_API_KEY: str
     ELEVENLABS_API_KEY: str
     MQTT_SERVER_URI: str = "localhost"
+    # MQTT publishing of appointment events, off unless a broker is deployed:
+    # broker port, the fixed client id that keeps the persistent session, topic
+    # prefix and QoS 1 messages in flight
+    MQTT_ENABLED: bool = False
+    MQTT_PORT: int = 1883
+    MQTT_CLIENT_ID: str = "medisur-central"
+    MQTT_TOPIC_PREFIX: str = "medisur/hospitals"
+    MQTT_MAX_INFLIGHT: int = 100
+    # Hospital assignment: number of nearest hospitals considered and how many
+    # kilometres of extra travel one pending appointment in the queue is worth
+    HOSPITAL_ASSIGNMENT_CANDIDATES: int = 8
+    HOSPITAL_QUEUE_PENALTY_KM: float = 2.0
+    # Geocoding: CSV gazetteer used before (or instead of) Nominatim, defaults
+    # to the bundled app/data/gazetteer.csv, and the latency budget for Nominatim
+    GAZETTEER_PATH: str | None = None
+    GEOCODER_LOCAL_FIRST: bool = True
+    GEOCODER_TIMEOUT_SECONDS: float = 2.0
+    # Catchments: geohash cells (precision 5 is ~5 km) owned by the nearest
+    # hospital within CATCHMENT_RADIUS_KM. The owner is assigned directly while
+    # its pending queue is below CATCHMENT_QUEUE_LIMIT
+    CATCHMENT_GEOHASH_PRECISION: int = 5
+    CATCHMENT_RADIUS_KM: float = 30.0
+    CATCHMENT_QUEUE_LIMIT: int = 20
+    # Port of the API every hospital system exposes on its uri
+    HOSPITAL_API_PORT: int = 8000
+    # Hospital monitor: probes in flight, sockets per hospital host and probe timeout
+    HOSPITAL_MONITOR_CONCURRENCY: int = 200
+    HOSPITAL_MONITOR_CONNECTIONS_PER_HOST: int = 4
+    HOSPITAL_PROBE_TIMEOUT_SECONDS: float = 5.0
+    # Probe schedule: healthy interval, interval right after a status change
+    # and the backoff ceiling for hospitals that stay down
+    HOSPITAL_PROBE_INTERVAL_SECONDS: float = 10.0
+    HOSPITAL_PROBE_FAST_INTERVAL_SECONDS: float = 2.0
+    HOSPITAL_PROBE_MAX_BACKOFF_SECONDS: float = 600.0
+    # Hospital latency: rolling window, persistence cadence, and the p95 above
+    # which a hospital is marked degraded once it has enough samples
+    HOSPITAL_LATENCY_WINDOW_SECONDS: float = 300.0
+    HOSPITAL_LATENCY_FLUSH_SECONDS: float = 60.0
+    HOSPITAL_LATENCY_MIN_SAMPLES: int = 5
+    HOSPITAL_DEGRADED_P95_MS: float = 1500.0
+    # Extra virtual distance added to degraded hospitals when ranking candidates
+    HOSPITAL_DEGRADED_PENALTY_KM: float = 25.0
+    # Reconciliation pull of appointment changes from hospital systems: how
+    # often, hospitals pulled in parallel, and page size and page limit per run
+    RECONCILE_INTERVAL_SECONDS: float = 60.0
+    RECONCILE_CONCURRENCY: int = 20
+    RECONCILE_PAGE_SIZE: int = 500
+    RECONCILE_MAX_PAGES: int = 20
+    # Upper bound on the age of the in-memory hospital registry snapshot, in
+    # case a change notification is missed
+    HOSPITAL_REGISTRY_MAX_AGE_SECONDS: float = 60.0
+    # Hospital notification outbox: requests in flight (total and per hospital),
+    # request timeout, retry backoff and attempts before dead-lettering
+    NOTIFICATION_CONCURRENCY: int = 50
+    NOTIFICATION_CONCURRENCY_PER_HOSPITAL: int = 4
+    NOTIFICATION_TIMEOUT_SECONDS: float = 10.0
+    NOTIFICATION_RETRY_BASE_SECONDS: float = 5.0
+    NOTIFICATION_RETRY_MAX_SECONDS: float = 900.0
+    NOTIFICATION_MAX_ATTEMPTS: int = 10
+    NOTIFICATION_POLL_SECONDS: float = 5.0
+    # Micro-batches: notifications per hospital request, how long a wake-up
+    # waits for more to arrive, and when to retry the bulk endpoint of a
+    # hospital that did not have one
+    NOTIFICATION_BATCH_MAX_SIZE: int = 50
+    NOTIFICATION_BATCH_LINGER_SECONDS: float = 0.2
+    NOTIFICATION_BULK_RECHECK_SECONDS: float = 3600.0
+    # Websocket conversation registry: how often each process refreshes its
+    # open sessions, and after how long without a refresh a session is reaped
+    CONVERSATION_SESSION_HEARTBEAT_SECONDS: float = 30.0
+    CONVERSATION_SESSION_TTL_SECONDS: float = 120.0
+    # Patient websockets: connections without a patient message for
+    # WS_IDLE_TIMEOUT_SECONDS are closed as abandoned; dead ones are found by
+    # uvicorn's own pings (--ws-ping-interval/--ws-ping-timeout)
+    WS_IDLE_TIMEOUT_SECONDS: float = 600.0
+    # Hospital dashboards: appointment events streamed over server-sent events,
+    # a keepalive comment when idle, the browser reconnect delay, and events
+    # buffered per dashboard before it is told to reload instead
+    DASHBOARD_STREAM_KEEPALIVE_SECONDS: float = 15.0
+    DASHBOARD_STREAM_RETRY_SECONDS: float = 3.0
+    DASHBOARD_STREAM_QUEUE_SIZE: int = 200
+    # Case forecasting: days in the rolling growth and Rt windows, gamma serial
+    # interval of the tracked disease in days, and cached forecasts kept per
+    # process, served at most this long if an invalidation is ever missed
+    FORECAST_WINDOW_DAYS: int = 7
+    FORECAST_SERIAL_INTERVAL_MEAN_DAYS: float = 4.7
+    FORECAST_SERIAL_INTERVAL_SD_DAYS: float = 2.9
+    FORECAST_CACHE_SIZE: int = 256
+    FORECAST_CACHE_MAX_AGE_SECONDS: float = 300.0
+    # Triage admission control: conversations in progress per process and in
+    # the whole deployment; waiting patients retry for a global slot at this
+    # cadence and jump the queue when they mention an urgency keyword
+    TRIAGE_SESSIONS_PER_WORKER: int = 50
+    TRIAGE_SESSIONS_GLOBAL: int = 200
+    TRIAGE_ADMISSION_RETRY_SECONDS: float = 2.0
+    TRIAGE_URGENT_KEYWORDS: list[str] = [
+        "dolor en el pecho",
+        "no puedo respirar",
+        "me ahogo",
+        "sangrado",
+        "inconsciente",
+        "desmayo",
+        "convulsiones",
+        "infarto",
+        "ictus",
+    ]
+    # Background loops run in a single leader process chosen with a Postgres
+    # advisory lock; followers retry (and the leader re-checks) at this cadence
+    LEADER_ELECTION_ENABLED: bool = True
+    LEADER_RETRY_SECONDS: float = 5.0
     BACKEND_CORS_ORIGINS: Annotated[
         list[AnyUrl] | str, BeforeValidator(parse_cors)
     ] = []
@@ -80,6 +189,11 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    @property
+    def LIBPQ_DATABASE_URI(self) -> str:
+        # Plain libpq URI for connections opened with psycopg directly
+        return str(self.SQLALCHEMY_DATABASE_URI).replace("postgresql+psycopg://", "postgresql://", 1)
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
@@ -189,7 +189,9 @@ def init_appointments(session: Session, count: int = 3000) -> list[Appointment]:
     
     # Create appointment info entries in batch
     for appointment in appointments:
-        for order in range(random.randint(1, 3)):
+        entries = random.randint(1, 3)
+        appointment.message_seq = entries - 1
+        for order in range(entries):
             info = AppointmentInfo(
                 id=uuid.uuid4(),
                 appointment_id=appointment.id,
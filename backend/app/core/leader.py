@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+from collections.abc import Awaitable, Callable, Sequence
+from contextlib import asynccontextmanager
+
+import psycopg
+
+from app.core.config import settings
+from app.core.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key shared by every process of the deployment
+LEADER_LOCK_KEY = 7305_0001
+APPLICATION_NAME_PREFIX = "medisur-leader:"
+# Postgres silently truncates application_name to NAMEDATALEN - 1 bytes
+APPLICATION_NAME_MAX_BYTES = 63
+
+is_leader_gauge = Gauge(
+    "medisur_leader",
+    "1 if this process runs the background loops, 0 otherwise",
+    ["identity"],
+)
+
+
+def process_identity() -> str:
+    """
+    hostname:pid of this process. Long hostnames are shortened and suffixed
+    with a hash so the identity fits application_name and can be read back.
+    """
+    identity = f"{socket.gethostname()}:{os.getpid()}"
+    budget = APPLICATION_NAME_MAX_BYTES - len(APPLICATION_NAME_PREFIX)
+    encoded = identity.encode()
+    if len(encoded) <= budget:
+        return identity
+    digest = hashlib.sha1(encoded).hexdigest()[:8]
+    return f"{encoded[:budget - len(digest) - 1].decode(errors='ignore')}~{digest}"
+
+
+class LeaderElection:
+    """
+    Run background loops in exactly one process of the deployment.
+
+    Every process tries to take a session-level Postgres advisory lock on a
+    dedicated connection. The holder runs the tasks; if it dies its connection
+    closes, Postgres releases the lock and another process picks it up on its
+    next attempt. The leader checks its connection on the same cadence and
+    stops its tasks as soon as it loses it. A task that crashes is restarted
+    on the next check; one that returns, e.g. a disabled integration, is not.
+    """
+
+    def __init__(self, tasks: Sequence[Callable[[], Awaitable[None]]], retry_seconds: float | None = None):
+        self.tasks = tasks
+        self.retry_seconds = retry_seconds or settings.LEADER_RETRY_SECONDS
+        self.identity = process_identity()
+        self.is_leader = False
+        self._connection: psycopg.AsyncConnection | None = None
+        is_leader_gauge.set(0, identity=self.identity)
+
+    async def _try_acquire(self) -> bool:
+        connection = await psycopg.AsyncConnection.connect(
+            settings.LIBPQ_DATABASE_URI,
+            autocommit=True,
+            application_name=f"{APPLICATION_NAME_PREFIX}{self.identity}",
+            # Detect a dead peer quickly so the lock is released on hard crashes
+            keepalives=1,
+            keepalives_idle=10,
+            keepalives_interval=5,
+            keepalives_count=3,
+        )
+        try:
+            cursor = await connection.execute("SELECT pg_try_advisory_lock(%s)", (LEADER_LOCK_KEY,))
+            row = await cursor.fetchone()
+            if row and row[0]:
+                self._connection = connection
+                return True
+            return False
+        finally:
+            # Only the connection holding the lock is kept
+            if self._connection is not connection:
+                await connection.close()
+
+    async def _still_leader(self) -> bool:
+        try:
+            await self._connection.execute("SELECT 1")
+            return True
+        except Exception as e:
+            logger.error(f"Leader connection lost: {str(e)}")
+            return False
+
+    def _set_leader(self, value: bool) -> None:
+        self.is_leader = value
+        is_leader_gauge.set(1 if value else 0, identity=self.identity)
+
+    def _restart_crashed(self, running: list[asyncio.Task]) -> None:
+        for index, task in enumerate(running):
+            if not task.done() or task.cancelled() or task.exception() is None:
+                continue
+            name = getattr(self.tasks[index], "__name__", repr(self.tasks[index]))
+            logger.error(f"Leader task {name} crashed, restarting it: {task.exception()!r}")
+            running[index] = asyncio.create_task(self.tasks[index]())
+
+    async def _lead(self) -> None:
+        self._set_leader(True)
+        logger.info(f"{self.identity} is now the leader")
+        running = [asyncio.create_task(task()) for task in self.tasks]
+        try:
+            while await self._still_leader():
+                await asyncio.sleep(self.retry_seconds)
+                self._restart_crashed(running)
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            self._set_leader(False)
+            if self._connection is not None:
+                await self._connection.close()
+                self._connection = None
+            logger.info(f"{self.identity} stepped down as leader")
+
+    async def run(self) -> None:
+        while True:
+            try:
+                if await self._try_acquire():
+                    await self._lead()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Leader election error: {str(e)}")
+            await asyncio.sleep(self.retry_seconds)
+
+
+async def current_leader() -> str | None:
+    """Identity of the process holding the leader lock, from any process"""
+    async with await psycopg.AsyncConnection.connect(settings.LIBPQ_DATABASE_URI, autocommit=True) as connection:
+        cursor = await connection.execute(
+            """
+            SELECT a.application_name
+            FROM pg_locks l JOIN pg_stat_activity a ON a.pid = l.pid
+            WHERE l.locktype = 'advisory' AND l.granted
+              AND l.classid = %s AND l.objid = %s AND l.objsubid = 1
+            """,
+            (LEADER_LOCK_KEY >> 32, LEADER_LOCK_KEY & 0xFFFFFFFF),
+        )
+        row = await cursor.fetchone()
+    if row is None:
+        return None
+    return row[0].removeprefix(APPLICATION_NAME_PREFIX)
+
+
+election: LeaderElection | None = None
+
+
+@asynccontextmanager
+async def lifespan_leader(tasks: Sequence[Callable[[], Awaitable[None]]]):
+    """Run the given background loops only while this process is the leader"""
+    global election
+    if not settings.LEADER_ELECTION_ENABLED:
+        running = [asyncio.create_task(task()) for task in tasks]
+    else:
+        election = LeaderElection(tasks)
+        running = [asyncio.create_task(election.run())]
+    yield
+    for task in running:
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
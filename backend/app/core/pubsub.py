@@ -0,0 +1,86 @@
+"""
+Cross-process notifications over Postgres LISTEN/NOTIFY.
+
+`notify` queues a notification inside the caller's transaction, so listeners
+only hear about changes that were committed. Every process runs one
+`PgListener` connection that dispatches notifications to the handlers
+subscribed to each channel.
+"""
+import asyncio
+import logging
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+
+import psycopg
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HOSPITAL_REGISTRY_CHANNEL = "hospital_registry"
+NOTIFICATION_OUTBOX_CHANNEL = "notification_outbox"
+CONVERSATION_CHANNEL = "conversation"
+APPOINTMENT_EVENTS_CHANNEL = "appointment_events"
+APPOINTMENT_STATS_CHANNEL = "appointment_stats"
+
+
+def notify(session: Session, channel: str, payload: str = "") -> None:
+    """Send a notification when the session's transaction commits"""
+    session.exec(text("SELECT pg_notify(:channel, :payload)"), params={"channel": channel, "payload": payload})
+
+
+class PgListener:
+    """
+    A dedicated connection listening on every subscribed channel.
+
+    Notifications sent while the connection is down are lost, so handlers are
+    also called with payload None after every (re)connection and must treat it
+    as "anything may have changed".
+    """
+
+    def __init__(self, retry_seconds: float = 5.0):
+        self.retry_seconds = retry_seconds
+        self._handlers: dict[str, list[Callable[[str | None], None]]] = {}
+
+    def subscribe(self, channel: str, handler: Callable[[str | None], None]) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def _dispatch(self, channel: str, payload: str | None) -> None:
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Error handling notification on {channel}: {str(e)}")
+
+    async def run(self) -> None:
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(settings.LIBPQ_DATABASE_URI, autocommit=True) as connection:
+                    for channel in self._handlers:
+                        await connection.execute(f'LISTEN "{channel}"')
+                    for channel in self._handlers:
+                        self._dispatch(channel, None)
+                    async for notification in connection.notifies():
+                        self._dispatch(notification.channel, notification.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification listener error: {str(e)}")
+            await asyncio.sleep(self.retry_seconds)
+
+
+listener = PgListener()
+
+
+@asynccontextmanager
+async def lifespan_listener():
+    """Listen for notifications in this process for the lifetime of the app"""
+    task = asyncio.create_task(listener.run())
+    yield
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
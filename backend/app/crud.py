@@ -63,7 +63,7 @@ def create_item(*, session: Session, item_in: ItemCreate, owner_id: uuid.UUID) -
     return db_item
 
 # Hospital CRUD operations
-def get_hospitals(*, session: Session, skip: int = 0, limit: int = 100) -> list[Hospital]:
+def get_hospitals(*, session: Session, skip: int = 0, limit: int | None = 100) -> list[Hospital]:
     statement = select(Hospital).offset(skip).limit(limit)
     hospitals = session.exec(statement).all()
     return hospitals
@@ -1,14 +1,25 @@
+from contextlib import asynccontextmanager
+
 import sentry_sdk
+import uvicorn
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
-import uvicorn
-from contextlib import asynccontextmanager
 
 from app.api.main import api_router
+from app.api.services.appointment_rollup import ensure_rollup
+from app.api.services.catchment import ensure_catchments
+from app.api.services.conversation_sessions import lifespan_conversations
+from app.api.services.hospital_latency import lifespan_latency
+from app.api.services.hospital_monitor import monitor_hospitals
+from app.api.services.mqtt_publisher import publish_mqtt_events
+from app.api.services.notification_outbox import deliver_notifications
+from app.api.services.reconciliation import reconcile_hospitals
 from app.core.config import settings
 from app.core.db import create_db_and_tables, full_init
-from app.api.services.hospital_monitor import lifespan_monitor
+from app.core.leader import lifespan_leader
+from app.core.pubsub import lifespan_listener
+
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
@@ -18,8 +29,13 @@ if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
 @asynccontextmanager
-async def lifespan(app: FastAPI):
-    async with lifespan_monitor(app):
+async def lifespan(_app: FastAPI):
+    ensure_catchments()
+    ensure_rollup()
+    # Only the elected leader of the deployment runs these loops
+    async with lifespan_listener(), lifespan_leader(
+        [monitor_hospitals, deliver_notifications, publish_mqtt_events, reconcile_hospitals]
+    ), lifespan_latency(), lifespan_conversations():
         yield
 
 app = FastAPI(
@@ -1,11 +1,11 @@
 import uuid
 import enum
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 from pydantic import EmailStr
 from sqlmodel import Field, Relationship, SQLModel
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON, UniqueConstraint, text
 
 especialidad = [
     "Anestesiología",
@@ -142,6 +142,13 @@ class Message(SQLModel):
     message: str
 
 
+# Which process runs the background loops
+class LeaderStatus(SQLModel):
+    identity: str
+    is_leader: bool
+    leader: str | None = None
+
+
 # JSON payload containing access token
 class Token(SQLModel):
     access_token: str
@@ -175,6 +182,8 @@ class AppointmentBase(SQLModel):
     prority: str | None = Field(default=None, max_length=255)
     medical_specialty: str | None = Field(default=None, max_length=255)
     contagious: bool = Field(default=False)
+    # Geohash cell of the patient location, used to attribute the appointment to a catchment
+    geohash: str | None = Field(default=None, max_length=12, index=True)
     
     # Timestamps
     request_start_time: datetime = Field(default_factory=datetime.now)
@@ -186,12 +195,34 @@ class AppointmentBase(SQLModel):
 
 # Database model
 class Appointment(AppointmentBase, table=True):
+    # Listing pages walk (request_start_time, id) newest first; every filter
+    # of /appointments/all leads one of these indexes so a page is a range scan
+    __table_args__ = (
+        Index("ix_appointment_request", "request_start_time", "id"),
+        Index("ix_appointment_hospital_request", "hospital_assigned", "request_start_time", "id"),
+        Index(
+            "ix_appointment_contagious_hospital_request",
+            "hospital_assigned",
+            "request_start_time",
+            "id",
+            postgresql_where=text("contagious"),
+        ),
+        Index("ix_appointment_contagious_request", "request_start_time", "id", postgresql_where=text("contagious")),
+        Index("ix_appointment_status_request", "status", "request_start_time", "id"),
+        Index("ix_appointment_specialty_request", "medical_specialty", "request_start_time", "id"),
+        Index("ix_appointment_priority_request", "prority", "request_start_time", "id"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    # Order of the last AppointmentInfo entry, bumped atomically for every new message
+    message_seq: int = Field(default=0)
     info_entries: list["AppointmentInfo"] = Relationship(back_populates="appointment", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
 
 
 # Appointment Information Entry model
 class AppointmentInfo(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("appointment_id", "order"),)
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     appointment_id: uuid.UUID = Field(foreign_key="appointment.id", nullable=False, ondelete="CASCADE")
     content: str = Field(...)
@@ -204,6 +235,18 @@ class AppointmentInfo(SQLModel, table=True):
     appointment: Appointment = Relationship(back_populates="info_entries")
 
 
+# Open websocket conversation of an appointment: the process holding the socket
+# and the connection id that identifies it, refreshed while the socket is alive
+class ConversationSession(SQLModel, table=True):
+    appointment_id: uuid.UUID = Field(foreign_key="appointment.id", primary_key=True, ondelete="CASCADE")
+    connection_id: uuid.UUID
+    worker: str = Field(max_length=255)
+    connected_at: datetime = Field(default_factory=datetime.now)
+    last_seen_at: datetime = Field(default_factory=datetime.now, index=True)
+    # Set while the conversation holds one of the TRIAGE_SESSIONS_GLOBAL slots
+    admitted_at: datetime | None = Field(default=None)
+
+
 # AppointmentInfo creation model
 class AppointmentInfoCreate(SQLModel):
     content: str
@@ -248,11 +291,91 @@ class AppointmentsPublic(SQLModel):
     data: list[AppointmentResponse]
     count: int
 
+
+# Appointment statistics: size of the time buckets and the columns counts can
+# be broken down by
+class StatsGranularity(str, enum.Enum):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+
+
+class StatsDimension(str, enum.Enum):
+    HOSPITAL = "hospital_assigned"
+    SPECIALTY = "medical_specialty"
+    PRIORITY = "prority"
+
+
+# Appointments per day and combination of the statistics dimensions, kept in
+# step with the appointment table by a trigger (services/appointment_rollup).
+# Missing values are stored as "" because every column is part of the key.
+class AppointmentDailyCount(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    hospital_assigned: str = Field(default="", primary_key=True, max_length=255)
+    medical_specialty: str = Field(default="", primary_key=True, max_length=255)
+    prority: str = Field(default="", primary_key=True, max_length=255)
+    contagious: bool = Field(default=False, primary_key=True)
+    status: AppointmentStatus = Field(primary_key=True)
+    count: int = Field(default=0)
+
+
+class AppointmentCountBucket(SQLModel):
+    bucket: datetime
+    hospital_assigned: str | None = None
+    medical_specialty: str | None = None
+    prority: str | None = None
+    count: int
+
+
+class AppointmentCountsPublic(SQLModel):
+    data: list[AppointmentCountBucket]
+    count: int
+
+
+# Daily cases with the rolling growth rate and reproduction number ending on
+# that day; None until a full window of history is available
+class CaseTrendPoint(SQLModel):
+    day: date
+    cases: int
+    growth_rate: float | None = None
+    rt: float | None = None
+
+
+# Expected cases of a future day and their 95% prediction interval
+class CaseForecastPoint(SQLModel):
+    day: date
+    cases: float
+    lower: float
+    upper: float
+
+
+class CaseForecast(SQLModel):
+    series: list[CaseTrendPoint]
+    growth_rate: float
+    doubling_time: float | None = None
+    rt: float | None = None
+    forecast: list[CaseForecastPoint]
+
+
+# One page of /appointments/all: next_cursor is None on the last page and
+# count is only computed for the first page
+class AppointmentsPage(SQLModel):
+    data: list[AppointmentResponse]
+    count: int | None = None
+    next_cursor: str | None = None
+
 class StatusHospital(str, enum.Enum):
     ACTIVE = "active"
     INACTIVE = "inactive"
     UNKNOWN = "unknown"
 
+
+# How a hospital receives its appointments: HTTP posts to its API or MQTT
+# subscription only. Events are published on MQTT for every hospital.
+class NotificationChannel(str, enum.Enum):
+    HTTP = "http"
+    MQTT = "mqtt"
+
 class HospitalBase(SQLModel):
     name: str = Field(max_length=255)
     address: str = Field(max_length=255)
@@ -263,10 +386,15 @@ class HospitalBase(SQLModel):
     email: EmailStr = Field(max_length=255)
     contact_person: str = Field(max_length=255)
     uri: str | None = Field(default=None, max_length=255)
+    # Specialties offered by the hospital, None means a general hospital that takes every specialty
+    specialties: list[str] | None = Field(default=None, sa_column=Column(JSON))
+    notification_channel: NotificationChannel = Field(default=NotificationChannel.HTTP)
 
 # Hospital database model
 class Hospital(HospitalBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    # Set by the latency tracker when the p95 response time is too high
+    degraded: bool = Field(default=False)
 
 
 # Hospital create model
@@ -277,6 +405,7 @@ class HospitalCreate(HospitalBase):
 # Hospital response model
 class HospitalResponse(HospitalBase):
     id: uuid.UUID
+    degraded: bool = False
 
 
 # Hospital update model
@@ -289,6 +418,8 @@ class HospitalUpdate(SQLModel):
     latitude: float | None = Field(default=None)
     longitude: float | None = Field(default=None)
     uri: str | None = Field(default=None)
+    specialties: list[str] | None = Field(default=None)
+    notification_channel: NotificationChannel | None = Field(default=None)
 
 
 # Hospitals list response
@@ -297,6 +428,90 @@ class HospitalsPublic(SQLModel):
     count: int
 
 
+# Catchment cell: the hospital that owns a geohash cell
+class HospitalCatchment(SQLModel, table=True):
+    geohash: str = Field(primary_key=True, max_length=12)
+    hospital_id: uuid.UUID = Field(foreign_key="hospital.id", nullable=False, ondelete="CASCADE", index=True)
+    distance_km: float = Field(default=0.0)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+# Latency histogram of a hospital endpoint as seen by one process; readers
+# merge the rows of every process
+class HospitalLatency(SQLModel, table=True):
+    hospital_id: uuid.UUID = Field(foreign_key="hospital.id", primary_key=True, ondelete="CASCADE")
+    endpoint: str = Field(primary_key=True, max_length=64)
+    process: str = Field(primary_key=True, max_length=64)
+    # Samples per latency bucket, see hospital_latency.BUCKET_BOUNDS_MS
+    counts: list[int] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    samples: int = Field(default=0)
+    errors: int = Field(default=0)
+    p50_ms: float | None = Field(default=None)
+    p95_ms: float | None = Field(default=None)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+class HospitalLatencySummary(SQLModel):
+    endpoint: str
+    samples: int
+    errors: int
+    p50_ms: float | None
+    p95_ms: float | None
+    updated_at: datetime
+
+
+class HospitalLatencyPublic(SQLModel):
+    hospital_id: uuid.UUID
+    degraded: bool
+    data: list[HospitalLatencySummary]
+
+
+# Delivery state of a hospital notification
+class OutboxStatus(str, enum.Enum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    DEAD = "dead"
+
+
+# Hospital notification written in the same transaction as the assignment and
+# delivered asynchronously by the outbox worker
+class NotificationOutbox(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    appointment_id: uuid.UUID = Field(foreign_key="appointment.id", nullable=False, ondelete="CASCADE", index=True)
+    hospital_id: uuid.UUID = Field(foreign_key="hospital.id", nullable=False, ondelete="CASCADE", index=True)
+    channel: NotificationChannel = Field(default=NotificationChannel.HTTP, index=True)
+    payload: dict = Field(sa_column=Column(JSON, nullable=False))
+    status: OutboxStatus = Field(default=OutboxStatus.PENDING, index=True)
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.now, index=True)
+    last_error: str | None = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.now)
+    delivered_at: datetime | None = Field(default=None)
+
+
+# Reconciliation state of a hospital: the opaque since-cursor returned by its
+# changes endpoint and when the last pull succeeded
+class HospitalSyncCursor(SQLModel, table=True):
+    hospital_id: uuid.UUID = Field(foreign_key="hospital.id", primary_key=True, ondelete="CASCADE")
+    cursor: str | None = Field(default=None, max_length=255)
+    last_success_at: datetime | None = Field(default=None)
+    last_error: str | None = Field(default=None)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+# Patient volume of a hospital catchment
+class CatchmentVolume(SQLModel):
+    hospital_id: uuid.UUID
+    hospital_name: str
+    cells: int
+    appointments: int
+
+
+class CatchmentVolumesPublic(SQLModel):
+    data: list[CatchmentVolume]
+    count: int
+
+
 # Gender enum for Patient
 class Gender(str, enum.Enum):
     MALE = "M"
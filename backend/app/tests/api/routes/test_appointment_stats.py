@@ -0,0 +1,65 @@
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, delete
+
+from app.core.config import settings
+from app.models import Appointment
+
+
+def test_counts_are_bucketed_and_grouped(client: TestClient, db: Session) -> None:
+    hospital_a, hospital_b = str(uuid.uuid4()), str(uuid.uuid4())
+    rows = [
+        # (request time, hospital, specialty, contagious)
+        (datetime(2024, 5, 6, 8, 15), hospital_a, "Neumología", True),
+        (datetime(2024, 5, 6, 8, 45), hospital_a, "Neumología", True),
+        (datetime(2024, 5, 6, 17, 0), hospital_b, "Neumología", True),
+        (datetime(2024, 5, 7, 9, 0), hospital_a, "Cardiología", True),
+        (datetime(2024, 5, 7, 9, 30), hospital_a, "Cardiología", False),
+        # Monday of the following week, and a day outside the range
+        (datetime(2024, 5, 13, 10, 0), hospital_b, "Neumología", True),
+        (datetime(2024, 5, 20, 10, 0), hospital_b, "Neumología", True),
+    ]
+    db.add_all(
+        Appointment(
+            patient_id="appointment-stats",
+            request_start_time=requested,
+            hospital_assigned=hospital,
+            medical_specialty=specialty,
+            contagious=contagious,
+        )
+        for requested, hospital, specialty, contagious in rows
+    )
+    db.commit()
+    url = f"{settings.API_V1_STR}/appointments/stats/counts"
+    params = {"start_date": "2024-05-06", "end_date": "2024-05-13", "contagious": True}
+
+    def counts(**extra) -> list[tuple]:
+        response = client.get(url, params={**params, **extra})
+        assert response.status_code == 200
+        return [
+            (row["bucket"], row["hospital_assigned"], row["medical_specialty"], row["count"])
+            for row in response.json()["data"]
+            if row["hospital_assigned"] in (hospital_a, hospital_b, None)
+        ]
+
+    assert counts(hospital_assigned=hospital_a) == [
+        ("2024-05-06T00:00:00", None, None, 2),
+        ("2024-05-07T00:00:00", None, None, 1),
+    ]
+    assert counts(group_by=["hospital_assigned"], granularity="week") == sorted(
+        [
+            ("2024-05-06T00:00:00", hospital_a, None, 3),
+            ("2024-05-06T00:00:00", hospital_b, None, 1),
+            ("2024-05-13T00:00:00", hospital_b, None, 1),
+        ]
+    )
+    assert counts(hospital_assigned=hospital_a, granularity="hour", group_by=["medical_specialty"]) == [
+        ("2024-05-06T08:00:00", None, "Neumología", 2),
+        ("2024-05-07T09:00:00", None, "Cardiología", 1),
+    ]
+    assert client.get(url, params={"start_date": "2024-05-13", "end_date": "2024-05-06"}).status_code == 400
+
+    db.exec(delete(Appointment).where(Appointment.patient_id == "appointment-stats"))
+    db.commit()
@@ -0,0 +1,60 @@
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, delete
+
+from app.core.config import settings
+from app.models import Appointment, AppointmentStatus
+
+
+def test_pages_are_stable_and_filtered(client: TestClient, db: Session) -> None:
+    hospital = str(uuid.uuid4())
+    day = datetime(2024, 3, 10, 9, 0)
+    appointments = [
+        Appointment(
+            patient_id="appointments-list",
+            hospital_assigned=hospital,
+            # Three appointments per timestamp: ties are broken by id
+            request_start_time=day + timedelta(hours=index // 3),
+            status=AppointmentStatus.PENDING if index % 2 else AppointmentStatus.ASSIGNED,
+            contagious=index % 4 == 0,
+        )
+        for index in range(25)
+    ]
+    db.add_all(appointments)
+    db.commit()
+    url = f"{settings.API_V1_STR}/appointments/all"
+
+    seen: list[dict] = []
+    params = {"hospital_assigned": hospital, "limit": 10}
+    response = client.get(url, params=params).json()
+    assert response["count"] == 25
+    while True:
+        seen.extend(response["data"])
+        if response["next_cursor"] is None:
+            break
+        # A row inserted at the top meanwhile does not shift the following pages
+        if len(seen) == 10:
+            db.add(Appointment(patient_id="appointments-list", hospital_assigned=hospital, request_start_time=day + timedelta(days=1)))
+            db.commit()
+        response = client.get(url, params={**params, "cursor": response["next_cursor"]}).json()
+        assert response["count"] is None
+    assert len(seen) == 25
+    keys = [(row["request_start_time"], row["id"]) for row in seen]
+    assert keys == sorted(keys, reverse=True)
+    assert len(set(keys)) == 25
+
+    # Dates are inclusive days
+    response = client.get(url, params={**params, "start_date": "2024-03-10", "end_date": "2024-03-10", "limit": 100}).json()
+    assert response["count"] == 25
+    response = client.get(url, params={**params, "start_date": "2024-03-11"}).json()
+    assert response["count"] == 1
+    response = client.get(url, params={**params, "status": AppointmentStatus.PENDING.value, "contagious": False}).json()
+    assert response["count"] == sum(1 for a in appointments if a.status == AppointmentStatus.PENDING and not a.contagious)
+    assert all(row["status"] == AppointmentStatus.PENDING.value for row in response["data"])
+
+    assert client.get(url, params={"cursor": "not-a-cursor"}).status_code == 400
+
+    db.exec(delete(Appointment).where(Appointment.patient_id == "appointments-list"))
+    db.commit()
@@ -0,0 +1,228 @@
+import gc
+import logging
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlmodel import Session, delete, func, select
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.routes import appointments as appointment_routes
+from app.api.routes.utils import register_message, register_messages
+from app.api.services.admission import admission
+from app.api.services.conversation_sessions import conversation_sessions
+from app.api.services.hospital_assignment import load_tracker
+from app.api.services.user_answer import MedicalCaseResult, RawUserInput, TriageResult
+from app.core.config import settings
+from app.core.db import engine
+from app.core.security import get_password_hash
+from app.models import (
+    Appointment,
+    AppointmentStatus,
+    ConversationSession,
+    Gender,
+    Hospital,
+    HospitalResponse,
+    Patient,
+    StatusHospital,
+    User,
+)
+
+# Connect/abandon cycles of the soak test, about half an hour: run it with `pytest -m soak`
+SOAK_CYCLES = 10_000
+
+
+def create_patient(db: Session, name: str) -> tuple[User, Patient]:
+    user = User(email=f"{name}@example.com", hashed_password=get_password_hash("password123"))
+    db.add(user)
+    db.commit()
+    patient = Patient(
+        first_name=name,
+        last_name="Patient",
+        national_id=f"{name}-0001",
+        date_of_birth=datetime(1990, 1, 1),
+        gender=Gender.OTHER,
+        address="Calle Mayor 1",
+        city="Madrid",
+        user_id=user.id,
+    )
+    db.add(patient)
+    db.commit()
+    return user, patient
+
+
+def remove_patient(db: Session, user: User, patient: Patient) -> None:
+    db.exec(delete(Appointment).where(Appointment.patient_id == str(user.id)))
+    db.exec(delete(Patient).where(Patient.id == patient.id))
+    db.exec(delete(User).where(User.id == user.id))
+    db.commit()
+
+
+def test_idle_conversations_do_not_hold_connections(client: TestClient, db: Session) -> None:
+    user, patient = create_patient(db, "ws-idle")
+    appointments = [
+        Appointment(patient_id=str(user.id), status=AppointmentStatus.MISSING_DATA) for _ in range(500)
+    ]
+    db.add_all(appointments)
+    db.commit()
+    ids = [str(appointment.id) for appointment in appointments]
+    register_message(db, ids[0], "Me duele la cabeza", "user")
+
+    with ExitStack() as stack:
+        sockets = [
+            stack.enter_context(client.websocket_connect(f"{settings.API_V1_STR}/appointments/ws/{appointment_id}"))
+            for appointment_id in ids
+        ]
+        # The stored conversation is replayed on connect
+        assert sockets[0].receive_json() == {"type": "history", "sender": "user", "value": "Me duele la cabeza", "order": 1}
+        # Far more open conversations than the pool has connections, none of them checked out
+        assert engine.pool.checkedout() < engine.pool.size()
+
+        started = time.monotonic()
+        for appointment_id in ids[:50]:
+            response = client.get(f"{settings.API_V1_STR}/appointments/appointments/{appointment_id}")
+            assert response.status_code == 200
+            assert response.json()["status"] == AppointmentStatus.MISSING_DATA.value
+        # Well below the pool checkout timeout that a starved pool would hit
+        assert time.monotonic() - started < 10
+
+    # Every socket leaves the registry once the server side has finished closing
+    deadline = time.monotonic() + 5
+    while db.exec(select(func.count()).select_from(ConversationSession)).one() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert db.exec(select(func.count()).select_from(ConversationSession)).one() == 0
+
+    remove_patient(db, user, patient)
+
+
+def test_reconnect_replays_only_missed_messages(client: TestClient, db: Session) -> None:
+    user, patient = create_patient(db, "ws-resume")
+    appointment = Appointment(patient_id=str(user.id), status=AppointmentStatus.MISSING_DATA)
+    db.add(appointment)
+    db.commit()
+    register_message(db, str(appointment.id), "Tengo tos", "user")
+    register_messages(db, str(appointment.id), ["¿Desde cuándo?", "¿Tiene fiebre?"], "assistant")
+
+    url = f"{settings.API_V1_STR}/appointments/ws/{appointment.id}"
+    with client.websocket_connect(f"{url}?after=1") as websocket:
+        replayed = [websocket.receive_json() for _ in range(2)]
+    assert [(m["order"], m["value"]) for m in replayed] == [(2, "¿Desde cuándo?"), (3, "¿Tiene fiebre?")]
+
+    remove_patient(db, user, patient)
+
+
+def test_triage_without_hospital_tells_the_patient(
+    client: TestClient, db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user, patient = create_patient(db, "ws-assign")
+    hospital = Hospital(name="Inactive", address="x", phone_number="1", email="h@example.com", contact_person="x",
+                        uri="", status=StatusHospital.INACTIVE)
+    appointments = [Appointment(patient_id=str(user.id), status=AppointmentStatus.MISSING_DATA) for _ in range(2)]
+    db.add_all([hospital, *appointments])
+    db.commit()
+    assigned: list[HospitalResponse | None] = [None, HospitalResponse.model_validate(hospital)]
+
+    def triage(patient_id, conversation, _location) -> MedicalCaseResult:
+        return MedicalCaseResult(
+            raw_input=RawUserInput(user_id=patient_id, chat=conversation.chat),
+            triage=TriageResult(urgency="High", specialty="Cardiología", contagious=False),
+            assigned_hospital=assigned.pop(0),
+        )
+
+    monkeypatch.setattr(appointment_routes, "ask_more_questions", triage)
+    queued = load_tracker.get(str(hospital.id))
+    url = f"{settings.API_V1_STR}/appointments/ws"
+
+    with client.websocket_connect(f"{url}/{appointments[0].id}") as websocket:
+        websocket.send_text("Me duele el pecho")
+        assert websocket.receive_json()["type"] == "error"
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
+    with client.websocket_connect(f"{url}/{appointments[1].id}") as websocket:
+        websocket.send_text("Me duele el pecho")
+        assert websocket.receive_json()["type"] == "done"
+    # The queue counts the appointment once it is stored
+    assert load_tracker.get(str(hospital.id)) == queued + 1
+    for appointment in appointments:
+        db.refresh(appointment)
+    assert [a.status for a in appointments] == [AppointmentStatus.MISSING_DATA, AppointmentStatus.PENDING]
+
+    load_tracker.decrement(str(hospital.id))
+    remove_patient(db, user, patient)
+    db.delete(hospital)
+    db.commit()
+
+
+def test_abandoned_connections_are_closed(
+    client: TestClient, db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    user, patient = create_patient(db, "ws-keepalive")
+    appointment = Appointment(patient_id=str(user.id), status=AppointmentStatus.MISSING_DATA)
+    db.add(appointment)
+    db.commit()
+    url = f"{settings.API_V1_STR}/appointments/ws/{appointment.id}"
+    monkeypatch.setattr(settings, "WS_IDLE_TIMEOUT_SECONDS", 0.3)
+
+    # The server sends nothing the client has to answer, it only closes the abandoned conversation
+    started = time.monotonic()
+    with client.websocket_connect(url) as websocket:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert time.monotonic() - started >= 0.3
+    assert (closed.value.code, closed.value.reason) == (status.WS_1001_GOING_AWAY, "idle timeout")
+
+    remove_patient(db, user, patient)
+
+
+@pytest.mark.soak
+def test_abandoned_connections_leave_nothing_behind(client: TestClient, db: Session) -> None:
+    user, patient = create_patient(db, "ws-soak")
+    appointment = Appointment(patient_id=str(user.id), status=AppointmentStatus.MISSING_DATA)
+    db.add(appointment)
+    db.commit()
+    url = f"{settings.API_V1_STR}/appointments/ws/{appointment.id}"
+
+    def cycles(count: int) -> None:
+        for _ in range(count):
+            with client.websocket_connect(url):
+                pass
+
+    def settled() -> bool:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if len(conversation_sessions) == 0 and admission.active == 0 and admission.waiting == 0:
+                gc.collect()
+                return True
+            time.sleep(0.05)
+        return False
+
+    def traced() -> int:
+        # What pytest itself keeps (captured output and log records) is not the server's
+        harness = [
+            tracemalloc.Filter(False, "*/_pytest/*", all_frames=True),
+            tracemalloc.Filter(False, logging.__file__, all_frames=True),
+        ]
+        snapshot = tracemalloc.take_snapshot().filter_traces(harness)
+        return sum(stat.size for stat in snapshot.statistics("filename"))
+
+    cycles(100)
+    tracemalloc.start(10)
+    try:
+        assert settled()
+        baseline = traced()
+        cycles(SOAK_CYCLES)
+        # Every socket, registry entry and admission ticket is released
+        assert settled()
+        grown = traced() - baseline
+    finally:
+        tracemalloc.stop()
+
+    assert db.exec(select(func.count()).select_from(ConversationSession)).one() == 0
+    # Flat: nothing retained per abandoned connection beyond noise
+    assert grown < SOAK_CYCLES * 100, f"{grown} bytes retained after {SOAK_CYCLES} connections"
+
+    remove_patient(db, user, patient)
@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlmodel import Session, delete, select
+
+from app.api.routes.utils import register_message, register_messages
+from app.core.db import engine
+from app.models import Appointment, AppointmentInfo
+
+
+def test_concurrent_messages_get_consecutive_orders(db: Session) -> None:
+    appointment = Appointment(patient_id="messages")
+    db.add(appointment)
+    db.commit()
+    appointment_id = str(appointment.id)
+
+    def write(worker: int) -> None:
+        with Session(engine) as session:
+            for turn in range(5):
+                register_message(session, appointment_id, f"user {worker}-{turn}", "user")
+                register_messages(
+                    session, appointment_id, [f"question {worker}-{turn}-{n}" for n in range(3)], "assistant"
+                )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, range(8)))
+
+    entries = db.exec(
+        select(AppointmentInfo).where(AppointmentInfo.appointment_id == appointment.id).order_by(AppointmentInfo.order)
+    ).all()
+    assert [entry.order for entry in entries] == list(range(1, 8 * 5 * 4 + 1))
+    # The questions of one batch stay together and in order
+    for entry in entries:
+        if entry.content.endswith("-0") and entry.sender == "assistant":
+            following = entries[entry.order : entry.order + 2]
+            assert [e.content for e in following] == [entry.content[:-1] + "1", entry.content[:-1] + "2"]
+    db.refresh(appointment)
+    assert appointment.message_seq == 8 * 5 * 4
+
+    db.exec(delete(Appointment).where(Appointment.id == appointment.id))
+    db.commit()
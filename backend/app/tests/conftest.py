@@ -12,6 +12,16 @@ from app.tests.utils.user import authentication_token_from_email
 from app.tests.utils.utils import get_superuser_token_headers
 
 
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    # Soak tests take minutes; they only run when asked for with -m soak
+    if "soak" in (config.option.markexpr or ""):
+        return
+    skip_soak = pytest.mark.skip(reason="soak test, run with -m soak")
+    for item in items:
+        if "soak" in item.keywords:
+            item.add_marker(skip_soak)
+
+
 @pytest.fixture(scope="session", autouse=True)
 def db() -> Generator[Session, None, None]:
     with Session(engine) as session:
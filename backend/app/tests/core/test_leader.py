@@ -0,0 +1,92 @@
+import asyncio
+import socket
+
+import pytest
+
+from app.core import leader
+from app.core.leader import (
+    APPLICATION_NAME_MAX_BYTES,
+    APPLICATION_NAME_PREFIX,
+    LeaderElection,
+    current_leader,
+)
+
+
+def test_single_leader_and_failover() -> None:
+    async def scenario() -> None:
+        runs = {"first": 0, "second": 0}
+
+        def loop(name: str):
+            async def task() -> None:
+                runs[name] += 1
+                await asyncio.Event().wait()
+
+            return task
+
+        first = LeaderElection([loop("first")], retry_seconds=0.05)
+        second = LeaderElection([loop("second")], retry_seconds=0.05)
+        second.identity = f"{second.identity}:second"
+
+        first_run = asyncio.create_task(first.run())
+        await asyncio.sleep(0.3)
+        second_run = asyncio.create_task(second.run())
+        await asyncio.sleep(0.3)
+        assert first.is_leader and not second.is_leader
+        assert runs == {"first": 1, "second": 0}
+        assert await current_leader() == first.identity
+
+        # Killing the leader closes its connection and releases the lock
+        first_run.cancel()
+        await asyncio.gather(first_run, return_exceptions=True)
+        await asyncio.sleep(0.5)
+        assert second.is_leader
+        assert runs["second"] == 1
+        assert await current_leader() == second.identity
+
+        second_run.cancel()
+        await asyncio.gather(second_run, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_crashed_tasks_are_restarted_and_finished_ones_are_not() -> None:
+    async def scenario() -> None:
+        runs = {"crashing": 0, "finished": 0}
+
+        async def crashing() -> None:
+            runs["crashing"] += 1
+            if runs["crashing"] == 1:
+                raise RuntimeError("boom")
+            await asyncio.Event().wait()
+
+        async def finished() -> None:
+            # Like publish_mqtt_events when MQTT is disabled
+            runs["finished"] += 1
+
+        election = LeaderElection([crashing, finished], retry_seconds=0.05)
+        run = asyncio.create_task(election.run())
+        await asyncio.sleep(0.5)
+        assert election.is_leader
+        assert runs == {"crashing": 2, "finished": 1}
+
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_long_identities_fit_application_name(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(socket, "gethostname", lambda: "pod-" + "x" * 80)
+
+    identity = leader.process_identity()
+    assert len(f"{APPLICATION_NAME_PREFIX}{identity}".encode()) <= APPLICATION_NAME_MAX_BYTES
+
+    async def scenario() -> None:
+        election = LeaderElection([], retry_seconds=0.05)
+        run = asyncio.create_task(election.run())
+        await asyncio.sleep(0.3)
+        assert await current_leader() == election.identity == identity
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+
+    asyncio.run(scenario())
@@ -0,0 +1,93 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlmodel import Session, delete
+
+from app.api.services.admission import AdmissionController, is_urgent
+from app.core.config import settings
+from app.models import Appointment, ConversationSession
+
+
+def test_urgency_keywords_ignore_case_and_accents() -> None:
+    assert is_urgent("Tengo DOLOR en el pecho desde hace una hora")
+    assert is_urgent("tuvo convulsiónes y un desmayo")
+    assert not is_urgent("Me duele un poco la garganta")
+
+
+def test_admission_limits_per_worker_and_globally(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "TRIAGE_SESSIONS_PER_WORKER", 2)
+    monkeypatch.setattr(settings, "TRIAGE_SESSIONS_GLOBAL", 3)
+    monkeypatch.setattr(settings, "TRIAGE_ADMISSION_RETRY_SECONDS", 60.0)
+    appointments = [Appointment(patient_id="admission") for _ in range(7)]
+    db.add_all(appointments)
+    db.commit()
+    sessions = [
+        ConversationSession(appointment_id=a.id, connection_id=uuid.uuid4(), worker="test") for a in appointments
+    ]
+    db.add_all(sessions)
+    db.commit()
+    keys = [(str(s.appointment_id), s.connection_id) for s in sessions]
+
+    async def scenario() -> None:
+        worker_a, worker_b = AdmissionController(), AdmissionController()
+        first = [worker_a.enter(*keys[i]) for i in range(3)]
+        await worker_a.pump()
+        assert [t.admitted for t in first] == [True, True, False] and first[2].position == 1
+
+        second = [worker_b.enter(*keys[i]) for i in (3, 4)]
+        await worker_b.pump()
+        # The third global slot goes to worker B; its next ticket waits for a global slot
+        assert second[0].admitted and not second[1].admitted and second[1].position == 1
+
+        late = worker_a.enter(*keys[5])
+        urgent = worker_a.enter(*keys[6], urgent=True)
+        assert (urgent.position, first[2].position, late.position) == (1, 2, 3)
+
+        # A finished conversation frees its local slot and, with its row gone, the global one
+        db.exec(delete(ConversationSession).where(ConversationSession.appointment_id == uuid.UUID(keys[0][0])))
+        db.commit()
+        worker_a.leave(first[0])
+        while not urgent.admitted:
+            await asyncio.sleep(0.01)
+        assert (first[2].position, late.position) == (1, 2)
+        assert (worker_a.active, worker_a.waiting) == (2, 2)
+
+        worker_a.boost(late)
+        assert (late.position, first[2].position) == (1, 2)
+        # Waiting tickets that leave are renumbered
+        worker_a.leave(late)
+        assert first[2].position == 1 and worker_a.waiting == 1
+
+    asyncio.run(scenario())
+
+    db.exec(delete(Appointment).where(Appointment.patient_id == "admission"))
+    db.commit()
+
+
+def test_failed_claim_keeps_the_ticket_waiting(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "TRIAGE_SESSIONS_PER_WORKER", 2)
+    monkeypatch.setattr(settings, "TRIAGE_SESSIONS_GLOBAL", 3)
+    appointment = Appointment(patient_id="admission-missing")
+    db.add(appointment)
+    db.commit()
+    session = ConversationSession(appointment_id=appointment.id, connection_id=uuid.uuid4(), worker="test")
+    db.add(session)
+    db.commit()
+
+    async def scenario() -> None:
+        controller = AdmissionController()
+        # A connection that was taken over has no row of its own to claim a slot with
+        ticket = controller.enter(str(appointment.id), uuid.uuid4())
+        await controller.pump()
+        assert not ticket.admitted and ticket.position == 1
+        assert (controller.active, controller.waiting) == (0, 1)
+        controller.leave(ticket)
+
+    asyncio.run(scenario())
+
+    db.refresh(session)
+    assert session.admitted_at is None
+
+    db.exec(delete(Appointment).where(Appointment.patient_id == "admission-missing"))
+    db.commit()
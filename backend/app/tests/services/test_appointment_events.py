@@ -0,0 +1,82 @@
+import asyncio
+import json
+import uuid
+
+from sqlmodel import Session, delete
+
+from app.api.services.appointment_events import (
+    RESYNC,
+    DashboardStreams,
+    publish_appointment_event,
+    stream_events,
+)
+from app.core.config import settings
+from app.core.db import engine
+from app.core.pubsub import APPOINTMENT_EVENTS_CHANNEL, PgListener
+from app.models import Appointment, AppointmentStatus
+
+
+def test_dashboards_receive_only_their_hospital_events(db: Session) -> None:
+    hospital_a, hospital_b = str(uuid.uuid4()), str(uuid.uuid4())
+    appointments = [
+        Appointment(patient_id="dashboard-events", hospital_assigned=hospital, status=AppointmentStatus.PENDING)
+        for hospital in (hospital_a, hospital_b, None)
+    ]
+    db.add_all(appointments)
+    db.commit()
+    streams = DashboardStreams()
+
+    async def connected() -> bool:
+        return False
+
+    async def scenario() -> list[str]:
+        ready = asyncio.Event()
+        pg = PgListener(retry_seconds=0.1)
+        pg.subscribe(APPOINTMENT_EVENTS_CHANNEL, streams.dispatch)
+        pg.subscribe(APPOINTMENT_EVENTS_CHANNEL, lambda payload: payload is None and ready.set())
+        task = asyncio.create_task(pg.run())
+        await asyncio.wait_for(ready.wait(), 5.0)
+
+        stream = stream_events(hospital_a, connected, streams)
+        chunks = [await anext(stream)]
+        assert len(streams) == 1
+        with Session(engine) as session:
+            for appointment in appointments:
+                publish_appointment_event(session, appointment, "assigned")
+            session.commit()
+        chunks.append(await asyncio.wait_for(anext(stream), 5.0))
+        await stream.aclose()
+        assert len(streams) == 0
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return chunks
+
+    retry, event = asyncio.run(scenario())
+    assert retry == f"retry: {int(settings.DASHBOARD_STREAM_RETRY_SECONDS * 1000)}\n\n"
+    name, data = event.strip().split("\n")
+    assert name == "event: assigned"
+    payload = json.loads(data.removeprefix("data: "))
+    assert payload["appointment_id"] == str(appointments[0].id)
+    assert payload["status"] == AppointmentStatus.PENDING.value
+
+    db.exec(delete(Appointment).where(Appointment.patient_id == "dashboard-events"))
+    db.commit()
+
+
+def test_slow_dashboards_are_told_to_resync() -> None:
+    streams = DashboardStreams()
+
+    async def scenario() -> None:
+        queue = streams.subscribe("hospital")
+        for index in range(settings.DASHBOARD_STREAM_QUEUE_SIZE + 1):
+            streams.dispatch(json.dumps({"event": "status", "hospital_assigned": "hospital", "index": index}))
+        # The backlog is dropped for a single reload
+        assert queue.qsize() == 1 and queue.get_nowait() == RESYNC
+        # So is everything after a listener reconnection
+        streams.dispatch(None)
+        assert queue.get_nowait() == RESYNC
+        streams.unsubscribe("hospital", queue)
+
+    asyncio.run(scenario())
+    assert len(streams) == 0
@@ -0,0 +1,66 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlmodel import Session, delete, func, select
+
+from app.api.services.appointment_rollup import ensure_rollup, rebuild_rollup
+from app.models import Appointment, AppointmentDailyCount, AppointmentStatus
+
+
+def rollup_of(db: Session, hospital: str) -> dict[tuple, int]:
+    rows = db.exec(
+        select(AppointmentDailyCount).where(AppointmentDailyCount.hospital_assigned == hospital, AppointmentDailyCount.count != 0)
+    ).all()
+    return {(row.day, row.medical_specialty, row.prority, row.contagious, row.status): row.count for row in rows}
+
+
+def counted(db: Session, hospital: str) -> dict[tuple, int]:
+    day = func.date(Appointment.request_start_time)
+    statement = (
+        select(day, func.coalesce(Appointment.medical_specialty, ""), func.coalesce(Appointment.prority, ""), Appointment.contagious, Appointment.status, func.count())
+        .where(Appointment.hospital_assigned == hospital)
+        .group_by(day, Appointment.medical_specialty, Appointment.prority, Appointment.contagious, Appointment.status)
+    )
+    return {tuple(row[:5]): row[5] for row in db.exec(statement).all()}
+
+
+def test_rollup_follows_every_kind_of_write(db: Session) -> None:
+    ensure_rollup()
+    hospital, other = str(uuid.uuid4()), str(uuid.uuid4())
+    appointments = [
+        Appointment(
+            patient_id="appointment-rollup",
+            hospital_assigned=hospital,
+            request_start_time=datetime(2024, 6, 1 + index % 3, 10),
+            medical_specialty="Neumología" if index % 2 else None,
+            prority="Alta",
+            contagious=index % 4 == 0,
+        )
+        for index in range(12)
+    ]
+    db.add_all(appointments)
+    db.commit()
+    assert rollup_of(db, hospital) == counted(db, hospital)
+
+    # ORM updates, bulk updates and deletes move counts between keys
+    appointments[0].status = AppointmentStatus.PENDING
+    appointments[1].message_seq += 1
+    db.add_all(appointments[:2])
+    db.commit()
+    db.exec(update(Appointment).where(Appointment.prority == "Alta", Appointment.hospital_assigned == hospital).values(status=AppointmentStatus.ASSIGNED))
+    appointments[2].hospital_assigned = other
+    db.add(appointments[2])
+    db.delete(appointments[3])
+    db.commit()
+    assert rollup_of(db, hospital) == counted(db, hospital)
+    assert rollup_of(db, other) == counted(db, other) == {(datetime(2024, 6, 3).date(), "", "Alta", False, AppointmentStatus.ASSIGNED): 1}
+
+    # A rebuild finds the same counts
+    expected = rollup_of(db, hospital)
+    rebuild_rollup(db)
+    assert rollup_of(db, hospital) == expected
+
+    db.exec(delete(Appointment).where(Appointment.patient_id == "appointment-rollup"))
+    db.commit()
+    assert rollup_of(db, hospital) == rollup_of(db, other) == {}
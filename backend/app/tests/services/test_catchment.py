@@ -0,0 +1,35 @@
+from fastapi.testclient import TestClient
+from geopy.distance import great_circle
+
+from app.api.services.geohash import (
+    cells_within,
+    geohash_bounds,
+    geohash_center,
+    geohash_encode,
+)
+from app.core.config import settings
+
+
+def test_geohash_round_trip() -> None:
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    lat_min, lat_max, lon_min, lon_max = geohash_bounds("u4pruydqqvj")
+    assert lat_min <= 57.64911 <= lat_max
+    assert lon_min <= 10.40744 <= lon_max
+
+
+def test_cells_within_radius() -> None:
+    cells = cells_within(-34.6037, -58.3816, 10.0, precision=5)
+
+    assert geohash_encode(-34.6037, -58.3816, 5) in cells
+    assert all(great_circle((-34.6037, -58.3816), geohash_center(c)).km <= 10.0 for c in cells)
+    # A 10 km circle covers roughly pi * 10^2 / (4.9 * 4.0) cells of precision 5
+    assert 10 < len(cells) < 40
+
+
+def test_read_catchment_volumes(client: TestClient) -> None:
+    r = client.get(f"{settings.API_V1_STR}/hospitals/catchments/volume")
+
+    assert r.status_code == 200
+    content = r.json()
+    assert content["count"] == len(content["data"])
+    assert all(row["cells"] > 0 for row in content["data"])
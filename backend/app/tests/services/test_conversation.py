@@ -0,0 +1,33 @@
+import pytest
+from sqlmodel import Session, delete
+
+from app.api.routes.utils import register_message, register_messages
+from app.api.services import user_answer
+from app.api.services.conversation import ConversationState
+from app.models import Appointment
+
+
+def test_conversation_tracks_transcript_without_rereading(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    appointment = Appointment(patient_id="conversation")
+    db.add(appointment)
+    db.commit()
+    appointment_id = str(appointment.id)
+    register_message(db, appointment_id, "Me duele el pecho", "user")
+
+    conversation = ConversationState.load(db, appointment_id)
+    assert conversation.chat == ["Me duele el pecho"] and conversation.questions_asked == 0
+
+    register_messages(db, appointment_id, ["¿Desde cuándo?", "¿Tiene fiebre?"], "assistant", conversation)
+    register_message(db, appointment_id, "Desde ayer, sin fiebre", "user", conversation)
+    expected = ["Me duele el pecho", "¿Desde cuándo?", "¿Tiene fiebre?", "Desde ayer, sin fiebre"]
+    assert conversation.chat == expected and conversation.questions_asked == 2
+    # The in-memory state matches what a fresh load reads back
+    assert ConversationState.load(db, appointment_id) == conversation
+
+    received = []
+    monkeypatch.setattr(user_answer, "process_medical_case", lambda raw_input, location: received.append(raw_input))
+    user_answer.ask_more_questions("patient", conversation, "Madrid")
+    assert received[0].chat == expected and received[0].num_previous_questions == 2
+
+    db.exec(delete(Appointment).where(Appointment.id == appointment.id))
+    db.commit()
@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, delete, update
+
+from app.api.services.conversation_sessions import (
+    ConversationSessions,
+    push_to_conversation,
+)
+from app.core.config import settings
+from app.core.db import engine
+from app.core.pubsub import CONVERSATION_CHANNEL, PgListener
+from app.models import Appointment, ConversationSession
+
+
+class RecordingSocket:
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+        self.closed = False
+
+    async def send_json(self, message: dict) -> None:
+        self.sent.append(message)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+async def eventually(condition, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.02)
+
+
+def test_pushes_reach_the_worker_holding_the_socket(db: Session) -> None:
+    appointment = Appointment(patient_id="conversation-sessions")
+    db.add(appointment)
+    db.commit()
+    appointment_id = str(appointment.id)
+    worker_a, worker_b = ConversationSessions("worker-a"), ConversationSessions("worker-b")
+    socket_a, socket_b = RecordingSocket(), RecordingSocket()
+
+    def push(message: dict) -> None:
+        with Session(engine) as session:
+            push_to_conversation(session, appointment.id, message)
+            session.commit()
+
+    async def scenario() -> None:
+        connected = asyncio.Event()
+        pg = PgListener(retry_seconds=0.1)
+        pg.subscribe(CONVERSATION_CHANNEL, worker_a.dispatch)
+        pg.subscribe(CONVERSATION_CHANNEL, worker_b.dispatch)
+        pg.subscribe(CONVERSATION_CHANNEL, lambda payload: payload is None and connected.set())
+        task = asyncio.create_task(pg.run())
+        await asyncio.wait_for(connected.wait(), 5.0)
+
+        connection_b = await worker_b.open(appointment_id, socket_b)
+        push({"type": "status", "value": "assigned"})
+        await eventually(lambda: socket_b.sent)
+        assert socket_b.sent == [{"type": "status", "value": "assigned"}]
+
+        # The patient reconnects to another worker, which takes the conversation over
+        await worker_a.open(appointment_id, socket_a)
+        await eventually(lambda: socket_b.closed)
+        assert len(worker_b) == 0 and len(worker_a) == 1
+        # The late teardown of the old socket leaves the new registration alone
+        await worker_b.close(appointment_id, connection_b)
+        push({"type": "status", "value": "finished"})
+        await eventually(lambda: socket_a.sent)
+        assert socket_a.sent == [{"type": "status", "value": "finished"}]
+        assert socket_b.sent == [{"type": "status", "value": "assigned"}]
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+    row = db.get(ConversationSession, appointment.id)
+    assert row.worker == "worker-a"
+
+    # A worker that stopped refreshing its rows has them reaped after the TTL
+    expired = datetime.now() - timedelta(seconds=settings.CONVERSATION_SESSION_TTL_SECONDS + 1)
+    db.exec(update(ConversationSession).where(ConversationSession.appointment_id == appointment.id).values(last_seen_at=expired))
+    db.commit()
+    assert worker_b.heartbeat() >= 1
+    db.expire_all()
+    assert db.get(ConversationSession, appointment.id) is None
+
+    db.exec(delete(Appointment).where(Appointment.id == appointment.id))
+    db.commit()
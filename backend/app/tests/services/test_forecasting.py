@@ -0,0 +1,142 @@
+import asyncio
+import math
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlmodel import Session, delete
+
+from app.api.services.appointment_rollup import ensure_rollup
+from app.api.services.forecasting import (
+    ForecastCache,
+    build_forecast,
+    get_forecast,
+    reproduction_number,
+    rolling_growth,
+    serial_interval,
+)
+from app.core.config import settings
+from app.core.db import engine
+from app.core.pubsub import APPOINTMENT_STATS_CHANNEL, PgListener
+from app.models import Appointment
+
+
+def test_growth_doubling_time_and_forecast_of_an_exponential_outbreak() -> None:
+    # log(1 + cases) grows by log(1.1) a day
+    cases = np.expm1(np.log(5) + np.log(1.1) * np.arange(30))
+    forecast = build_forecast(cases, date(2024, 1, 1), 5)
+
+    growth = rolling_growth(cases, settings.FORECAST_WINDOW_DAYS)
+    assert np.isnan(growth[: settings.FORECAST_WINDOW_DAYS - 1]).all()
+    assert np.allclose(growth[settings.FORECAST_WINDOW_DAYS - 1:], 0.1)
+    assert math.isclose(forecast.growth_rate, 0.1)
+    assert math.isclose(forecast.doubling_time, math.log(2) / math.log(1.1))
+    assert forecast.rt > 1
+    assert [point.day for point in forecast.forecast] == [date(2024, 1, 31) + timedelta(days=d) for d in range(5)]
+    expected = np.expm1(np.log(5) + np.log(1.1) * np.arange(30, 35))
+    assert np.allclose([point.cases for point in forecast.forecast], expected)
+    # An exact fit leaves no uncertainty
+    assert all(math.isclose(p.lower, p.cases) and math.isclose(p.upper, p.cases) for p in forecast.forecast)
+
+
+def test_reproduction_number_and_intervals_of_a_noisy_plateau() -> None:
+    weights = serial_interval(settings.FORECAST_SERIAL_INTERVAL_MEAN_DAYS, settings.FORECAST_SERIAL_INTERVAL_SD_DAYS)
+    assert weights[0] == 0 and math.isclose(weights.sum(), 1)
+    cases = 50 + np.tile([4.0, -3.0, 1.0, -2.0], 15)
+    rt = reproduction_number(cases, weights, 7)
+    # Once the serial interval is covered by history every case replaces itself
+    assert np.allclose(rt[len(weights):], 1, atol=0.05)
+    assert np.isnan(rt[:6]).all()
+
+    forecast = build_forecast(cases, date(2024, 1, 1), 10)
+    assert forecast.doubling_time is None or forecast.doubling_time > 30
+    widths = [point.upper - point.lower for point in forecast.forecast]
+    assert all(point.lower <= point.cases <= point.upper for point in forecast.forecast)
+    assert widths == sorted(widths) and widths[0] > 0
+
+
+def test_forecasts_are_shared_until_statistics_change(client: TestClient, db: Session) -> None:
+    ensure_rollup()
+    hospital = str(uuid.uuid4())
+    today = date.today()
+    db.add_all(
+        Appointment(
+            patient_id="forecasting",
+            hospital_assigned=hospital,
+            contagious=True,
+            request_start_time=datetime.combine(today - timedelta(days=day), datetime.min.time()),
+        )
+        for day in range(10)
+        for _ in range(10 - day)
+    )
+    db.commit()
+    cache = ForecastCache()
+    computed: list[int] = []
+
+    def compute() -> object:
+        computed.append(1)
+        return get_forecast(db, today - timedelta(days=9), today, 3, hospital_assigned=hospital)
+
+    async def scenario() -> None:
+        ready = asyncio.Event()
+        pg = PgListener(retry_seconds=0.1)
+        pg.subscribe(APPOINTMENT_STATS_CHANNEL, cache.invalidate)
+        pg.subscribe(APPOINTMENT_STATS_CHANNEL, lambda payload: payload is None and ready.set())
+        task = asyncio.create_task(pg.run())
+        await asyncio.wait_for(ready.wait(), 5.0)
+
+        cache.get(("key",), compute)
+        cache.get(("key",), compute)
+        assert len(computed) == 1
+        # A new case anywhere reaches every process through the rollup trigger
+        with Session(engine) as session:
+            session.add(Appointment(patient_id="forecasting", hospital_assigned=hospital, contagious=True))
+            session.commit()
+        for _ in range(50):
+            await asyncio.sleep(0.1)
+            cache.get(("key",), compute)
+            if len(computed) == 2:
+                break
+        assert len(computed) == 2
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+    response = client.get(
+        f"{settings.API_V1_STR}/appointments/stats/forecast",
+        params={"start_date": str(today - timedelta(days=9)), "end_date": str(today), "hospital_assigned": hospital, "horizon": 3},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    # The case added above is counted today
+    assert [point["cases"] for point in body["series"]] == [*range(1, 10), 11]
+    assert len(body["forecast"]) == 3 and body["growth_rate"] > 0
+
+    db.exec(delete(Appointment).where(Appointment.patient_id == "forecasting"))
+    db.commit()
+
+
+def test_only_viewers_of_the_same_forecast_wait_for_it() -> None:
+    cache = ForecastCache()
+    release = threading.Event()
+    computed: list[str] = []
+
+    def compute(key: str) -> object:
+        computed.append(key)
+        if key == "slow":
+            assert release.wait(5.0)
+        return key
+
+    with ThreadPoolExecutor(4) as pool:
+        slow = [pool.submit(cache.get, ("slow",), lambda: compute("slow")) for _ in range(3)]
+        # Another forecast is served while the slow one is still computing
+        assert cache.get(("fast",), lambda: compute("fast")) == "fast"
+        assert not any(future.done() for future in slow)
+        release.set()
+        assert [future.result(5.0) for future in slow] == ["slow"] * 3
+    assert sorted(computed) == ["fast", "slow"]
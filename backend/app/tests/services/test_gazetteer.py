@@ -0,0 +1,60 @@
+from app.api.services import locator
+from app.api.services.gazetteer import BUNDLED_GAZETTEER, Gazetteer, geocode_offline
+from app.core.config import settings
+
+
+def test_lookup_prefers_most_specific_part() -> None:
+    gazetteer = Gazetteer.from_csv(BUNDLED_GAZETTEER)
+
+    place = gazetteer.lookup("Buenos Aires, Palermo Soho, Av. Santa Fe 1234")
+
+    assert place is not None
+    assert (place.name, place.kind) == ("Palermo", "district")
+
+
+def test_lookup_is_accent_insensitive_and_uses_alternate_names() -> None:
+    gazetteer = Gazetteer.from_csv(BUNDLED_GAZETTEER)
+
+    assert gazetteer.lookup("BOGOTA").name == "Bogotá"
+    assert gazetteer.lookup("CDMX, Calle 1 #123").name == "Ciudad de México"
+    assert gazetteer.lookup("Calle sin nombre 42") is None
+
+
+def test_complete_by_prefix() -> None:
+    gazetteer = Gazetteer.from_csv(BUNDLED_GAZETTEER)
+
+    names = {p.name for p in gazetteer.complete("san")}
+
+    assert {"San Telmo", "San Miguel de Tucumán", "San Carlos de Bariloche"} <= names
+
+
+def test_geocode_offline_rejects_country_only_when_precise() -> None:
+    assert geocode_offline("Calle 5, Argentina") is not None
+    assert geocode_offline("Calle 5, Argentina", allow_coarse=False) is None
+
+
+def test_lookup_skips_streets_named_after_places() -> None:
+    gazetteer = Gazetteer.from_csv(BUNDLED_GAZETTEER)
+
+    assert gazetteer.lookup("Córdoba 1234, Buenos Aires, Argentina").name == "Buenos Aires"
+    # The city comes before the province
+    assert gazetteer.lookup("Mendoza 2500, Rosario, Santa Fe").name == "Rosario"
+
+
+def test_street_addresses_go_to_nominatim_first(monkeypatch) -> None:
+    asked: list[str] = []
+
+    def geocode_remote(address: str) -> tuple[float, float]:
+        asked.append(address)
+        return (1.0, 2.0)
+
+    monkeypatch.setattr(settings, "GEOCODER_LOCAL_FIRST", True)
+    monkeypatch.setattr(locator, "geocode_remote", geocode_remote)
+
+    assert locator.get_coordinates("Rosario, Santa Fe") == (-32.9442, -60.6505)
+    assert asked == []
+    assert locator.get_coordinates("Mendoza 2500, Rosario, Santa Fe") == (1.0, 2.0)
+    assert asked == ["Mendoza 2500, Rosario, Santa Fe"]
+
+    monkeypatch.setattr(locator, "geocode_remote", lambda address: None)
+    assert locator.get_coordinates("Mendoza 2500, Rosario, Santa Fe") == (-32.9442, -60.6505)
@@ -0,0 +1,123 @@
+import uuid
+
+from geopy.distance import geodesic
+from sqlmodel import Session, delete
+
+from app.api.services.hospital_assignment import (
+    HospitalLoadTracker,
+    HospitalSpatialIndex,
+    rank_hospitals,
+)
+from app.core.db import engine
+from app.models import Appointment, AppointmentStatus, Hospital, StatusHospital
+
+
+def make_hospital(name: str, latitude: float, longitude: float, **kwargs) -> Hospital:
+    return Hospital(
+        id=uuid.uuid4(),
+        name=name,
+        address="Calle 1",
+        phone_number="123",
+        email="hospital@example.com",
+        contact_person="Dr. Test",
+        latitude=latitude,
+        longitude=longitude,
+        **kwargs,
+    )
+
+
+def test_spatial_index_nearest_matches_brute_force() -> None:
+    hospitals = [
+        make_hospital(f"H{i}", -34.0 + (i % 7) * 0.37, -58.0 + (i // 7) * 0.41)
+        for i in range(49)
+    ]
+    index = HospitalSpatialIndex(hospitals)
+    target = (-33.1, -56.9)
+
+    result = index.nearest(target[0], target[1], 5)
+
+    expected = sorted(hospitals, key=lambda h: geodesic(target, (h.latitude, h.longitude)).km)[:5]
+    assert [h.id for _, h in result] == [h.id for h in expected]
+    assert abs(result[0][0] - geodesic(target, (expected[0].latitude, expected[0].longitude)).km) < 1.0
+
+
+def test_rank_hospitals_filters_inactive_and_specialty() -> None:
+    near_inactive = make_hospital("Inactive", -34.60, -58.38, status=StatusHospital.INACTIVE)
+    near_wrong = make_hospital("Eye clinic", -34.61, -58.38, specialties=["Oftalmología"])
+    far_ok = make_hospital("Cardio", -34.70, -58.40, specialties=["Cardiología"])
+    index = HospitalSpatialIndex([near_inactive, near_wrong, far_ok])
+
+    ranked = rank_hospitals(index, (-34.60, -58.38), "Cardiología", "High", HospitalLoadTracker())
+
+    assert [h.name for _, h in ranked] == ["Cardio"]
+
+
+def test_rank_hospitals_falls_back_to_nearest_when_all_inactive() -> None:
+    # Hospitals registered without a uri are never probed and stay inactive
+    near = make_hospital("Near", -34.60, -58.38, status=StatusHospital.INACTIVE, uri="", specialties=["Pediatría"])
+    cardio = make_hospital("Cardio", -34.65, -58.38, status=StatusHospital.INACTIVE, specialties=["Cardiología"])
+    far = make_hospital("Far", -34.90, -58.38, status=StatusHospital.INACTIVE, specialties=["Pediatría"])
+    index = HospitalSpatialIndex([near, cardio, far])
+
+    ranked = rank_hospitals(index, (-34.60, -58.38), "Cardiología", "High", HospitalLoadTracker())
+    assert [h.name for _, h in ranked] == ["Cardio"]
+    ranked = rank_hospitals(index, (-34.60, -58.38), "Traumatología", "High", HospitalLoadTracker())
+    assert [h.name for _, h in ranked] == ["Near", "Cardio", "Far"]
+
+
+def test_rank_hospitals_prefers_shorter_queue_for_low_urgency() -> None:
+    busy = make_hospital("Busy", -34.60, -58.38)
+    idle = make_hospital("Idle", -34.63, -58.38)  # ~3.3 km further
+    index = HospitalSpatialIndex([busy, idle])
+    tracker = HospitalLoadTracker()
+    for _ in range(5):
+        tracker.increment(str(busy.id))
+
+    low = rank_hospitals(index, (-34.60, -58.38), None, "Low", tracker)
+    emergency = rank_hospitals(index, (-34.60, -58.38), None, "Emergency", tracker)
+
+    assert low[0][1].name == "Idle"
+    assert emergency[0][1].name == "Busy"
+
+
+def test_load_tracker_moves_appointments_between_queues() -> None:
+    tracker = HospitalLoadTracker()
+    tracker.on_appointment_change(None, AppointmentStatus.MISSING_DATA, "a", AppointmentStatus.PENDING)
+    tracker.on_appointment_change("a", AppointmentStatus.PENDING, "b", AppointmentStatus.PENDING)
+    assert (tracker.get("a"), tracker.get("b")) == (0, 1)
+
+    tracker.on_appointment_change("b", AppointmentStatus.PENDING, "b", AppointmentStatus.ASSIGNED)
+    assert tracker.get("b") == 0
+
+
+def test_load_tracker_seeds_again_after_changes_elsewhere(db: Session) -> None:
+    hospital_id = str(uuid.uuid4())
+    tracker = HospitalLoadTracker()
+    tracker.seed(db)
+    assert tracker.get(hospital_id) == 0
+
+    # Another process queues two appointments; its change notification reaches this one
+    with Session(engine) as session:
+        for _ in range(2):
+            session.add(
+                Appointment(patient_id="load-tracker", hospital_assigned=hospital_id, status=AppointmentStatus.PENDING)
+            )
+        session.commit()
+    tracker.seed(db)
+    assert tracker.get(hospital_id) == 0
+    tracker.invalidate()
+    tracker.seed(db)
+    assert tracker.get(hospital_id) == 2
+
+    db.exec(delete(Appointment).where(Appointment.patient_id == "load-tracker"))
+    db.commit()
+
+
+def test_rank_hospitals_penalizes_degraded_hospitals() -> None:
+    slow = make_hospital("Slow", -34.60, -58.38, degraded=True)
+    responsive = make_hospital("Responsive", -34.63, -58.38)
+    index = HospitalSpatialIndex([slow, responsive])
+
+    ranked = rank_hospitals(index, (-34.60, -58.38), None, "Moderate", HospitalLoadTracker())
+
+    assert [h.name for _, h in ranked] == ["Responsive", "Slow"]
@@ -0,0 +1,97 @@
+import uuid
+
+from sqlmodel import Session, delete, select
+
+from app.api.services.hospital_latency import (
+    ENDPOINT_APPOINTMENTS,
+    ENDPOINT_HEALTH,
+    LatencyTracker,
+    LatencyWindow,
+    merged_latencies,
+    persist_latencies,
+)
+from app.core.config import settings
+from app.models import Hospital, HospitalLatency
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_window_percentiles_and_expiry() -> None:
+    clock = FakeClock()
+    window = LatencyWindow(300.0, clock)
+    for _ in range(95):
+        window.observe(20.0)
+    for _ in range(5):
+        window.observe(4000.0)
+    window.observe(0.0, ok=False)
+
+    summary = window.summary()
+    assert summary["samples"] == 100 and summary["errors"] == 1
+    assert 10 <= summary["p50_ms"] <= 25
+    assert 10 <= summary["p95_ms"] <= 25
+
+    window.observe(4000.0)
+    assert window.summary()["p95_ms"] > 2500
+
+    # Everything above is older than the window once 300 s have passed
+    clock.now = 301.0
+    assert window.summary()["samples"] == 0
+
+
+def test_persist_latencies_marks_slow_hospitals_degraded(db: Session) -> None:
+    slow = Hospital(name="Slow", address="x", phone_number="1", email="slow@example.com", contact_person="x")
+    fast = Hospital(name="Fast", address="x", phone_number="1", email="fast@example.com", contact_person="x")
+    db.add(slow)
+    db.add(fast)
+    db.commit()
+
+    tracker = LatencyTracker(window_seconds=300.0)
+    for _ in range(settings.HOSPITAL_LATENCY_MIN_SAMPLES):
+        tracker.observe(slow.id, ENDPOINT_APPOINTMENTS, 3.0)
+        tracker.observe(fast.id, ENDPOINT_HEALTH, 0.02)
+    persist_latencies(tracker)
+
+    db.refresh(slow)
+    db.refresh(fast)
+    assert slow.degraded and not fast.degraded
+    rows = db.exec(select(HospitalLatency).where(HospitalLatency.hospital_id == slow.id)).all()
+    assert [(r.endpoint, r.samples) for r in rows] == [(ENDPOINT_APPOINTMENTS, settings.HOSPITAL_LATENCY_MIN_SAMPLES)]
+
+    # Samples of a hospital deleted meanwhile are skipped
+    tracker.observe(uuid.uuid4(), ENDPOINT_HEALTH, 0.02)
+    persist_latencies(tracker)
+
+    db.exec(delete(Hospital).where(Hospital.id.in_([slow.id, fast.id])))
+    db.commit()
+
+
+def test_latencies_of_every_process_are_merged(db: Session) -> None:
+    hospital = Hospital(name="Shared", address="x", phone_number="1", email="shared@example.com", contact_person="x")
+    db.add(hospital)
+    db.commit()
+
+    # Neither process alone has enough samples to mark the hospital degraded
+    per_process = settings.HOSPITAL_LATENCY_MIN_SAMPLES // 2 + 1
+    for process, seconds in (("web-1:10", 3.0), ("web-2:20", 4.0)):
+        tracker = LatencyTracker(window_seconds=300.0)
+        for _ in range(per_process):
+            tracker.observe(hospital.id, ENDPOINT_APPOINTMENTS, seconds)
+        tracker.observe(hospital.id, ENDPOINT_APPOINTMENTS, 0.0, ok=False)
+        persist_latencies(tracker, process=process)
+
+    rows = db.exec(select(HospitalLatency).where(HospitalLatency.hospital_id == hospital.id)).all()
+    assert sorted(r.process for r in rows) == ["web-1:10", "web-2:20"]
+    summary = merged_latencies(db, hospital.id)[(hospital.id, ENDPOINT_APPOINTMENTS)]
+    assert (summary.samples, summary.errors) == (2 * per_process, 2)
+    assert 2500 <= summary.p95_ms <= 5000
+    db.refresh(hospital)
+    assert hospital.degraded
+
+    db.exec(delete(Hospital).where(Hospital.id == hospital.id))
+    db.commit()
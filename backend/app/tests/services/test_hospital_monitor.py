@@ -0,0 +1,62 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from sqlmodel import Session, delete, select
+
+from app.api.services.hospital_monitor import probe_hospitals, write_hospital_statuses
+from app.core.config import settings
+from app.models import Hospital, StatusHospital
+
+
+def _hospital(name: str, **fields) -> Hospital:
+    return Hospital(
+        id=uuid.uuid4(),
+        name=name,
+        address="x",
+        phone_number="1",
+        email="down@example.com",
+        contact_person="x",
+        **fields,
+    )
+
+
+def test_probe_hospitals_runs_concurrently(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "HOSPITAL_PROBE_TIMEOUT_SECONDS", 0.5)
+    # Unroutable addresses: every probe hangs until the timeout
+    hospitals = [_hospital(f"Down {i}", uri=f"10.255.255.{i + 1}") for i in range(40)]
+
+    started = time.monotonic()
+    results = asyncio.run(probe_hospitals(hospitals))
+    elapsed = time.monotonic() - started
+
+    assert results == [False] * 40
+    assert elapsed < 2.0
+
+
+def test_write_hospital_statuses_updates_only_the_changed_rows(db: Session) -> None:
+    initial = [StatusHospital.ACTIVE, StatusHospital.ACTIVE, StatusHospital.INACTIVE, StatusHospital.INACTIVE]
+    hospitals = [_hospital(f"Bulk status {i}", status=status) for i, status in enumerate(initial)]
+    db.add_all(hospitals)
+    db.commit()
+    ids = [hospital.id for hospital in hospitals]
+
+    # One UPDATE for hospitals going down, coming back and staying unchanged
+    write_hospital_statuses([
+        (ids[0], StatusHospital.INACTIVE),
+        (ids[2], StatusHospital.ACTIVE),
+        (ids[3], StatusHospital.INACTIVE),
+    ])
+
+    db.expire_all()
+    statuses = dict(db.exec(select(Hospital.id, Hospital.status).where(Hospital.id.in_(ids))).all())
+    assert [statuses[hospital_id] for hospital_id in ids] == [
+        StatusHospital.INACTIVE,
+        StatusHospital.ACTIVE,
+        StatusHospital.ACTIVE,
+        StatusHospital.INACTIVE,
+    ]
+
+    db.exec(delete(Hospital).where(Hospital.id.in_(ids)))
+    db.commit()
@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+
+from app.api.services.hospital_registry import registry
+from app.core.config import settings
+
+
+def hospital_payload(name: str) -> dict:
+    return {
+        "name": name,
+        "address": "Av. Siempre Viva 742",
+        "phone_number": "123",
+        "email": "registry@example.com",
+        "contact_person": "Dr. Registry",
+        "latitude": -34.6,
+        "longitude": -58.4,
+    }
+
+
+def test_snapshot_version_only_moves_on_change() -> None:
+    first = registry.refresh(force=True)
+    again = registry.refresh(force=True)
+    assert again.version == first.version and again.etag == first.etag
+
+
+def test_hospital_reads_use_etags_and_see_writes(client: TestClient) -> None:
+    url = f"{settings.API_V1_STR}/hospitals/"
+    r = client.get(url)
+    etag = r.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    created = client.post(url, json=hospital_payload("Hospital Registro")).json()
+    r = client.get(url, params={"limit": 1000})
+    assert r.headers["ETag"] != etag
+    assert created["id"] in {h["id"] for h in r.json()["data"]}
+
+    one = client.get(f"{url}{created['id']}")
+    assert one.status_code == 200
+    assert client.get(f"{url}{created['id']}", headers={"If-None-Match": one.headers["ETag"]}).status_code == 304
+
+    client.put(f"{url}{created['id']}", json={"phone_number": "456"})
+    r = client.get(f"{url}{created['id']}", headers={"If-None-Match": one.headers["ETag"]})
+    assert r.status_code == 200 and r.json()["phone_number"] == "456"
+
+    client.delete(f"{url}{created['id']}")
+    assert client.get(f"{url}{created['id']}").status_code == 404
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+from sqlmodel import Session, delete, select
+
+from app.api.services.hospital_registry import registry
+from app.api.services.mqtt_publisher import MqttPublisher, appointments_topic
+from app.api.services.notification_outbox import (
+    build_appointment_payload,
+    enqueue_assignment_notifications,
+)
+from app.core.config import settings
+from app.models import (
+    Appointment,
+    Hospital,
+    NotificationChannel,
+    NotificationOutbox,
+    OutboxStatus,
+)
+
+
+class RecordingClient:
+    """Stands in for the broker connection and records QoS 1 publishes"""
+
+    def __init__(self) -> None:
+        self.published: list[tuple[str, dict, int]] = []
+
+    async def publish(self, topic: str, payload: str, qos: int) -> None:
+        self.published.append((topic, json.loads(payload), qos))
+
+
+def test_assignment_is_published_and_http_skipped_for_mqtt_hospitals(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "MQTT_ENABLED", True)
+    hospitals = [
+        Hospital(name=f"MQTT {channel.value}", address="x", phone_number="1", email="mqtt@example.com",
+                 contact_person="x", uri="127.0.0.9", notification_channel=channel)
+        for channel in (NotificationChannel.HTTP, NotificationChannel.MQTT)
+    ]
+    appointments = [Appointment(patient_id="mqtt") for _ in hospitals]
+    db.add_all(hospitals + appointments)
+    db.commit()
+    registry.invalidate()
+    for hospital, appointment in zip(hospitals, appointments, strict=True):
+        enqueue_assignment_notifications(
+            db,
+            appointment_id=appointment.id,
+            hospital=registry.snapshot().get(hospital.id),
+            payload=build_appointment_payload(appointment.id, "123", "High", "Cardiología", "Dolor"),
+        )
+    db.commit()
+
+    rows = db.exec(
+        select(NotificationOutbox.hospital_id, NotificationOutbox.channel)
+        .where(NotificationOutbox.appointment_id.in_([a.id for a in appointments]))
+    ).all()
+    http_hospital, mqtt_hospital = hospitals
+    assert sorted(c.value for h, c in rows if h == http_hospital.id) == ["http", "mqtt"]
+    assert [c.value for h, c in rows if h == mqtt_hospital.id] == ["mqtt"]
+
+    client = RecordingClient()
+    asyncio.run(MqttPublisher().publish_due(client))
+
+    topics = {topic: (payload, qos) for topic, payload, qos in client.published}
+    payload, qos = topics[appointments_topic(mqtt_hospital.id)]
+    assert qos == 1
+    assert payload["event"] == "assigned"
+    assert payload["central_appointment_id"] == str(appointments[1].id)
+    statuses = db.exec(
+        select(NotificationOutbox.status)
+        .where(NotificationOutbox.channel == NotificationChannel.MQTT)
+        .where(NotificationOutbox.appointment_id.in_([a.id for a in appointments]))
+    ).all()
+    assert statuses == [OutboxStatus.DELIVERED, OutboxStatus.DELIVERED]
+
+    db.exec(delete(Appointment).where(Appointment.id.in_([a.id for a in appointments])))
+    db.exec(delete(Hospital).where(Hospital.id.in_([h.id for h in hospitals])))
+    db.commit()
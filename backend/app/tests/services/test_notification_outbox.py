@@ -0,0 +1,240 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import aiohttp
+import pytest
+from sqlmodel import Session, delete, func, select, update
+
+from app.api.services.hospital_registry import registry
+from app.api.services.notification_outbox import (
+    BulkSupport,
+    OutboxWorker,
+    build_appointment_payload,
+    claim_due,
+    enqueue_hospital_notification,
+    send_batch,
+)
+from app.core.config import settings
+from app.models import Appointment, Hospital, NotificationOutbox, OutboxStatus
+from app.tests.utils.hospital_server import StandInHospitals
+
+
+def make_hospital(name: str, uri: str) -> Hospital:
+    return Hospital(
+        name=name, address="x", phone_number="1", email="outbox@example.com", contact_person="x", uri=uri
+    )
+
+
+def test_outbox_delivers_retries_and_dead_letters(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "NOTIFICATION_POLL_SECONDS", 0.1)
+    monkeypatch.setattr(settings, "NOTIFICATION_RETRY_BASE_SECONDS", 60.0)
+    hospitals = {
+        "ok": make_hospital("Outbox OK", "127.0.0.1"),
+        "down": make_hospital("Outbox Down", "127.0.0.2"),
+        "rejects": make_hospital("Outbox Rejects", "127.0.0.3"),
+    }
+    appointments = {key: Appointment(patient_id="outbox") for key in hospitals}
+    for key in hospitals:
+        db.add(hospitals[key])
+        db.add(appointments[key])
+    db.commit()
+    for key, hospital in hospitals.items():
+        appointment = appointments[key]
+        enqueue_hospital_notification(
+            db,
+            appointment_id=appointment.id,
+            hospital_id=hospital.id,
+            payload=build_appointment_payload(appointment.id, "123", "High", "Cardiología", "Dolor"),
+        )
+    db.commit()
+    registry.invalidate()
+
+    server = StandInHospitals()
+    server.status_by_host = {"127.0.0.2": 503, "127.0.0.3": 422}
+
+    async def scenario() -> None:
+        port = await server.start()
+        monkeypatch.setattr(settings, "HOSPITAL_API_PORT", port)
+        worker = OutboxWorker()
+        task = asyncio.create_task(worker.run())
+        await asyncio.sleep(1.0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await server.stop()
+
+    asyncio.run(scenario())
+
+    rows = {
+        row.hospital_id: row
+        for row in db.exec(
+            select(NotificationOutbox).where(NotificationOutbox.hospital_id.in_([h.id for h in hospitals.values()]))
+        ).all()
+    }
+    for row in rows.values():
+        db.refresh(row)
+    ok, down, rejects = (rows[hospitals[key].id] for key in ("ok", "down", "rejects"))
+    assert ok.status == OutboxStatus.DELIVERED and ok.attempts == 1
+    assert down.status == OutboxStatus.PENDING and down.attempts == 1 and down.last_error == "HTTP 503"
+    assert rejects.status == OutboxStatus.DEAD
+    delivered = [payload for host, payload in server.received if host == "127.0.0.1"]
+    assert delivered[0]["central_appointment_id"] == str(appointments["ok"].id)
+
+    db.exec(delete(Appointment).where(Appointment.id.in_([a.id for a in appointments.values()])))
+    db.exec(delete(Hospital).where(Hospital.id.in_([h.id for h in hospitals.values()])))
+    db.commit()
+
+
+def test_outbox_batches_per_hospital_with_single_fallback(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "NOTIFICATION_POLL_SECONDS", 0.1)
+    monkeypatch.setattr(settings, "NOTIFICATION_BATCH_MAX_SIZE", 50)
+    bulk = make_hospital("Outbox Bulk", "127.0.0.4")
+    single = make_hospital("Outbox Single", "127.0.0.5")
+    db.add(bulk)
+    db.add(single)
+    db.commit()
+    appointments = []
+    for hospital, count in ((bulk, 400), (single, 60)):
+        for _ in range(count):
+            appointment = Appointment(patient_id="outbox")
+            db.add(appointment)
+            appointments.append(appointment)
+            db.flush()
+            enqueue_hospital_notification(
+                db,
+                appointment_id=appointment.id,
+                hospital_id=hospital.id,
+                payload=build_appointment_payload(appointment.id, "123", "Low", "Pediatría", "Fiebre"),
+            )
+    db.commit()
+    registry.invalidate()
+
+    server = StandInHospitals()
+    server.bulk_hosts = {"127.0.0.4"}
+
+    async def scenario() -> float:
+        port = await server.start()
+        monkeypatch.setattr(settings, "HOSPITAL_API_PORT", port)
+        task = asyncio.create_task(OutboxWorker().run())
+        started = asyncio.get_running_loop().time()
+        while len(server.received) < 460 and asyncio.get_running_loop().time() - started < 10:
+            await asyncio.sleep(0.05)
+        elapsed = asyncio.get_running_loop().time() - started
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await server.stop()
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+
+    assert len(server.received) == 460
+    assert elapsed < 5.0
+    # 400 notifications in batches of 50, against 60 single posts after the bulk
+    # 404 (a second batch may already be in flight when the first 404 arrives)
+    assert server.requests["127.0.0.4"] == 8
+    assert 61 <= server.requests["127.0.0.5"] <= 62
+    ids = {a.id for a in appointments}
+    statuses = db.exec(select(NotificationOutbox.status).where(NotificationOutbox.appointment_id.in_(ids))).all()
+    assert set(statuses) == {OutboxStatus.DELIVERED}
+
+    db.exec(delete(Appointment).where(Appointment.id.in_(ids)))
+    db.exec(delete(Hospital).where(Hospital.id.in_([bulk.id, single.id])))
+    db.commit()
+
+
+def test_lease_is_sized_to_the_batch(db: Session) -> None:
+    hospitals = [make_hospital("Outbox Lease Large", "127.0.0.6"), make_hospital("Outbox Lease Small", "127.0.0.7")]
+    db.add_all(hospitals)
+    db.commit()
+    appointments = []
+    for hospital, count in zip(hospitals, (3, 1), strict=True):
+        for _ in range(count):
+            appointment = Appointment(patient_id="outbox")
+            db.add(appointment)
+            appointments.append(appointment)
+            db.flush()
+            enqueue_hospital_notification(
+                db,
+                appointment_id=appointment.id,
+                hospital_id=hospital.id,
+                payload=build_appointment_payload(appointment.id, "123", "Low", "Pediatría", "Fiebre"),
+            )
+    db.commit()
+    registry.invalidate()
+
+    started = datetime.now()
+    batches = {batch.hospital_id: batch for batch in claim_due(10, {})}
+    assert [len(batches[hospital.id].deliveries) for hospital in hospitals] == [3, 1]
+    ids = {a.id for a in appointments}
+    leases = dict(
+        db.exec(
+            select(NotificationOutbox.hospital_id, func.max(NotificationOutbox.next_attempt_at))
+            .where(NotificationOutbox.appointment_id.in_(ids))
+            .group_by(NotificationOutbox.hospital_id)
+        ).all()
+    )
+    # One bulk request plus one request per notification
+    for hospital, size in zip(hospitals, (3, 1), strict=True):
+        lease = leases[hospital.id] - started
+        assert lease >= timedelta(seconds=settings.NOTIFICATION_TIMEOUT_SECONDS * (size + 1))
+        assert lease < timedelta(seconds=settings.NOTIFICATION_TIMEOUT_SECONDS * (size + 1) + 5)
+
+    db.exec(delete(Appointment).where(Appointment.id.in_(ids)))
+    db.exec(delete(Hospital).where(Hospital.id.in_([hospital.id for hospital in hospitals])))
+    db.commit()
+
+
+def test_single_fallback_renews_the_lease(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "NOTIFICATION_TIMEOUT_SECONDS", 1.0)
+    hospital = make_hospital("Outbox Slow Single", "127.0.0.8")
+    db.add(hospital)
+    db.commit()
+    appointments = []
+    for _ in range(3):
+        appointment = Appointment(patient_id="outbox")
+        db.add(appointment)
+        appointments.append(appointment)
+        db.flush()
+        enqueue_hospital_notification(
+            db,
+            appointment_id=appointment.id,
+            hospital_id=hospital.id,
+            payload=build_appointment_payload(appointment.id, "123", "Low", "Pediatría", "Fiebre"),
+        )
+    db.commit()
+    registry.invalidate()
+    ids = {a.id for a in appointments}
+
+    server = StandInHospitals()
+    server.delay_by_host = {"127.0.0.8": 0.3}
+
+    async def scenario() -> tuple[list, list]:
+        port = await server.start()
+        monkeypatch.setattr(settings, "HOSPITAL_API_PORT", port)
+        (batch,) = await asyncio.to_thread(claim_due, 10, {})
+        # The lease is about to run out while the single posts, one at a time, take 0.9 s
+        with Session(db.get_bind()) as session:
+            session.exec(
+                update(NotificationOutbox)
+                .where(NotificationOutbox.appointment_id.in_(ids))
+                .values(next_attempt_at=datetime.now() + timedelta(seconds=0.1))
+            )
+            session.commit()
+        connector = aiohttp.TCPConnector(limit_per_host=1)
+        async with aiohttp.ClientSession(connector=connector) as http:
+            sending = asyncio.create_task(send_batch(http, batch, BulkSupport()))
+            await asyncio.sleep(0.5)
+            reclaimed = await asyncio.to_thread(claim_due, 10, {})
+            results = await sending
+        await server.stop()
+        return results, reclaimed
+
+    results, reclaimed = asyncio.run(scenario())
+
+    # No other claim picks the notifications up while they are being sent
+    assert reclaimed == []
+    assert [status_code for _, status_code, _ in results] == [201, 201, 201]
+    assert len(server.received) == 3
+
+    db.exec(delete(Appointment).where(Appointment.id.in_(ids)))
+    db.exec(delete(Hospital).where(Hospital.id == hospital.id))
+    db.commit()
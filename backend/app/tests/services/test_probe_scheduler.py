@@ -0,0 +1,133 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+from app.api.services import hospital_monitor
+from app.api.services.probe_scheduler import ProbeScheduler
+from app.models import StatusHospital
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_scheduler(clock: FakeClock) -> ProbeScheduler:
+    return ProbeScheduler(
+        base_interval=10.0,
+        fast_interval=2.0,
+        max_backoff=600.0,
+        jitter=0.0,
+        clock=clock,
+    )
+
+
+def target(status: StatusHospital = StatusHospital.ACTIVE) -> SimpleNamespace:
+    return SimpleNamespace(id=uuid.uuid4(), uri="hospital.local", status=status)
+
+
+def test_down_hospital_backs_off_exponentially_up_to_ceiling() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync([target()])
+
+    intervals = []
+    for _ in range(15):
+        (state,) = scheduler.pop_due()
+        scheduler.record(state, is_active=False)
+        intervals.append(state.interval)
+        clock.now = state.next_due
+
+    # Fast confirmation after the change, then 10, 20, 40 ... capped at 600
+    assert intervals[:3] == [2.0, 2.0, 2.0]
+    assert intervals[3:8] == [10.0, 20.0, 40.0, 80.0, 160.0]
+    assert intervals[-1] == 600.0
+
+
+def test_recovery_is_probed_fast_then_at_base_interval() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync([target(StatusHospital.INACTIVE)])
+
+    (state,) = scheduler.pop_due()
+    assert scheduler.record(state, is_active=True) is True
+    assert state.interval == 2.0
+    for _ in range(3):
+        clock.now = state.next_due
+        (state,) = scheduler.pop_due()
+        assert scheduler.record(state, is_active=True) is False
+    assert state.interval == 10.0
+
+
+def test_only_due_hospitals_are_returned_and_deleted_ones_dropped() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    healthy, down = target(), target()
+    scheduler.sync([healthy, down])
+    for state in scheduler.pop_due():
+        scheduler.record(state, is_active=state.hospital_id == healthy.id)
+
+    # The hospital that just went down is re-probed after 2 s, the healthy one after 10 s
+    clock.now = 5.0
+    assert [s.hospital_id for s in scheduler.pop_due()] == [down.id]
+
+    scheduler.sync([healthy])
+    clock.now = 1000.0
+    assert [s.hospital_id for s in scheduler.pop_due()] == [healthy.id]
+    assert len(scheduler) == 1
+
+
+def test_status_changed_elsewhere_is_probed_right_away() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    hospital = target()
+    scheduler.sync([hospital])
+    (state,) = scheduler.pop_due()
+    scheduler.record(state, is_active=True)
+
+    # Nothing new in the registry: the next probe stays at its interval
+    clock.now = 1.0
+    scheduler.sync([hospital])
+    assert scheduler.pop_due() == []
+
+    # Someone marked the hospital inactive; the probe confirms it now
+    hospital.status = StatusHospital.INACTIVE
+    scheduler.sync([hospital])
+    assert state.status == StatusHospital.INACTIVE
+    assert scheduler.pop_due() == [state]
+    assert scheduler.record(state, is_active=True) is True
+
+
+def test_status_change_is_requeued_when_it_cannot_be_stored(monkeypatch) -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.sync([target(StatusHospital.ACTIVE)])
+    probed: list = []
+    written: list[list] = []
+
+    async def probe_hospitals(hospitals: list) -> list[bool]:
+        probed.extend(hospitals)
+        return [False] * len(hospitals)
+
+    def write_hospital_statuses(changes: list) -> None:
+        if not written:
+            written.append([])
+            raise RuntimeError("database unavailable")
+        written.append(changes)
+
+    monkeypatch.setattr(hospital_monitor, "probe_hospitals", probe_hospitals)
+    monkeypatch.setattr(hospital_monitor, "write_hospital_statuses", write_hospital_statuses)
+
+    asyncio.run(hospital_monitor.update_hospital_statuses(scheduler))
+    # The change was not stored, so the hospital keeps its status and is probed again soon
+    (state,) = probed
+    assert state.status == StatusHospital.ACTIVE
+    assert state.next_due == 2.0
+
+    clock.now = 2.0
+    asyncio.run(hospital_monitor.update_hospital_statuses(scheduler))
+    assert written[-1] == [(state.hospital_id, StatusHospital.INACTIVE)]
+    assert state.status == StatusHospital.INACTIVE
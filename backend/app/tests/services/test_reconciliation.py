@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime
+
+import aiohttp
+import pytest
+from sqlmodel import Session, delete, select
+
+from app.api.services import reconciliation
+from app.api.services.hospital_registry import registry
+from app.api.services.reconciliation import reconcile_once
+from app.core.config import settings
+from app.models import Appointment, AppointmentStatus, Hospital, HospitalSyncCursor
+from app.tests.utils.hospital_server import StandInHospitals
+
+
+def make_hospital(name: str, uri: str) -> Hospital:
+    return Hospital(
+        name=name, address="x", phone_number="1", email="reconcile@example.com", contact_person="x", uri=uri
+    )
+
+
+def test_reconciliation_applies_changes_and_advances_cursor(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "RECONCILE_PAGE_SIZE", 2)
+    announced: list[tuple] = []
+    monkeypatch.setattr(
+        reconciliation,
+        "publish_status_change",
+        lambda db, appointment: announced.append((appointment.id, appointment.status)),
+    )
+    hospital = make_hospital("Reconcile Feed", "127.0.0.1")
+    other = make_hospital("Reconcile Other", "127.0.0.2")
+    db.add(hospital)
+    db.add(other)
+    db.commit()
+    ours = [
+        Appointment(patient_id="reconcile", hospital_assigned=str(hospital.id), status=AppointmentStatus.PENDING)
+        for _ in range(3)
+    ]
+    foreign = Appointment(patient_id="reconcile", hospital_assigned=str(other.id), status=AppointmentStatus.PENDING)
+    db.add_all([*ours, foreign])
+    db.commit()
+    registry.invalidate()
+
+    times = [datetime(2026, 3, day, 9, 30) for day in (1, 2, 3)]
+    server = StandInHospitals()
+    server.changes_by_host = {
+        "127.0.0.1": [
+            {"central_appointment_id": str(ours[0].id), "scheduled_time": times[0].isoformat()},
+            {"central_appointment_id": str(ours[1].id), "scheduled_time": times[1].isoformat()},
+            # An appointment of another hospital must not be touched
+            {"central_appointment_id": str(foreign.id), "scheduled_time": times[2].isoformat()},
+            {"central_appointment_id": str(ours[2].id), "status": "finished"},
+            {"central_appointment_id": "not-a-uuid", "scheduled_time": times[2].isoformat()},
+        ]
+    }
+
+    async def scenario() -> None:
+        port = await server.start()
+        monkeypatch.setattr(settings, "HOSPITAL_API_PORT", port)
+        async with aiohttp.ClientSession() as http:
+            await reconcile_once(http)
+            # A second pass only asks for changes after the stored cursor
+            server.changes_by_host["127.0.0.1"].append(
+                {"central_appointment_id": str(ours[0].id), "scheduled_time": times[2].isoformat()}
+            )
+            await reconcile_once(http)
+        await server.stop()
+
+    asyncio.run(scenario())
+
+    for appointment in [*ours, foreign]:
+        db.refresh(appointment)
+    assert ours[0].status == AppointmentStatus.ASSIGNED and ours[0].scheduled_time == times[2]
+    assert ours[0].assigned_time is not None
+    assert ours[1].status == AppointmentStatus.ASSIGNED and ours[1].scheduled_time == times[1]
+    assert ours[2].status == AppointmentStatus.FINISHED and ours[2].scheduled_time is None
+    assert foreign.status == AppointmentStatus.PENDING and foreign.scheduled_time is None
+    cursors = {row.hospital_id: row for row in db.exec(select(HospitalSyncCursor)).all()}
+    assert cursors[hospital.id].cursor == "6" and cursors[hospital.id].last_error is None
+    # The other hospital has no changes endpoint and is left alone
+    assert other.id not in cursors
+    # Status changes are announced once, a new time for an assigned appointment is not
+    assert len(announced) == 3
+    assert dict(announced) == {
+        ours[0].id: AppointmentStatus.ASSIGNED,
+        ours[1].id: AppointmentStatus.ASSIGNED,
+        ours[2].id: AppointmentStatus.FINISHED,
+    }
+
+    db.exec(delete(HospitalSyncCursor).where(HospitalSyncCursor.hospital_id.in_([hospital.id, other.id])))
+    db.exec(delete(Appointment).where(Appointment.patient_id == "reconcile"))
+    db.exec(delete(Hospital).where(Hospital.id.in_([hospital.id, other.id])))
+    db.commit()
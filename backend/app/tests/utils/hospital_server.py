@@ -0,0 +1,75 @@
+import asyncio
+from collections import Counter as CountMap
+
+from aiohttp import web
+
+
+class StandInHospitals:
+    """
+    Local stand-in for hospital systems. Every hospital uri on the loopback
+    network (127.0.0.x) reaches the same server, which answers according to
+    the host the request was sent to and records what it received. Only the
+    hosts in bulk_hosts expose the bulk endpoint.
+    """
+
+    def __init__(self) -> None:
+        self.status_by_host: dict[str, int] = {}
+        self.bulk_hosts: set[str] = set()
+        # Seconds each single post takes to answer, per host
+        self.delay_by_host: dict[str, float] = {}
+        self.received: list[tuple[str, dict]] = []
+        self.requests: CountMap = CountMap()
+        # Appointment changes served by the changes endpoint, per host
+        self.changes_by_host: dict[str, list[dict]] = {}
+        self.port: int | None = None
+        self._runner: web.AppRunner | None = None
+
+    async def _appointments(self, request: web.Request) -> web.Response:
+        host = request.host.split(":")[0]
+        self.requests[host] += 1
+        body = await request.json()
+        await asyncio.sleep(self.delay_by_host.get(host, 0.0))
+        self.received.append((host, body))
+        return web.json_response({}, status=self.status_by_host.get(host, 201))
+
+    async def _bulk(self, request: web.Request) -> web.Response:
+        host = request.host.split(":")[0]
+        self.requests[host] += 1
+        if host not in self.bulk_hosts:
+            return web.json_response({"detail": "Not Found"}, status=404)
+        status = self.status_by_host.get(host, 201)
+        if status < 300:
+            body = await request.json()
+            self.received.extend((host, payload) for payload in body["appointments"])
+        return web.json_response({}, status=status)
+
+    async def _changes(self, request: web.Request) -> web.Response:
+        """Changes after the since-cursor (an index into the host's change log), one page at a time"""
+        host = request.host.split(":")[0]
+        self.requests[host] += 1
+        if host not in self.changes_by_host:
+            return web.json_response({"detail": "Not Found"}, status=404)
+        log = self.changes_by_host[host]
+        start = int(request.query.get("since", 0))
+        end = min(len(log), start + int(request.query.get("limit", 100)))
+        return web.json_response({"data": log[start:end], "cursor": str(end), "has_more": end < len(log)})
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.json_response(True)
+
+    async def start(self) -> int:
+        app = web.Application()
+        app.router.add_post("/api/v1/specialty-appointments/", self._appointments)
+        app.router.add_post("/api/v1/specialty-appointments/bulk", self._bulk)
+        app.router.add_get("/api/v1/specialty-appointments/changes", self._changes)
+        app.router.add_get("/health", self._health)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "0.0.0.0", 0)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self.port
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
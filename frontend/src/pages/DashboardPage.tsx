@@ -25,7 +25,7 @@ import { AppointmentStatus, Hospital as HospitalType, Appointment } from '../typ
 // Services
 import { getHospitals } from '../services/hospitalService';
 import { getPatients } from '../services/patientService';
-import { getAppointments } from '../services/appointmentService';
+import { getAppointment, getAppointments, subscribeToAppointmentEvents } from '../services/appointmentService';
 
 // Register ChartJS components
 ChartJS.register(ArcElement, Tooltip, Legend, CategoryScale, LinearScale, BarElement, Title);
@@ -87,6 +87,35 @@ const DashboardPage: React.FC = () => {
     fetchData();
   }, []);
 
+  // Follow the selected hospital's appointments as they change instead of reloading them
+  useEffect(() => {
+    if (selectedHospital === 'all') {
+      return;
+    }
+    return subscribeToAppointmentEvents(selectedHospital, async (event) => {
+      if (event.event === 'resync') {
+        fetchData();
+        return;
+      }
+      if (event.event === 'assigned' && event.appointment_id) {
+        const appointment = await getAppointment(event.appointment_id);
+        setAppointments(current => [appointment, ...current.filter(app => app.id !== appointment.id)]);
+        return;
+      }
+      if (event.event === 'unassigned') {
+        setAppointments(current => current.map(app =>
+          app.id === event.appointment_id ? { ...app, hospital_assigned: undefined } : app
+        ));
+        return;
+      }
+      setAppointments(current => current.map(app =>
+        app.id === event.appointment_id
+          ? { ...app, status: event.status ?? app.status, scheduled_time: event.scheduled_time ?? app.scheduled_time }
+          : app
+      ));
+    });
+  }, [selectedHospital]);
+
   // Update charts when selectedHospital changes
   useEffect(() => {
     if (appointments.length > 0) {
@@ -106,7 +135,7 @@ const DashboardPage: React.FC = () => {
       const patientsResponse = await getPatients(0, 100);
       
       // Fetch appointments
-      const appointmentsResponse = await getAppointments(0, 500);
+      const appointmentsResponse = await getAppointments(null, 500);
       setAppointments(appointmentsResponse.data);
       
       // Set stats
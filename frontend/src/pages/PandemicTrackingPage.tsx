@@ -38,10 +38,9 @@ import {
   ChartOptions,
 } from 'chart.js';
 import { format, subDays, differenceInDays, addDays, parseISO } from 'date-fns';
-import { getContagiousAppointments } from '../services/appointmentService';
+import { getAppointmentCounts, getCaseForecast } from '../services/appointmentService';
 import { getHospitals } from '../services/hospitalService';
-import { Appointment, Hospital } from '../types';
-import { calculateGrowthRate, generatePredictions, groupAppointmentsByDate } from '../utils/pandemicUtils';
+import { AppointmentCountBucket, CaseForecast, Hospital } from '../types';
 
 // Register ChartJS components
 ChartJS.register(
@@ -65,8 +64,8 @@ const PandemicTrackingPage: React.FC = () => {
   
   // State for data
   const [hospitals, setHospitals] = useState<Hospital[]>([]);
-  const [appointments, setAppointments] = useState<Appointment[]>([]);
-  const [filteredAppointments, setFilteredAppointments] = useState<Appointment[]>([]);
+  const [counts, setCounts] = useState<AppointmentCountBucket[]>([]);
+  const [forecast, setForecast] = useState<CaseForecast | null>(null);
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string | null>(null);
   const [predictionDays, setPredictionDays] = useState<number>(7);
@@ -87,56 +86,78 @@ const PandemicTrackingPage: React.FC = () => {
     fetchHospitals();
   }, []);
   
-  // Fetch appointments based on filters
+  // Fetch daily contagious case counts per hospital; the hospital filter is
+  // applied here so changing it does not hit the server again
   useEffect(() => {
-    const fetchAppointments = async () => {
+    const fetchCounts = async () => {
       if (!startDate || !endDate) return;
       
       setLoading(true);
       setError(null);
       
       try {
-        const formattedStartDate = format(startDate, 'yyyy-MM-dd');
-        const formattedEndDate = format(endDate, 'yyyy-MM-dd');
-        
-        const params: {
-          hospitalId?: string;
-          startDate: string;
-          endDate: string;
-        } = {
-          startDate: formattedStartDate,
-          endDate: formattedEndDate,
-        };
-        
-        if (selectedHospital) {
-          params.hospitalId = selectedHospital;
-        }
-        
-        const response = await getContagiousAppointments(params);
-        console.log(response.data);
-        setFilteredAppointments(response.data);
-
-        const params2: {
-          hospitalId?: string;
-          startDate: string;
-          endDate: string;
-        } = {
-          startDate: formattedStartDate,
-          endDate: formattedEndDate,
-        }
-        const response2 = await getContagiousAppointments(params2);
-        console.log(response2.data);
-        setAppointments(response2.data);
+        const buckets = await getAppointmentCounts({
+          startDate: format(startDate, 'yyyy-MM-dd'),
+          endDate: format(endDate, 'yyyy-MM-dd'),
+          granularity: 'day',
+          groupBy: ['hospital_assigned'],
+          contagious: true,
+        });
+        setCounts(buckets);
       } catch (err) {
-        console.error('Error fetching contagious appointments:', err);
+        console.error('Error fetching contagious case counts:', err);
         setError('Failed to load contagious cases data');
       } finally {
         setLoading(false);
       }
     };
     
-    fetchAppointments();
-  }, [selectedHospital, startDate, endDate]);
+    fetchCounts();
+  }, [startDate, endDate]);
+  
+  // Growth, reproduction number and predictions are computed by the server
+  // for the selected hospital and shared by every viewer
+  useEffect(() => {
+    const fetchForecast = async () => {
+      if (!startDate || !endDate) return;
+      
+      try {
+        const response = await getCaseForecast({
+          startDate: format(startDate, 'yyyy-MM-dd'),
+          endDate: format(endDate, 'yyyy-MM-dd'),
+          horizon: predictionDays,
+          contagious: true,
+          hospitalId: selectedHospital || undefined,
+        });
+        setForecast(response);
+      } catch (err) {
+        console.error('Error fetching case forecast:', err);
+        setForecast(null);
+      }
+    };
+    
+    fetchForecast();
+  }, [selectedHospital, startDate, endDate, predictionDays]);
+  
+  // Cases per hospital over the whole range
+  const hospitalTotals = useMemo(() => {
+    const totals: Record<string, number> = {};
+    counts.forEach(({ hospital_assigned, count }) => {
+      if (hospital_assigned) {
+        totals[hospital_assigned] = (totals[hospital_assigned] || 0) + count;
+      }
+    });
+    return totals;
+  }, [counts]);
+  
+  // Cases per day of the week, Sunday first
+  const weekdayCounts = useMemo(() => {
+    const totals = [0, 0, 0, 0, 0, 0, 0];
+    counts.forEach(({ bucket, count }) => {
+      totals[parseISO(bucket).getDay()] += count;
+    });
+    return totals;
+  }, [counts]);
   
   // Process data for the chart
   const { 
@@ -144,16 +165,20 @@ const PandemicTrackingPage: React.FC = () => {
     totalCases, 
     dailyAverage, 
     growthRate, 
+    doublingTime,
+    reproductionNumber,
     peakDay, 
     predictionData,
     dailyCounts 
   } = useMemo(() => {
-    if (!appointments.length || !startDate || !endDate) {
+    if (!counts.length || !startDate || !endDate) {
       return { 
         chartData: { labels: [], datasets: [] }, 
         totalCases: 0, 
         dailyAverage: 0, 
         growthRate: 0, 
+        doublingTime: null,
+        reproductionNumber: null,
         peakDay: null,
         predictionData: [],
         dailyCounts: []
@@ -166,13 +191,15 @@ const PandemicTrackingPage: React.FC = () => {
       format(addDays(startDate, i), 'yyyy-MM-dd')
     );
     
-    // Count cases per day
-    const dailyCounts = dateLabels.map(date => {
-      return filteredAppointments.filter(app => {
-        const appDate = app.request_start_time.split('T')[0];
-        return appDate === date;
-      }).length;
+    // Count cases per day, of the selected hospital if any
+    const casesByDate: Record<string, number> = {};
+    counts.forEach(({ bucket, hospital_assigned, count }) => {
+      if (!selectedHospital || hospital_assigned === selectedHospital) {
+        const date = bucket.split('T')[0];
+        casesByDate[date] = (casesByDate[date] || 0) + count;
+      }
     });
+    const dailyCounts = dateLabels.map(date => casesByDate[date] || 0);
     
     // Calculate peak day
     const maxCount = Math.max(...dailyCounts);
@@ -183,13 +210,14 @@ const PandemicTrackingPage: React.FC = () => {
     const total = dailyCounts.reduce((sum, count) => sum + count, 0);
     const average = total / dailyCounts.length || 0;
     
-    // Calculate growth rate using utility function
-    // Use a 7-day window to calculate growth rate for better accuracy
-    const rate = calculateGrowthRate(dailyCounts, 7);
-    
-    // Generate prediction data using utility function
-    const lastValue = dailyCounts[dailyCounts.length - 1] || 1;
-    const predictions = generatePredictions(lastValue, rate, endDate, predictionDays);
+    // Growth rate and predictions of the last 7-day trend, from the server
+    const rate = forecast?.growth_rate ?? 0;
+    const predictions = (forecast?.forecast ?? []).map(point => ({
+      date: point.day,
+      value: Math.round(point.cases),
+      lower: Math.round(point.lower),
+      upper: Math.round(point.upper),
+    }));
     
     return {
       chartData: {
@@ -208,11 +236,13 @@ const PandemicTrackingPage: React.FC = () => {
       totalCases: total,
       dailyAverage: average,
       growthRate: rate,
+      doublingTime: forecast?.doubling_time ?? null,
+      reproductionNumber: forecast?.rt ?? null,
       peakDay: peakDayDate,
       predictionData: predictions,
       dailyCounts
     };
-  }, [appointments, startDate, endDate, theme, predictionDays]);
+  }, [counts, forecast, selectedHospital, startDate, endDate, theme]);
   
   // Combined chart data (actual + predictions)
   const combinedChartData = useMemo(() => {
@@ -239,7 +269,20 @@ const PandemicTrackingPage: React.FC = () => {
           borderDash: [5, 5],
           tension: 0.2,
           fill: false
-        }
+        },
+        ...(['lower', 'upper'] as const).map(bound => ({
+          label: bound === 'lower' ? 'Lower Bound (95%)' : 'Upper Bound (95%)',
+          data: [
+            ...Array(chartData.labels.length).fill(null),
+            ...predictionData.map(item => item[bound])
+          ],
+          borderColor: theme.palette.secondary.light,
+          borderDash: [2, 4],
+          borderWidth: 1,
+          pointRadius: 0,
+          tension: 0.2,
+          fill: false
+        }))
       ]
     };
   }, [chartData, predictionData, theme]);
@@ -545,8 +588,10 @@ const PandemicTrackingPage: React.FC = () => {
                 <Line options={chartOptions} data={combinedChartData} />
               </Box>
               <Typography variant="body2" sx={{ mt: 2, fontStyle: 'italic', color: 'text.secondary' }}>
-                * Prediction based on {growthRate !== 0 ? Math.abs(growthRate) > 0.01 ? 'exponential' : 'linear' : 'stable'} model using {Math.min(7, dailyCounts.length)}-day trend data.
+                * Prediction based on a log-linear model of the last {Math.min(7, dailyCounts.length)} days, with 95% prediction intervals.
                 Growth rate: {(growthRate * 100).toFixed(2)}% per day.
+                {doublingTime !== null && ` Doubling time: ${doublingTime.toFixed(1)} days.`}
+                {reproductionNumber !== null && ` Estimated Rt: ${reproductionNumber.toFixed(2)}.`}
               </Typography>
             </Paper>
             
@@ -568,7 +613,7 @@ const PandemicTrackingPage: React.FC = () => {
                   <Typography variant="h6" gutterBottom>
                     Hospital Distribution
                   </Typography>
-                  {filteredAppointments.length === 0 ? (
+                  {totalCases === 0 ? (
                     <Box sx={{ display: 'flex', alignItems: 'center', justifyContent: 'center', height: '100%' }}>
                       <Typography variant="body1" color="text.secondary">
                         No data available for the selected filters
@@ -606,9 +651,7 @@ const PandemicTrackingPage: React.FC = () => {
                           datasets: [
                             {
                               label: 'Cases',
-                              data: hospitals.map(hospital => 
-                                appointments.filter(app => app.hospital_assigned === hospital.id).length
-                              ),
+                              data: hospitals.map(hospital => hospitalTotals[hospital.id] || 0),
                               backgroundColor: theme.palette.info.light,
                             },
                           ],
@@ -632,7 +675,7 @@ const PandemicTrackingPage: React.FC = () => {
                   <Typography variant="h6" gutterBottom>
                     Weekly Distribution
                   </Typography>
-                  {appointments.length === 0 ? (
+                  {counts.length === 0 ? (
                     <Box sx={{ display: 'flex', alignItems: 'center', justifyContent: 'center', height: '100%' }}>
                       <Typography variant="body1" color="text.secondary">
                         No data available for the selected filters
@@ -664,12 +707,7 @@ const PandemicTrackingPage: React.FC = () => {
                           datasets: [
                             {
                               label: 'Cases',
-                              data: [0, 1, 2, 3, 4, 5, 6].map(dayOfWeek => 
-                                appointments.filter(app => {
-                                  const date = new Date(app.request_start_time);
-                                  return date.getDay() === dayOfWeek;
-                                }).length
-                              ),
+                              data: weekdayCounts,
                               backgroundColor: theme.palette.warning.light,
                             },
                           ],
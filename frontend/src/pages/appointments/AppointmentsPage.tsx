@@ -46,6 +46,8 @@ const AppointmentsPage: React.FC = () => {
   const [page, setPage] = useState(0);
   const [rowsPerPage, setRowsPerPage] = useState(10);
   const [totalCount, setTotalCount] = useState(0);
+  // Cursor of each page visited so far; the pagination only moves one page at a time
+  const [cursors, setCursors] = useState<(string | null)[]>([null]);
   const [editDialogOpen, setEditDialogOpen] = useState(false);
   const [selectedAppointment, setSelectedAppointment] = useState<Appointment | null>(null);
   const [hospitalAssigned, setHospitalAssigned] = useState('');
@@ -65,13 +67,14 @@ const AppointmentsPage: React.FC = () => {
     setLoading(true);
     try {
       console.log('Fetching appointments');
-      const skip = page * rowsPerPage;
-      const response = await getAppointments(skip, rowsPerPage);
+      const response = await getAppointments(cursors[page], rowsPerPage);
       console.log('Appointments fetched:', response);
       setAppointments(response.data);
-      console.log('Appointments set:', appointments);
-      setTotalCount(response.count);
-      console.log('Total count set:', totalCount);
+      setCursors(current => [...current.slice(0, page + 1), response.next_cursor]);
+      // The total only comes with the first page
+      if (response.count !== null) {
+        setTotalCount(response.count);
+      }
     } catch (error) {
       console.error('Error fetching appointments:', error);
       setSnackbar({
@@ -90,6 +93,7 @@ const AppointmentsPage: React.FC = () => {
 
   const handleChangeRowsPerPage = (event: React.ChangeEvent<HTMLInputElement>) => {
     setRowsPerPage(parseInt(event.target.value, 10));
+    setCursors([null]);
     setPage(0);
   };
 
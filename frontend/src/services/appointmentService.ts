@@ -1,9 +1,13 @@
 import api from './api';
-import { Appointment, AppointmentCreate, AppointmentUpdate, PaginatedResponse, AppointmentStatus } from '../types';
+import { Appointment, AppointmentCountBucket, AppointmentCreate, CaseForecast, AppointmentEvent, AppointmentUpdate, CursorPage, PaginatedResponse, AppointmentStatus } from '../types';
 
-export const getAppointments = async (skip = 0, limit = 100): Promise<PaginatedResponse<Appointment>> => {
+export const getAppointments = async (cursor?: string | null, limit = 100): Promise<CursorPage<Appointment>> => {
   try {
-    const response = await api.get(`/appointments/all?skip=${skip}&limit=${limit}`);
+    const params: Record<string, string | number> = { limit };
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    const response = await api.get('/appointments/all', { params });
     return response.data;
   } catch (error) {
     console.error('Error fetching appointments:', error);
@@ -16,34 +20,94 @@ export const getContagiousAppointments = async (
     hospitalId?: string;
     startDate?: string;
     endDate?: string;
-    skip?: number;
     limit?: number;
   } = {}
 ): Promise<PaginatedResponse<Appointment>> => {
   try {
-    const { hospitalId, startDate, endDate, skip = 0, limit = 3000 } = params;
-    let url = `/appointments/all?skip=${skip}&limit=${limit}&contagious=true`;
+    const { hospitalId, startDate, endDate, limit = 3000 } = params;
+    const query: Record<string, string | number | boolean> = { contagious: true, limit: Math.min(limit, 1000) };
     
     if (hospitalId) {
-      url += `&hospital_assigned=${hospitalId}`;
+      query.hospital_assigned = hospitalId;
     }
     
     if (startDate) {
-      url += `&start_date=${startDate}`;
+      query.start_date = startDate;
     }
     
     if (endDate) {
-      url += `&end_date=${endDate}`;
+      query.end_date = endDate;
     }
     
-    const response = await api.get(url);
-    return response.data;
+    // Follow the cursor until limit appointments were read or there are no more
+    const data: Appointment[] = [];
+    let cursor: string | null = null;
+    let count = 0;
+    do {
+      const response: { data: CursorPage<Appointment> } = await api.get('/appointments/all', {
+        params: cursor ? { ...query, cursor } : query,
+      });
+      data.push(...response.data.data);
+      count = response.data.count ?? count;
+      cursor = response.data.next_cursor;
+    } while (cursor && data.length < limit);
+    return { data: data.slice(0, limit), count };
   } catch (error) {
     console.error('Error fetching contagious appointments:', error);
     throw error;
   }
 };
 
+export const getAppointmentCounts = async (params: {
+  startDate: string;
+  endDate: string;
+  granularity?: 'hour' | 'day' | 'week';
+  groupBy?: Array<'hospital_assigned' | 'medical_specialty' | 'prority'>;
+  contagious?: boolean;
+  hospitalId?: string;
+}): Promise<AppointmentCountBucket[]> => {
+  try {
+    const { startDate, endDate, granularity = 'day', groupBy = [], contagious, hospitalId } = params;
+    const query = new URLSearchParams({ start_date: startDate, end_date: endDate, granularity });
+    groupBy.forEach(dimension => query.append('group_by', dimension));
+    if (contagious !== undefined) {
+      query.set('contagious', String(contagious));
+    }
+    if (hospitalId) {
+      query.set('hospital_assigned', hospitalId);
+    }
+    const response = await api.get('/appointments/stats/counts', { params: query });
+    return response.data.data;
+  } catch (error) {
+    console.error('Error fetching appointment counts:', error);
+    throw error;
+  }
+};
+
+export const getCaseForecast = async (params: {
+  startDate: string;
+  endDate: string;
+  horizon: number;
+  contagious?: boolean;
+  hospitalId?: string;
+}): Promise<CaseForecast> => {
+  try {
+    const { startDate, endDate, horizon, contagious, hospitalId } = params;
+    const query: Record<string, string | number | boolean> = { start_date: startDate, end_date: endDate, horizon };
+    if (contagious !== undefined) {
+      query.contagious = contagious;
+    }
+    if (hospitalId) {
+      query.hospital_assigned = hospitalId;
+    }
+    const response = await api.get('/appointments/stats/forecast', { params: query });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching case forecast:', error);
+    throw error;
+  }
+};
+
 export const getAppointment = async (id: string): Promise<Appointment> => {
   const response = await api.get(`/appointments/appointments/${id}`);
   return response.data;
@@ -57,4 +121,18 @@ export const createAppointment = async (appointment: AppointmentCreate): Promise
 export const updateAppointment = async (id: string, appointment: AppointmentUpdate): Promise<Appointment> => {
   const response = await api.put(`/appointments/appointments/${id}`, appointment);
   return response.data;
-}; 
\ No newline at end of file
+};
+
+// Live assignments and status changes of one hospital, instead of polling /appointments/all.
+// EventSource reconnects by itself; a 'resync' event means some events were missed.
+export const subscribeToAppointmentEvents = (
+  hospitalId: string,
+  onEvent: (event: AppointmentEvent) => void
+): (() => void) => {
+  const source = new EventSource(
+    `${api.defaults.baseURL}/appointments/stream?hospital_assigned=${encodeURIComponent(hospitalId)}`
+  );
+  const handler = (message: MessageEvent) => onEvent(JSON.parse(message.data));
+  ['assigned', 'unassigned', 'status', 'resync'].forEach((name) => source.addEventListener(name, handler));
+  return () => source.close();
+};
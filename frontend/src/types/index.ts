@@ -4,6 +4,14 @@ export interface PaginatedResponse<T> {
   count: number;
 }
 
+// Cursor-paginated response: pass next_cursor back to get the following page.
+// count is only sent with the first page.
+export interface CursorPage<T> {
+  data: T[];
+  count: number | null;
+  next_cursor: string | null;
+}
+
 // Hospital Types
 export enum HospitalStatus {
   ACTIVE = "active",
@@ -157,6 +165,52 @@ export interface Appointment {
   info_entries: AppointmentInfo[];
 }
 
+// Pushed to hospital dashboards over /appointments/stream
+export interface AppointmentEvent {
+  event: 'assigned' | 'unassigned' | 'status' | 'resync';
+  occurred_at?: string;
+  appointment_id?: string;
+  hospital_assigned?: string;
+  status?: AppointmentStatus;
+  medical_specialty?: string;
+  prority?: string;
+  contagious?: boolean;
+  scheduled_time?: string;
+}
+
+// One bucket of /appointments/stats/counts; dimensions not grouped by are null
+export interface AppointmentCountBucket {
+  bucket: string;
+  hospital_assigned: string | null;
+  medical_specialty: string | null;
+  prority: string | null;
+  count: number;
+}
+
+// /appointments/stats/forecast: daily cases with rolling growth rate and
+// reproduction number, and the expected cases of the next days
+export interface CaseTrendPoint {
+  day: string;
+  cases: number;
+  growth_rate: number | null;
+  rt: number | null;
+}
+
+export interface CaseForecastPoint {
+  day: string;
+  cases: number;
+  lower: number;
+  upper: number;
+}
+
+export interface CaseForecast {
+  series: CaseTrendPoint[];
+  growth_rate: number;
+  doubling_time: number | null;
+  rt: number | null;
+  forecast: CaseForecastPoint[];
+}
+
 export interface AppointmentCreate {
   patient_id: string;
 }